@@ -1,11 +1,20 @@
 """
 Database configuration and session management for Nativore.
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
 from dotenv import load_dotenv
+from datetime import datetime, timedelta
+import itertools
 import os
+import time
+
+from utils.cache import TTLCache
+from utils.metrics import Histogram
 
 # Load environment variables
 load_dotenv()
@@ -13,16 +22,206 @@ load_dotenv()
 # Get database URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./nativore.db")
 
-# Create SQLAlchemy engine
-engine = create_engine(
+# Optional comma-separated read replica URLs for GET traffic
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+
+# Seconds a failed replica is skipped before it is tried again
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 30))
+
+# Seconds a client's reads stay on the primary after it wrote something
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+# updated_at is stamped before commit, so a slow transaction can commit rows
+# older than a watermark a reader already has: (updated_at, id) watermark
+# readers stay this many seconds behind the clock
+WATERMARK_SAFETY_LAG_SECONDS = float(os.getenv("WATERMARK_SAFETY_LAG_SECONDS", 10))
+
+# Connection pool settings. Without DB_POOL_SIZE, the DB_MAX_CONNECTIONS
+# budget is split across uvicorn workers (WEB_CONCURRENCY), half as the
+# pool and half as overflow.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 40))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 0) or max(1, DB_MAX_CONNECTIONS // (2 * WEB_CONCURRENCY))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW") or DB_POOL_SIZE)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True") == "True"
+
+# SQLite production mode for file databases: WAL and tuned pragmas, a single
+# serialized writer connection and a pool of read-only connections for GETs.
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "True") == "True"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),  # ms
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),  # bytes
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024)),  # negative = KiB
+    "temp_store": "MEMORY",
+}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait and how often they time out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_overflow = kwargs.get("max_overflow", 10)
+        self.timeout = kwargs.get("timeout", 30.0)
+        self.wait_time = Histogram()
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_time = self.wait_time
+        pool.timeouts = self.timeouts
+        return pool
+
+
+def is_sqlite_file(url: str) -> bool:
+    """True for SQLite URLs that point at a database file."""
+    return url.startswith("sqlite") and ":memory:" not in url and url != "sqlite://"
+
+
+def apply_sqlite_pragmas(engine, read_only: bool = False):
+    """Run SQLITE_PRAGMAS on every new connection; read-only ones also refuse writes."""
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def make_engine(url: str, pool_size: int = None, max_overflow: int = None, read_only: bool = False, **kwargs):
+    """Create an engine with the configured connection pool."""
+    if "sqlite" in url:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if ":memory:" not in url and url != "sqlite://":
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE if pool_size is None else pool_size,
+            max_overflow=DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING
+        )
+    engine = create_engine(url, **kwargs)
+    if SQLITE_TUNED and is_sqlite_file(url):
+        apply_sqlite_pragmas(engine, read_only)
+    return engine
+
+
+def pool_stats(engine):
+    """Live statistics for an engine's connection pool."""
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {"pool": type(pool).__name__}
+
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": pool.max_overflow,
+        "timeout": pool.timeout,
+        "timeouts": pool.timeouts,
+        "wait_seconds": pool.wait_time.snapshot()
+    }
+
+
+SQLITE_PRODUCTION = SQLITE_TUNED and is_sqlite_file(DATABASE_URL)
+
+# Create SQLAlchemy engine. In SQLite production mode this is the single
+# writer: one connection, so write transactions are serialized in-process.
+engine = make_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    pool_size=1 if SQLITE_PRODUCTION else None,
+    max_overflow=0 if SQLITE_PRODUCTION else None,
     echo=True if os.getenv("DEBUG") == "True" else False
 )
 
 # Create SessionLocal class for database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+class ReplicaRouter:
+    """
+    Hands out sessions on read replicas in round-robin order.
+    A replica that fails to connect is skipped for REPLICA_RETRY_SECONDS;
+    when none are available, sessions fall back to the primary.
+    """
+
+    def __init__(self, engines):
+        self.replicas = [
+            sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+            for replica_engine in engines
+        ]
+        self._down_until = [0.0] * len(self.replicas)
+        self._next = itertools.count()
+
+    def session(self):
+        """Return a session on a healthy replica, or on the primary."""
+        if self.replicas:
+            start = next(self._next)
+            for offset in range(len(self.replicas)):
+                index = (start + offset) % len(self.replicas)
+                if self._down_until[index] > time.monotonic():
+                    continue
+
+                db = self.replicas[index]()
+                try:
+                    db.connection()  # Check out a connection now so failures surface here
+                    return db
+                except OperationalError as e:
+                    db.close()
+                    self._down_until[index] = time.monotonic() + REPLICA_RETRY_SECONDS
+                    print(f"⚠️  Read replica {index} unavailable, skipping: {e}")
+
+        return SessionLocal()
+
+    def status(self):
+        """Health of each configured replica."""
+        now = time.monotonic()
+        return [
+            {"replica": index, "healthy": down_until <= now}
+            for index, down_until in enumerate(self._down_until)
+        ]
+
+    def pool_stats(self):
+        """Connection pool statistics of each replica."""
+        return [pool_stats(replica.kw["bind"]) for replica in self.replicas]
+
+
+replica_engines = [make_engine(url) for url in DATABASE_REPLICA_URLS]
+
+# Streaming replicas may lag behind the primary (unlike the SQLite readers below)
+lagging_engines = list(replica_engines)
+
+# With WAL, readers never block on the writer, so SQLite reads get their own
+# pool of read-only connections to the same file
+if SQLITE_PRODUCTION:
+    replica_engines.append(make_engine(DATABASE_URL, read_only=True))
+
+replica_router = ReplicaRouter(replica_engines)
+
+# Clients that wrote recently, keyed by client_key()
+recent_writers = TTLCache(maxsize=10000, ttl=READ_YOUR_WRITES_SECONDS)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -38,16 +237,103 @@ def get_db():
     finally:
         db.close()
 
+def client_key(request: Request):
+    """Identify a client by its bearer token, falling back to its address."""
+    auth = request.headers.get("authorization")
+    if auth:
+        return auth
+    return request.client.host if request.client else None
+
+
+def mark_recent_write(request: Request):
+    """Route this client's reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    key = client_key(request)
+    if key:
+        recent_writers.set(key, True)
+
+
+def settled_before() -> datetime:
+    """updated_at up to which no more rows can commit (see WATERMARK_SAFETY_LAG_SECONDS)."""
+    return datetime.utcnow() - timedelta(seconds=WATERMARK_SAFETY_LAG_SECONDS)
+
+
+def may_lag(db) -> bool:
+    """True if a session reads a replica that may not have the latest writes yet."""
+    return any(db.get_bind() is lagging for lagging in lagging_engines)
+
+
+def read_session():
+    """Open a session for read-only work outside a request."""
+    return replica_router.session()
+
+
+# Dependency to get a read-only DB session
+def get_read_db(request: Request):
+    """
+    Dependency function for read-only routes.
+    Uses a read replica unless the client wrote recently, in which case
+    the primary is used so it sees its own writes.
+    """
+    if recent_writers.get(client_key(request)):
+        db = SessionLocal()
+        db.info["read_your_writes"] = True
+    else:
+        db = replica_router.session()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # Function to initialize database
 def init_db():
     """
     Initialize database by creating all tables.
     Should be called on application startup.
     """
-    from models import User, Restaurant, Review  # Import models
-    Base.metadata.create_all(bind=engine)
+    from models import (  # Import models
+        User, Restaurant, Review, backfill_dimension_keys, backfill_review_rollups, update_ranking_scores,
+        backfill_text_postings
+    )
+    if engine.dialect.name == "postgresql":
+        # reviews is partitioned by month there, which create_all cannot declare
+        from utils.review_partitions import create_partitioned_reviews
+        tables = [table for table in Base.metadata.sorted_tables if table.name != "reviews"]
+        Base.metadata.create_all(bind=engine, tables=tables)
+        with engine.begin() as conn:
+            create_partitioned_reviews(conn)
+    else:
+        Base.metadata.create_all(bind=engine)
+    
+    # create_all skips existing tables, so add columns and indexes introduced later
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    add_column(conn, table, column)
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    with engine.begin() as conn:
+        backfill_dimension_keys(conn)
+        backfill_review_rollups(conn)
+        update_ranking_scores(conn, only_missing=True)
+        backfill_text_postings(conn)
     print("✅ Database tables created successfully!")
 
+
+def add_column(conn, table, column):
+    """Add a nullable column (with its foreign key) to an existing table."""
+    column_type = column.type.compile(dialect=conn.dialect)
+    references = "".join(
+        f" REFERENCES {fk.column.table.name}({fk.column.name})" for fk in column.foreign_keys
+    )
+    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{references}"))
+    print(f"✅ Added column {table.name}.{column.name}")
+
 # Function to drop all tables (for development/testing)
 def drop_db():
     """
@@ -2,14 +2,21 @@
 Nativore - Tamil Nadu Food Analytics Platform
 Main FastAPI application file.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
+import asyncio
 import os
 
 # Import database initialization
-from database import init_db
+from database import init_db, mark_recent_write, replica_router, engine, pool_stats
+
+from utils.admission import cost_class_for, admission_stats, RETRY_AFTER_SECONDS
+from utils.reports import report_cache, SUPPORTED_CITIES
+from utils.warmup import warmup
+from utils.review_partitions import ensure_partitions
+from utils.snapshot import snapshot_store
 
 # Import routers
 from routes import auth, restaurants, analytics, recommendations
@@ -26,7 +33,37 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# Configure CORS
+# Read-your-writes: after a write, keep this client's reads on the primary
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        mark_recent_write(request)
+    return await call_next(request)
+
+
+# Admission control: per cost class concurrency limits with load shedding
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    cost_class = cost_class_for(request.url.path)
+    if cost_class is None or request.method == "OPTIONS":
+        return await call_next(request)
+    
+    if not await cost_class.acquire():
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "Service Unavailable",
+                "message": f"Too many {cost_class.name} requests, please retry shortly"
+            },
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        cost_class.release()
+
+
+# Configure CORS (added last so it also wraps responses from the middleware above)
 origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 
 app.add_middleware(
@@ -51,7 +88,17 @@ async def startup_event():
     """Initialize database on startup."""
     print("🚀 Starting Nativore API...")
     init_db()
+    ensure_partitions()
     print("✅ Database initialized")
+    # Warm caches in the background; /health/ready reports when done
+    app.state.warmup_task = asyncio.create_task(start_background_work())
+
+
+async def start_background_work():
+    """Run the warm-up phase, then keep reports fresh."""
+    await warmup.run()
+    report_cache.start()
+    print("✅ Report precomputation started")
 
 
 # Shutdown event
@@ -59,6 +106,11 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     print("👋 Shutting down Nativore API...")
+    # Missing if startup failed before warm-up was scheduled
+    task = getattr(app.state, "warmup_task", None)
+    if task:
+        task.cancel()
+    report_cache.stop()
 
 
 # Root endpoint
@@ -78,13 +130,7 @@ async def root():
             "analytics": "/api/analytics",
             "recommendations": "/api/recommendations"
         },
-        "cities": [
-            "Chennai",
-            "Coimbatore",
-            "Tiruppur",
-            "Madurai",
-            "Thoothukudi"
-        ]
+        "cities": SUPPORTED_CITIES
     }
 
 
@@ -92,15 +138,68 @@ async def root():
 @app.get("/health")
 async def health_check():
     """
-    Health check endpoint.
+    Health check endpoint (liveness).
     """
     return {
         "status": "healthy",
         "service": "Nativore API",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "read_replicas": replica_router.status()
     }
 
 
+# Readiness endpoint
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness check. Returns 503 until the startup warm-up has finished,
+    so load balancers only route traffic to warm instances.
+    """
+    return JSONResponse(
+        status_code=200 if warmup.ready else 503,
+        content=warmup.stats()
+    )
+
+
+# Connection pool telemetry
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    """
+    Live connection pool statistics for the primary and any read replicas.
+    """
+    return {
+        "primary": pool_stats(engine),
+        "replicas": replica_router.pool_stats()
+    }
+
+
+# Admission control telemetry
+@app.get("/health/admission")
+async def admission_status():
+    """
+    Current concurrency, queue depth and shed count per cost class.
+    """
+    return admission_stats()
+
+
+# Analytics snapshot telemetry
+@app.get("/health/snapshot")
+async def snapshot_status():
+    """
+    Version, size and age of the memory-mapped analytics snapshot.
+    """
+    return snapshot_store.stats()
+
+
+# Precomputed report telemetry
+@app.get("/health/reports")
+async def report_status():
+    """
+    Precomputed report cache entries, staleness bounds and refresh backlog.
+    """
+    return report_cache.stats()
+
+
 # Exception handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
@@ -1,11 +1,18 @@
 """
 SQLAlchemy models for Nativore platform.
-Includes User, Restaurant, and Review models.
+Includes User, Restaurant, and Review models, the City, Area and Cuisine
+dimension tables restaurants reference by integer key, monthly review rollups
+and the inverted index over review comments and restaurant descriptions.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, Index, UniqueConstraint
+from sqlalchemy import event, delete, insert, inspect, select, update, func, case, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import relationship
+from collections import Counter
 from datetime import datetime
 from database import Base
+import os
+import re
 
 class User(Base):
     """User model for authentication and profile management."""
@@ -28,6 +35,68 @@ class User(Base):
         return f"<User {self.username}>"
 
 
+class City(Base):
+    """City dimension: one row per distinct restaurant city."""
+    __tablename__ = "cities"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+    
+    def __repr__(self):
+        return f"<City {self.name}>"
+
+
+class Area(Base):
+    """Area dimension: localities are distinct per city."""
+    __tablename__ = "areas"
+    
+    id = Column(Integer, primary_key=True)
+    city_id = Column(Integer, ForeignKey("cities.id"), nullable=False)
+    name = Column(String(255), nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("city_id", "name", name="uq_areas_city_id_name"),
+    )
+    
+    def __repr__(self):
+        return f"<Area {self.name}>"
+
+
+class Cuisine(Base):
+    """Cuisine dimension: one row per distinct cuisine."""
+    __tablename__ = "cuisines"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+    
+    def __repr__(self):
+        return f"<Cuisine {self.name}>"
+
+
+class MicroMarket(Base):
+    """
+    Spatial cluster of restaurants within a city, found from coordinates by
+    utils/micro_markets.py regardless of the free-text area.
+    """
+    __tablename__ = "micro_markets"
+    
+    id = Column(Integer, primary_key=True)
+    city_id = Column(Integer, ForeignKey("cities.id"), nullable=False)
+    label = Column(Integer, nullable=False)  # Cluster number within the city, stable across runs
+    latitude = Column(Float, nullable=False)  # Centroid
+    longitude = Column(Float, nullable=False)
+    radius_km = Column(Float, nullable=False)  # Farthest member from the centroid
+    restaurant_count = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("city_id", "label", name="uq_micro_markets_city_id_label"),
+    )
+    
+    def __repr__(self):
+        return f"<MicroMarket {self.city_id}/{self.label}>"
+
+
 class Restaurant(Base):
     """Restaurant model for Tamil Nadu food establishments."""
     __tablename__ = "restaurants"
@@ -51,9 +120,28 @@ class Restaurant(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Dimension keys, kept in sync with the name columns above on every write
+    city_id = Column(Integer, ForeignKey("cities.id"), index=True)
+    area_id = Column(Integer, ForeignKey("areas.id"), index=True)
+    cuisine_id = Column(Integer, ForeignKey("cuisines.id"), index=True)
+    
+    # Bayesian average of rating towards the city's mean (see bayesian_score)
+    ranking_score = Column(Float)
+    
+    # Spatial cluster from the last micro-market run; NULL for outliers and newer rows
+    micro_market_id = Column(Integer, ForeignKey("micro_markets.id"), index=True)
+    
     # Relationships
     reviews = relationship("Review", back_populates="restaurant", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Delta sync walks rows in (updated_at, id) order
+        Index("ix_restaurants_updated_at_id", "updated_at", "id"),
+        # Top-rated lists read these in reverse order, per city or overall
+        Index("ix_restaurants_city_ranking_score", "city", "ranking_score", "id"),
+        Index("ix_restaurants_ranking_score", "ranking_score", "id"),
+    )
+    
     def __repr__(self):
         return f"<Restaurant {self.name} - {self.city}>"
 
@@ -67,20 +155,462 @@ class Review(Base):
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
     rating = Column(Float, nullable=False)  # Rating (1-5)
     comment = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # Partition key on PostgreSQL
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="reviews")
     restaurant = relationship("Restaurant", back_populates="reviews")
     
+    # The PostgreSQL table's key is (id, created_at), as partitioned tables need
+    # the partition key in it; the table itself keeps `id` as its key so SQLite
+    # still autoincrements it
+    __mapper_args__ = {"primary_key": [id, created_at]}
+    
     def __repr__(self):
         return f"<Review {self.id} - Rating: {self.rating}>"
 
 
+class ReviewRollup(Base):
+    """
+    Review count and rating sum per restaurant and month. Kept up to date
+    on every review write and retained when old review partitions are archived.
+    """
+    __tablename__ = "review_monthly_rollups"
+    
+    month = Column(Date, primary_key=True)  # First day of the month
+    restaurant_id = Column(Integer, primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f"<ReviewRollup {self.month} - Restaurant {self.restaurant_id}>"
+
+
+class TextPosting(Base):
+    """
+    Inverted index over review comments and restaurant descriptions: one
+    posting per term and document, kept up to date on every write.
+    """
+    __tablename__ = "text_postings"
+    
+    term = Column(String(100), primary_key=True)
+    source = Column(String(20), primary_key=True)  # review or restaurant
+    document_id = Column(Integer, primary_key=True)
+    restaurant_id = Column(Integer, nullable=False)
+    frequency = Column(Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        # Postings are replaced per document on writes
+        Index("ix_text_postings_source_document_id", "source", "document_id"),
+    )
+    
+    def __repr__(self):
+        return f"<TextPosting {self.term} - {self.source} {self.document_id}>"
+
+
+# Dimension key maintenance
+
+DIMENSION_NAMES = ("city", "area", "cuisine")
+
+
+def dimension_key(model, name):
+    """Scalar subquery for the key of a dimension value, to filter restaurants by key."""
+    return select(model.id).where(model.name == name).scalar_subquery()
+
+
+def insert_missing(connection, model):
+    """INSERT that skips rows violating a unique constraint (a concurrent writer added them)."""
+    if connection.dialect.name == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if connection.dialect.name == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
+def dimension_ids(connection, model, columns, keys):
+    """
+    Map natural keys (tuples of `columns` values) of a dimension to ids,
+    inserting the ones that do not exist yet. Dimension tables are small,
+    so each lookup reads the whole table.
+    """
+    def lookup():
+        rows = connection.execute(select(*[getattr(model, c) for c in columns], model.id))
+        return {tuple(row[:-1]): row[-1] for row in rows}
+    
+    ids = lookup()
+    missing = [key for key in keys if key not in ids]
+    if missing:
+        connection.execute(insert_missing(connection, model), [dict(zip(columns, key)) for key in missing])
+        ids = lookup()
+    return ids
+
+
+def assign_dimension_keys(connection, rows):
+    """Set city_id, area_id and cuisine_id on restaurant row dicts from their names."""
+    if not rows:
+        return
+    
+    cities = dimension_ids(connection, City, ("name",), {(r["city"],) for r in rows})
+    cuisines = dimension_ids(connection, Cuisine, ("name",), {(r["cuisine"],) for r in rows})
+    areas = dimension_ids(
+        connection, Area, ("city_id", "name"),
+        {(cities[(r["city"],)], r["area"]) for r in rows}
+    )
+    
+    for r in rows:
+        r["city_id"] = cities[(r["city"],)]
+        r["area_id"] = areas[(r["city_id"], r["area"])]
+        r["cuisine_id"] = cuisines[(r["cuisine"],)]
+
+
+@event.listens_for(Restaurant, "before_insert")
+@event.listens_for(Restaurant, "before_update")
+def set_dimension_keys(mapper, connection, target):
+    """Keep the dimension keys of ORM-written restaurants in sync with their names."""
+    state = inspect(target)
+    if target.city_id is not None and not any(state.attrs[name].history.has_changes() for name in DIMENSION_NAMES):
+        return
+    
+    row = {name: getattr(target, name) for name in DIMENSION_NAMES}
+    assign_dimension_keys(connection, [row])
+    target.city_id, target.area_id, target.cuisine_id = row["city_id"], row["area_id"], row["cuisine_id"]
+
+
+def backfill_dimension_keys(connection):
+    """
+    Fill dimension keys of restaurants written without them: rows that
+    predate the dimension tables or were inserted outside the ORM. Keys are
+    derived data, so updated_at is left alone.
+    """
+    for model, column in ((City, Restaurant.city), (Cuisine, Restaurant.cuisine)):
+        connection.execute(
+            insert(model).from_select(
+                ["name"],
+                select(column).distinct().where(column.not_in(select(model.name)))
+            )
+        )
+    
+    connection.execute(update(Restaurant).where(Restaurant.city_id.is_(None)).values(
+        city_id=select(City.id).where(City.name == Restaurant.city).scalar_subquery(),
+        updated_at=Restaurant.updated_at
+    ))
+    connection.execute(update(Restaurant).where(Restaurant.cuisine_id.is_(None)).values(
+        cuisine_id=select(Cuisine.id).where(Cuisine.name == Restaurant.cuisine).scalar_subquery(),
+        updated_at=Restaurant.updated_at
+    ))
+    
+    existing = select(Area.id).where(Area.city_id == Restaurant.city_id, Area.name == Restaurant.area)
+    connection.execute(
+        insert(Area).from_select(
+            ["city_id", "name"],
+            select(Restaurant.city_id, Restaurant.area).distinct().where(
+                Restaurant.area_id.is_(None), ~existing.exists()
+            )
+        )
+    )
+    connection.execute(update(Restaurant).where(Restaurant.area_id.is_(None)).values(
+        area_id=existing.scalar_subquery(),
+        updated_at=Restaurant.updated_at
+    ))
+
+
+# Bayesian ranking
+
+# Weight of the city prior in ranking scores, as a number of reviews.
+# Unset: each city's mean review count per restaurant.
+RANKING_PRIOR_WEIGHT = float(os.getenv("RANKING_PRIOR_WEIGHT") or 0) or None
+
+# City -> (prior mean rating, prior weight), loaded lazily and refreshed by utils/ranking.py
+ranking_priors = {}
+
+
+def bayesian_score(rating, review_count, prior):
+    """
+    Rating shrunk towards the city's mean rating by the prior's weight in
+    pseudo-reviews. Works on numbers and on SQL column expressions alike.
+    """
+    mean, weight = prior
+    return (weight * mean + review_count * rating) / (weight + review_count)
+
+
+def compute_ranking_priors(connection, city=None):
+    """
+    City -> (review-weighted mean rating, prior weight). Cities without
+    reviews fall back to their plain mean rating.
+    """
+    rating = func.coalesce(Restaurant.rating, 0.0)
+    review_count = func.coalesce(Restaurant.review_count, 0)
+    query = select(
+        Restaurant.city, func.sum(rating * review_count), func.sum(review_count),
+        func.avg(rating), func.count(Restaurant.id)
+    ).group_by(Restaurant.city)
+    if city is not None:
+        query = query.where(Restaurant.city == city)
+    
+    priors = {}
+    for name, weighted, reviews, mean, restaurants in connection.execute(query):
+        weight = RANKING_PRIOR_WEIGHT or max(reviews / restaurants, 1.0)
+        priors[name] = (float(weighted / reviews) if reviews else float(mean or 0.0), float(weight))
+    return priors
+
+
+def city_prior(connection, city):
+    if city not in ranking_priors:
+        ranking_priors.update(compute_ranking_priors(connection, city))
+    return ranking_priors.get(city, (0.0, 1.0))
+
+
+def update_ranking_scores(connection, only_missing=False):
+    """
+    Recompute ranking scores city by city from freshly computed priors.
+    Leaves updated_at alone: scores are derived data, not restaurant edits
+    (on PostgreSQL the restaurants trigger in schema.sql skips such updates).
+    """
+    priors = compute_ranking_priors(connection)
+    for city, prior in priors.items():
+        score = bayesian_score(
+            func.coalesce(Restaurant.rating, 0.0), func.coalesce(Restaurant.review_count, 0), prior
+        )
+        stmt = update(Restaurant).where(Restaurant.city == city)
+        if only_missing:
+            stmt = stmt.where(Restaurant.ranking_score.is_(None))
+        else:
+            stmt = stmt.where(or_(Restaurant.ranking_score.is_(None), Restaurant.ranking_score != score))
+        connection.execute(stmt.values(ranking_score=score, updated_at=Restaurant.updated_at))
+    
+    ranking_priors.update(priors)
+    return priors
+
+
+@event.listens_for(Restaurant, "before_insert")
+@event.listens_for(Restaurant, "before_update")
+def set_ranking_score(mapper, connection, target):
+    state = inspect(target)
+    if target.ranking_score is not None and not any(
+        state.attrs[name].history.has_changes() for name in ("rating", "review_count", "city")
+    ):
+        return
+    target.ranking_score = bayesian_score(
+        target.rating or 0.0, target.review_count or 0, city_prior(connection, target.city)
+    )
+
+
+def add_review_to_restaurant(connection, restaurant_id, count, rating):
+    """Fold `count` reviews totalling `rating` into a restaurant's rating, review count and score."""
+    city = connection.execute(select(Restaurant.city).where(Restaurant.id == restaurant_id)).scalar()
+    if city is None:
+        return
+    
+    mean, weight = city_prior(connection, city)
+    review_count = func.coalesce(Restaurant.review_count, 0) + count
+    rating_total = func.coalesce(Restaurant.rating, 0.0) * func.coalesce(Restaurant.review_count, 0) + rating
+    connection.execute(update(Restaurant).where(Restaurant.id == restaurant_id).values(
+        review_count=review_count,
+        rating=case((review_count > 0, rating_total / review_count), else_=0.0),
+        ranking_score=(weight * mean + rating_total) / (weight + review_count)
+    ))
+
+
+@event.listens_for(Review, "after_insert")
+def rank_review_insert(mapper, connection, target):
+    add_review_to_restaurant(connection, target.restaurant_id, 1, target.rating)
+
+
+@event.listens_for(Review, "after_delete")
+def rank_review_delete(mapper, connection, target):
+    add_review_to_restaurant(connection, target.restaurant_id, -1, -target.rating)
+
+
+@event.listens_for(Review, "before_update")
+def rank_review_update(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ("rating", "restaurant_id")):
+        return
+    
+    old = connection.execute(select(Review.restaurant_id, Review.rating).where(Review.id == target.id)).one()
+    add_review_to_restaurant(connection, old.restaurant_id, -1, -old.rating)
+    add_review_to_restaurant(connection, target.restaurant_id, 1, target.rating)
+
+
+# Review rollup maintenance
+
+def month_of(value):
+    """First day of the month of a datetime."""
+    return value.date().replace(day=1)
+
+
+def month_expression(connection, column):
+    """SQL expression for the first day of the month of a timestamp column."""
+    if connection.dialect.name == "sqlite":
+        return func.date(column, "start of month")
+    return func.cast(func.date_trunc("month", column), Date)
+
+
+def add_to_rollup(connection, month, restaurant_id, count, rating):
+    """Add `count` reviews with a total of `rating` to a restaurant's monthly rollup."""
+    values = {"month": month, "restaurant_id": restaurant_id, "review_count": count, "rating_sum": rating}
+    increments = {
+        "review_count": ReviewRollup.review_count + count,
+        "rating_sum": ReviewRollup.rating_sum + rating
+    }
+    
+    if connection.dialect.name in ("postgresql", "sqlite"):
+        dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+        connection.execute(
+            dialect.insert(ReviewRollup).values(**values).on_conflict_do_update(
+                index_elements=["month", "restaurant_id"], set_=increments
+            )
+        )
+        return
+    
+    updated = connection.execute(update(ReviewRollup).where(
+        ReviewRollup.month == month, ReviewRollup.restaurant_id == restaurant_id
+    ).values(**increments))
+    if not updated.rowcount:
+        connection.execute(insert(ReviewRollup).values(**values))
+
+
+@event.listens_for(Review, "after_insert")
+def rollup_review_insert(mapper, connection, target):
+    add_to_rollup(connection, month_of(target.created_at), target.restaurant_id, 1, target.rating)
+
+
+@event.listens_for(Review, "after_delete")
+def rollup_review_delete(mapper, connection, target):
+    add_to_rollup(connection, month_of(target.created_at), target.restaurant_id, -1, -target.rating)
+
+
+@event.listens_for(Review, "before_update")
+def rollup_review_update(mapper, connection, target):
+    """Move the review between rollups when its rating, restaurant or month changes."""
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ("rating", "restaurant_id", "created_at")):
+        return
+    
+    # Attribute history lacks the old values once they were expired, so read the stored row
+    old = connection.execute(
+        select(Review.created_at, Review.restaurant_id, Review.rating).where(Review.id == target.id)
+    ).one()
+    add_to_rollup(connection, month_of(old.created_at), old.restaurant_id, -1, -old.rating)
+    add_to_rollup(connection, month_of(target.created_at), target.restaurant_id, 1, target.rating)
+
+
+def backfill_review_rollups(connection):
+    """Build the rollups from the reviews table if they have never been built."""
+    if connection.execute(select(ReviewRollup.month).limit(1)).first():
+        return
+    
+    month = month_expression(connection, Review.created_at)
+    connection.execute(
+        insert(ReviewRollup).from_select(
+            ["month", "restaurant_id", "review_count", "rating_sum"],
+            select(month, Review.restaurant_id, func.count(Review.id), func.sum(Review.rating)).group_by(
+                month, Review.restaurant_id
+            )
+        )
+    )
+
+
+# Text index maintenance
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or our so "
+    "that the their this to was we were with very".split()
+)
+
+MAX_TERM_LENGTH = 100
+
+# Indexed text per posting source: (model, text column, restaurant id column)
+TEXT_SOURCES = {
+    "review": (Review, Review.comment, Review.restaurant_id),
+    "restaurant": (Restaurant, Restaurant.description, Restaurant.id),
+}
+
+
+def tokenize(text) -> list:
+    """Lowercased word tokens of a text, without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall((text or "").lower()) if token not in STOPWORDS]
+
+
+def index_terms(text) -> Counter:
+    """
+    Term frequencies of a text: its tokens and pairs of adjacent tokens, so
+    two-word dishes such as "fish curry" are single terms.
+    """
+    tokens = tokenize(text)
+    terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return Counter(term for term in terms if len(term) <= MAX_TERM_LENGTH)
+
+
+def index_documents(connection, source, documents):
+    """Replace the postings of (document_id, restaurant_id, text) documents."""
+    documents = list(documents)
+    for start in range(0, len(documents), 500):
+        ids = [document[0] for document in documents[start:start + 500]]
+        connection.execute(delete(TextPosting).where(TextPosting.source == source, TextPosting.document_id.in_(ids)))
+    
+    postings = [
+        {"term": term, "source": source, "document_id": document_id, "restaurant_id": restaurant_id, "frequency": frequency}
+        for document_id, restaurant_id, text in documents
+        for term, frequency in index_terms(text).items()
+    ]
+    if postings:
+        connection.execute(insert(TextPosting), postings)
+
+
+def unindex_document(connection, source, document_id):
+    connection.execute(delete(TextPosting).where(
+        TextPosting.source == source, TextPosting.document_id == document_id
+    ))
+
+
+def text_changed(target, *names) -> bool:
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+@event.listens_for(Review, "after_insert")
+@event.listens_for(Review, "after_update")
+def index_review(mapper, connection, target):
+    if text_changed(target, "comment", "restaurant_id"):
+        index_documents(connection, "review", [(target.id, target.restaurant_id, target.comment)])
+
+
+@event.listens_for(Review, "after_delete")
+def unindex_review(mapper, connection, target):
+    unindex_document(connection, "review", target.id)
+
+
+@event.listens_for(Restaurant, "after_insert")
+@event.listens_for(Restaurant, "after_update")
+def index_restaurant(mapper, connection, target):
+    if text_changed(target, "description"):
+        index_documents(connection, "restaurant", [(target.id, target.id, target.description)])
+
+
+@event.listens_for(Restaurant, "after_delete")
+def unindex_restaurant(mapper, connection, target):
+    unindex_document(connection, "restaurant", target.id)
+
+
+def backfill_text_postings(connection):
+    """Index documents with text but no postings yet, e.g. rows written before the index existed."""
+    for source, (model, text_column, restaurant_column) in TEXT_SOURCES.items():
+        indexed = select(TextPosting.document_id).where(TextPosting.source == source)
+        documents = connection.execute(
+            select(model.id, restaurant_column, text_column).where(
+                text_column.isnot(None), model.id.not_in(indexed)
+            )
+        ).all()
+        index_documents(connection, source, documents)
+
+
 # Pydantic schemas for request/response validation
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional
 from datetime import datetime as dt
 
 # User Schemas
@@ -128,6 +658,9 @@ class RestaurantBase(BaseModel):
 class RestaurantCreate(RestaurantBase):
     pass
 
+class RestaurantUpsert(RestaurantBase):
+    id: Optional[int] = None  # Update this restaurant if set, otherwise create
+
 class RestaurantResponse(RestaurantBase):
     id: int
     rating: float
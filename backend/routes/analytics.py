@@ -2,21 +2,53 @@
 Analytics routes for Nativore platform.
 Provides data insights on Tamil Nadu food market trends.
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional
-from database import get_db
-from models import Restaurant, Review, User
+import asyncio
+import inspect
+import json
+import numpy as np
+from database import get_read_db, read_session
+from models import (
+    Restaurant, Review, ReviewRollup, User, City, Area, Cuisine, MicroMarket, TextPosting,
+    dimension_key, month_expression, tokenize
+)
 from routes.auth import get_current_active_user
+from utils.singleflight import single_flight
+from utils.reports import report_cache
+from utils.snapshot import snapshot_store, table_watermark
+from utils.cube import cube_store, DIMENSIONS as CUBE_DIMENSIONS
+from utils.sketches import sketch_store, TDigest, SKETCH_MEASURES, SKETCH_DIMENSIONS
+from utils.histogram import (
+    histogram, histogram_bins, overall, HISTOGRAM_MEASURES, HISTOGRAM_GROUPS, MAX_BIN_EDGES,
+    PRICE_BANDS, PRICE_BAND_EDGES
+)
+from utils.columnar import NegotiatedResponse, negotiate_format
+from utils.heatmap import heatmap_store, HEATMAP_GRID, HEATMAP_ZOOMS
+from utils.topk import top_k, TOPK_DIMENSIONS, MAX_TOPK
+from utils.fake_data import DISHES
+from utils.events import CityBroadcaster, STREAM_KEEPALIVE_SECONDS, STREAM_POLL_SECONDS
 
-router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+# Results are JSON, or binary columns for clients that accept them
+router = APIRouter(
+    prefix="/api/analytics",
+    tags=["Analytics"],
+    default_response_class=NegotiatedResponse,
+    dependencies=[Depends(negotiate_format)]
+)
 
 
 @router.get("/trends")
-async def get_trends(
+@report_cache.register("trends")
+@single_flight
+def get_trends(
     city: Optional[str] = Query(None, description="Filter by city"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get food trend analytics for Tamil Nadu cities.
@@ -27,6 +59,10 @@ async def get_trends(
     - Rating distribution
     - Growth trends
     """
+    snapshot = snapshot_store.current()
+    if snapshot is not None:
+        return trends_from_snapshot(snapshot, city)
+    
     # Base query
     query = db.query(Restaurant)
     
@@ -72,84 +108,69 @@ async def get_trends(
 
 
 @router.get("/spending")
-async def get_spending_analysis(
+@report_cache.register("spending")
+@single_flight
+def get_spending_analysis(
     city: Optional[str] = Query(None, description="Filter by city"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get spending pattern analysis.
     
     Returns spending distribution across price ranges and cities.
     """
-    query = db.query(Restaurant)
-    
-    if city:
-        query = query.filter(Restaurant.city == city)
+    # One pass over prices for the three bands, one for the spending index total
+    counts, sums = overall(histogram(db, "avg_price", PRICE_BAND_EDGES, city=city), len(PRICE_BANDS))
+    spending_total = overall(histogram(db, "spending_index", [], city=city), 1)[1][0]
+    total = int(counts.sum())
     
-    restaurants = query.all()
-    
-    # Price range categorization
-    budget = []  # < 300
-    mid_range = []  # 300-600
-    premium = []  # > 600
-    
-    for rest in restaurants:
-        if rest.avg_price < 300:
-            budget.append(rest)
-        elif rest.avg_price < 600:
-            mid_range.append(rest)
-        else:
-            premium.append(rest)
-    
-    total = len(restaurants)
+    def price_range(band, label):
+        count = int(counts[band])
+        return {
+            "count": count,
+            "percentage": round(count / total * 100, 1) if total > 0 else 0,
+            "avg_price": round(float(sums[band]) / count, 2) if count else 0,
+            "range": label
+        }
     
     return {
         "city": city or "All Cities",
         "total_restaurants": total,
         "price_ranges": {
-            "budget": {
-                "count": len(budget),
-                "percentage": round(len(budget)/total*100, 1) if total > 0 else 0,
-                "avg_price": round(sum(r.avg_price for r in budget)/len(budget), 2) if budget else 0,
-                "range": "< ₹300"
-            },
-            "mid_range": {
-                "count": len(mid_range),
-                "percentage": round(len(mid_range)/total*100, 1) if total > 0 else 0,
-                "avg_price": round(sum(r.avg_price for r in mid_range)/len(mid_range), 2) if mid_range else 0,
-                "range": "₹300 - ₹600"
-            },
-            "premium": {
-                "count": len(premium),
-                "percentage": round(len(premium)/total*100, 1) if total > 0 else 0,
-                "avg_price": round(sum(r.avg_price for r in premium)/len(premium), 2) if premium else 0,
-                "range": "> ₹600"
-            }
+            "budget": price_range(0, "< ₹300"),
+            "mid_range": price_range(1, "₹300 - ₹600"),
+            "premium": price_range(2, "> ₹600")
         },
-        "avg_spending_index": round(sum(r.spending_index for r in restaurants)/total, 2) if total > 0 else 0
+        "avg_spending_index": round(float(spending_total) / total, 2) if total > 0 else 0
     }
 
 
 @router.get("/top-cuisines")
-async def get_top_cuisines(
+@report_cache.register("top-cuisines", limit=10)
+@single_flight
+def get_top_cuisines(
     city: Optional[str] = Query(None, description="Filter by city"),
     limit: int = Query(10, description="Number of top cuisines to return"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get top cuisines by rating and popularity.
     """
     query = db.query(
-        Restaurant.cuisine,
+        Restaurant.cuisine_id,
         func.count(Restaurant.id).label('count'),
         func.avg(Restaurant.rating).label('avg_rating'),
         func.avg(Restaurant.avg_price).label('avg_price')
-    ).group_by(Restaurant.cuisine)
+    ).group_by(Restaurant.cuisine_id)
     
     if city:
-        query = query.filter(Restaurant.city == city)
+        query = query.filter(Restaurant.city_id == dimension_key(City, city))
     
-    results = query.order_by(desc('count')).limit(limit).all()
+    # Aggregate on cuisine keys, then look up names for the returned rows only
+    stats = query.order_by(desc('count')).limit(limit).subquery()
+    results = db.query(
+        Cuisine.name.label('cuisine'), stats.c.count, stats.c.avg_rating, stats.c.avg_price
+    ).join(stats, stats.c.cuisine_id == Cuisine.id).order_by(desc(stats.c.count)).all()
     
     top_cuisines = [
         {
@@ -168,10 +189,15 @@ async def get_top_cuisines(
 
 
 @router.get("/city-comparison")
-async def get_city_comparison(db: Session = Depends(get_db)):
+@single_flight
+def get_city_comparison(db: Session = Depends(get_read_db)):
     """
     Compare all Tamil Nadu cities in the platform.
     """
+    snapshot = snapshot_store.current()
+    if snapshot is not None:
+        return city_comparison_from_snapshot(snapshot)
+    
     cities_data = []
     
     cities = db.query(Restaurant.city).distinct().all()
@@ -200,22 +226,28 @@ async def get_city_comparison(db: Session = Depends(get_db)):
 
 
 @router.get("/top-rated")
-async def get_top_rated_restaurants(
+@report_cache.register("top-rated", limit=10)
+@single_flight
+def get_top_rated_restaurants(
     city: Optional[str] = Query(None, description="Filter by city"),
     limit: int = Query(10, description="Number of restaurants to return"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get top-rated restaurants.
+    
+    Ranked by a Bayesian average that pulls ratings with few reviews
+    towards the city's mean rating.
     """
     query = db.query(Restaurant).filter(Restaurant.review_count > 0)
     
     if city:
         query = query.filter(Restaurant.city == city)
     
+    # Reads the (city, ranking_score, id) index backwards and stops after `limit`
     restaurants = query.order_by(
-        desc(Restaurant.rating),
-        desc(Restaurant.review_count)
+        desc(Restaurant.ranking_score),
+        desc(Restaurant.id)
     ).limit(limit).all()
     
     return {
@@ -229,6 +261,7 @@ async def get_top_rated_restaurants(
                 "cuisine": r.cuisine,
                 "rating": r.rating,
                 "review_count": r.review_count,
+                "ranking_score": round(r.ranking_score, 3) if r.ranking_score is not None else None,
                 "avg_price": r.avg_price
             }
             for r in restaurants
@@ -236,28 +269,91 @@ async def get_top_rated_restaurants(
     }
 
 
+@router.get("/top-k")
+@report_cache.register("top-k", group_by="area", k=3)
+@single_flight
+def get_top_k_per_group(
+    group_by: str = Query("area", description="Comma-separated dimensions: city, area, cuisine, price_band"),
+    k: int = Query(3, ge=1, le=MAX_TOPK, description="Restaurants per group"),
+    city: Optional[str] = Query(None, description="Filter by city"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the top-k restaurants of every group, e.g. the best 3 per area.
+    
+    Uses the same Bayesian ranking as top-rated; all groups are ranked in a
+    single pass instead of one query per group. Grouping by area also
+    groups by city.
+    """
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in dimensions if name not in TOPK_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown dimensions: {', '.join(unknown)}"
+        )
+    # Areas are only unique within a city; canonical order for the cache key
+    if "area" in dimensions:
+        dimensions.append("city")
+    dimensions = [dim for dim in TOPK_DIMENSIONS if dim in dimensions]
+    
+    groups = top_k(db, dimensions, k, city)
+    
+    return {
+        "city": city or "All Cities",
+        "group_by": dimensions,
+        "k": k,
+        "groups": [
+            {
+                **dict(zip(dimensions, labels)),
+                "top_rated": [
+                    {
+                        "rank": rank,
+                        "id": r.id,
+                        "name": r.name,
+                        "city": r.city,
+                        "area": r.area,
+                        "cuisine": r.cuisine,
+                        "rating": r.rating,
+                        "review_count": r.review_count,
+                        "ranking_score": round(r.ranking_score, 3) if r.ranking_score is not None else None,
+                        "avg_price": r.avg_price
+                    }
+                    for rank, r in enumerate(restaurants, start=1)
+                ]
+            }
+            for labels, restaurants in groups
+        ],
+        "total_groups": len(groups)
+    }
+
+
 @router.get("/area-insights")
-async def get_area_insights(
+@report_cache.register("area-insights")
+@single_flight
+def get_area_insights(
     city: str = Query(..., description="City name"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get insights for different areas within a city.
     Helps identify high-demand localities.
     """
-    areas = db.query(
-        Restaurant.area,
+    stats = db.query(
+        Restaurant.area_id,
         func.count(Restaurant.id).label('count'),
         func.avg(Restaurant.rating).label('avg_rating'),
         func.avg(Restaurant.avg_price).label('avg_price'),
         func.avg(Restaurant.spending_index).label('avg_spending_index')
     ).filter(
-        Restaurant.city == city
+        Restaurant.city_id == dimension_key(City, city)
     ).group_by(
-        Restaurant.area
-    ).order_by(
-        desc('count')
-    ).all()
+        Restaurant.area_id
+    ).subquery()
+    
+    areas = db.query(
+        Area.name.label('area'), stats.c.count, stats.c.avg_rating, stats.c.avg_price, stats.c.avg_spending_index
+    ).join(stats, stats.c.area_id == Area.id).order_by(desc(stats.c.count)).all()
     
     area_data = [
         {
@@ -281,27 +377,437 @@ async def get_area_insights(
     }
 
 
+@router.get("/micro-markets")
+@single_flight
+def get_micro_markets(
+    city: str = Query(..., description="City name"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get insights for the spatial micro-markets of a city.
+    
+    Micro-markets are clusters of restaurant coordinates found by the
+    utils/micro_markets.py batch job, so they can span several areas.
+    """
+    city_key = dimension_key(City, city)
+    stats = db.query(
+        Restaurant.micro_market_id,
+        func.count(Restaurant.id).label('count'),
+        func.avg(Restaurant.rating).label('avg_rating'),
+        func.avg(Restaurant.avg_price).label('avg_price'),
+        func.avg(Restaurant.spending_index).label('avg_spending_index')
+    ).filter(
+        Restaurant.city_id == city_key,
+        Restaurant.micro_market_id.isnot(None)
+    ).group_by(
+        Restaurant.micro_market_id
+    ).subquery()
+    
+    markets = db.query(
+        MicroMarket, stats.c.count, stats.c.avg_rating, stats.c.avg_price, stats.c.avg_spending_index
+    ).join(stats, stats.c.micro_market_id == MicroMarket.id).order_by(MicroMarket.label).all()
+    
+    # Areas and cuisines per micro-market, most common first
+    breakdowns = {}
+    for dimension, model, key in (("areas", Area, Restaurant.area_id), ("cuisines", Cuisine, Restaurant.cuisine_id)):
+        counts = db.query(
+            Restaurant.micro_market_id, model.name, func.count(Restaurant.id).label('count')
+        ).join(model, model.id == key).filter(
+            Restaurant.city_id == city_key,
+            Restaurant.micro_market_id.isnot(None)
+        ).group_by(Restaurant.micro_market_id, model.name).order_by(desc('count'), model.name)
+        for market_id, name, count in counts:
+            breakdowns.setdefault((market_id, dimension), []).append({"name": name, "count": count})
+    
+    unclustered = db.query(func.count(Restaurant.id)).filter(
+        Restaurant.city_id == city_key,
+        Restaurant.micro_market_id.is_(None)
+    ).scalar()
+    
+    market_data = [
+        {
+            "id": m.id,
+            "label": m.label,
+            "latitude": round(m.latitude, 6),
+            "longitude": round(m.longitude, 6),
+            "radius_km": m.radius_km,
+            "restaurant_count": count,
+            "avg_rating": round(avg_rating or 0, 2),
+            "avg_price": round(avg_price or 0, 2),
+            "spending_index": round(avg_spending_index or 0, 2),
+            "demand_score": round(count * (avg_rating or 0) * (avg_spending_index or 0), 2),
+            "areas": breakdowns.get((m.id, "areas"), []),
+            "top_cuisines": breakdowns.get((m.id, "cuisines"), [])[:5],
+            "computed_at": m.computed_at
+        }
+        for m, count, avg_rating, avg_price, avg_spending_index in markets
+    ]
+    
+    # Sort by demand score
+    market_data.sort(key=lambda x: x["demand_score"], reverse=True)
+    
+    return {
+        "city": city,
+        "micro_markets": market_data,
+        "total_micro_markets": len(market_data),
+        "unclustered_restaurants": unclustered
+    }
+
+
+@router.get("/heatmap")
+def get_heatmap_index(
+    city: str = Query(..., description="City name"),
+    cuisine: Optional[str] = Query(None, description="Cuisine type; all cuisines if omitted"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    List the precomputed heatmap tiles of a city (optionally one cuisine).
+    
+    Each tile's version changes only when restaurants inside it change;
+    request tiles with `v=<version>` to get immutable cache headers.
+    """
+    tiles = heatmap_store.current(db).layer(city, cuisine)
+    
+    return {
+        "city": city,
+        "cuisine": cuisine,
+        "zooms": HEATMAP_ZOOMS,
+        "grid": HEATMAP_GRID,
+        "format": f"gzip; uint32 counts[{HEATMAP_GRID}x{HEATMAP_GRID}] then float32 avg_price[{HEATMAP_GRID}x{HEATMAP_GRID}], little-endian, row-major from the north-west corner",
+        "tiles": [
+            {"zoom": z, "x": x, "y": y, "restaurant_count": tile.count, "version": tile.version}
+            for (z, x, y), tile in sorted(tiles.items())
+        ]
+    }
+
+
+@router.get("/heatmap/{zoom}/{x}/{y}")
+def get_heatmap_tile(
+    request: Request,
+    zoom: int,
+    x: int,
+    y: int,
+    city: str = Query(..., description="City name"),
+    cuisine: Optional[str] = Query(None, description="Cuisine type; all cuisines if omitted"),
+    v: Optional[str] = Query(None, description="Tile version from the heatmap index"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get one heatmap tile as binary arrays of restaurant counts and average
+    prices. Tiles without restaurants return 204.
+    """
+    if zoom not in HEATMAP_ZOOMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"zoom must be one of: {', '.join(map(str, HEATMAP_ZOOMS))}"
+        )
+    
+    tile = heatmap_store.current(db).tiles.get((city, cuisine, zoom, x, y))
+    if tile is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Cache-Control": "public, max-age=60"})
+    
+    # Versioned URLs never change content; unversioned ones revalidate by ETag
+    headers = {
+        "ETag": f'"{tile.version}"',
+        "Cache-Control": "public, max-age=31536000, immutable" if v == tile.version else "public, max-age=60",
+        "Vary": "Accept-Encoding",
+        "X-Tile-Grid": str(HEATMAP_GRID)
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(tile.body, media_type="application/octet-stream", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(tile.raw(), media_type="application/octet-stream", headers=headers)
+
+
+@router.get("/dishes")
+@single_flight
+def get_dish_trends(
+    city: Optional[str] = Query(None, description="Filter by city"),
+    terms: Optional[str] = Query(None, description="Comma-separated dishes or keywords (one or two words each); popular dishes if omitted"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get dish and keyword mentions per city over time.
+    
+    Counts restaurant descriptions and review comments mentioning each term,
+    with their average ratings and a monthly timeline of review mentions,
+    read from the text index's posting lists.
+    """
+    requested = [term.strip() for term in (terms.split(",") if terms else DISHES) if term.strip()]
+    normalized = {term: " ".join(tokenize(term)) for term in requested}
+    invalid = [term for term, normal in normalized.items() if not 1 <= len(normal.split()) <= 2]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Terms must be one or two words: {', '.join(invalid)}"
+        )
+    # Normalized term -> the name it was first requested as
+    names = {}
+    for term in requested:
+        names.setdefault(normalized[term], term)
+    term_keys = list(names)
+    
+    def postings(source):
+        query = db.query(TextPosting.term).join(Restaurant, Restaurant.id == TextPosting.restaurant_id).filter(
+            TextPosting.source == source,
+            TextPosting.term.in_(term_keys)
+        )
+        if city:
+            query = query.filter(Restaurant.city_id == dimension_key(City, city))
+        return query
+    
+    restaurant_mentions = postings("restaurant").with_entities(
+        TextPosting.term, Restaurant.city_id, func.count(TextPosting.document_id), func.avg(Restaurant.rating)
+    ).group_by(TextPosting.term, Restaurant.city_id).all()
+    
+    month = month_expression(db.connection(), Review.created_at)
+    review_mentions = postings("review").join(Review, Review.id == TextPosting.document_id).with_entities(
+        TextPosting.term, Restaurant.city_id, month, func.count(TextPosting.document_id), func.avg(Review.rating)
+    ).group_by(TextPosting.term, Restaurant.city_id, month).order_by(month).all()
+    
+    city_names = dict(db.query(City.id, City.name))
+    cells = {}  # (term, city) -> stats
+    
+    def cell(term, city_id):
+        return cells.setdefault((term, city_names.get(city_id)), {
+            "restaurant_mentions": 0, "avg_restaurant_rating": 0,
+            "review_mentions": 0, "review_rating_sum": 0.0, "timeline": []
+        })
+    
+    for term, city_id, count, avg_rating in restaurant_mentions:
+        stats = cell(term, city_id)
+        stats["restaurant_mentions"] = count
+        stats["avg_restaurant_rating"] = round(avg_rating or 0, 2)
+    
+    for term, city_id, review_month, count, avg_rating in review_mentions:
+        stats = cell(term, city_id)
+        stats["review_mentions"] += count
+        stats["review_rating_sum"] += (avg_rating or 0) * count
+        stats["timeline"].append({"month": str(review_month), "mentions": count, "avg_rating": round(avg_rating or 0, 2)})
+    
+    for stats in cells.values():
+        rating_sum = stats.pop("review_rating_sum")
+        stats["avg_review_rating"] = round(rating_sum / stats["review_mentions"], 2) if stats["review_mentions"] else 0
+    
+    dishes = []
+    for term in term_keys:
+        by_city = [
+            {"city": cell_city, **stats}
+            for (cell_term, cell_city), stats in sorted(cells.items(), key=lambda item: str(item[0][1]))
+            if cell_term == term
+        ]
+        dishes.append({
+            "dish": names[term],
+            "term": term,
+            "restaurant_mentions": sum(c["restaurant_mentions"] for c in by_city),
+            "review_mentions": sum(c["review_mentions"] for c in by_city),
+            "cities": by_city
+        })
+    
+    # Most mentioned first
+    dishes.sort(key=lambda x: x["restaurant_mentions"] + x["review_mentions"], reverse=True)
+    
+    return {
+        "city": city or "All Cities",
+        "dishes": dishes
+    }
+
+
+@router.get("/histogram")
+@single_flight
+def get_histogram(
+    measure: str = Query("avg_price", description="avg_price, rating, spending_index or review_count"),
+    edges: Optional[str] = Query(None, description="Comma-separated increasing bin edges"),
+    group_by: Optional[str] = Query(None, description="Break down by city, area or cuisine"),
+    city: Optional[str] = Query(None, description="Filter by city"),
+    cuisine: Optional[str] = Query(None, description="Filter by cuisine"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Distribution of a restaurant measure over arbitrary bins.
+    
+    Each bin has its count, share, average value and the cumulative
+    distribution up to it, overall and per group when `group_by` is set.
+    """
+    if measure not in HISTOGRAM_MEASURES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown measure: {measure}"
+        )
+    if group_by and group_by not in HISTOGRAM_GROUPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot group by: {group_by}"
+        )
+    
+    if edges:
+        try:
+            bin_edges = [float(edge) for edge in edges.split(",") if edge.strip()]
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Bin edges must be numbers"
+            )
+    else:
+        bin_edges = HISTOGRAM_MEASURES[measure]
+    
+    if not 0 < len(bin_edges) <= MAX_BIN_EDGES or any(a >= b for a, b in zip(bin_edges, bin_edges[1:])):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Provide 1 to {MAX_BIN_EDGES} strictly increasing bin edges"
+        )
+    
+    groups = histogram(db, measure, bin_edges, group_by, city=city, cuisine=cuisine)
+    counts, sums = overall(groups, len(bin_edges) + 1)
+    
+    result = {
+        "measure": measure,
+        "edges": bin_edges,
+        "city": city or "All Cities",
+        "cuisine": cuisine or "All",
+        "total": int(counts.sum()),
+        "bins": histogram_bins(bin_edges, counts, sums)
+    }
+    if group_by:
+        result["group_by"] = group_by
+        result["groups"] = [
+            {"group": group, "total": int(group_counts.sum()), "bins": histogram_bins(bin_edges, group_counts, group_sums)}
+            for group, (group_counts, group_sums) in sorted(groups.items())
+        ]
+    return result
+
+
+@router.get("/percentiles")
+def get_percentiles(
+    measure: str = Query("avg_price", description="avg_price or rating"),
+    percentiles: str = Query("10,25,50,75,90,95,99", description="Comma-separated percentiles between 0 and 100"),
+    group_by: Optional[str] = Query(None, description="Break down by city, area or cuisine"),
+    city: Optional[str] = Query(None, description="Filter by city"),
+    area: Optional[str] = Query(None, description="Filter by area"),
+    cuisine: Optional[str] = Query(None, description="Filter by cuisine"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Price or rating percentiles for any slice of the market.
+    
+    Answered from t-digest sketches kept per city, area and cuisine and
+    merged for roll-ups, so results are approximate for large slices.
+    """
+    if measure not in SKETCH_MEASURES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown measure: {measure}"
+        )
+    if group_by and group_by not in SKETCH_DIMENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot group by: {group_by}"
+        )
+    try:
+        points = [float(p) for p in percentiles.split(",") if p.strip()]
+    except ValueError:
+        points = []
+    if not points or any(not 0 <= p <= 100 for p in points):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Percentiles must be numbers between 0 and 100"
+        )
+    
+    def summary(digest):
+        values = digest.quantiles([p / 100 for p in points])
+        return {
+            "count": digest.count,
+            "percentiles": {
+                f"p{p:g}": round(value, 2) if value is not None else None
+                for p, value in zip(points, values)
+            }
+        }
+    
+    index = sketch_store.current(db)
+    filters = {"city": city, "area": area, "cuisine": cuisine}
+    totals = index.query(measure, None, **filters)
+    
+    result = {
+        "measure": measure,
+        "city": city or "All Cities",
+        "area": area or "All",
+        "cuisine": cuisine or "All",
+        **summary(totals.get(None) or TDigest([], []))
+    }
+    if group_by:
+        result["group_by"] = group_by
+        result["groups"] = [
+            {"group": group, **summary(digest)}
+            for group, digest in sorted(index.query(measure, group_by, **filters).items())
+        ]
+    return result
+
+
+@router.get("/cube")
+def query_cube(
+    group_by: Optional[str] = Query(None, description="Comma-separated dimensions: city, area, cuisine, price_band"),
+    city: Optional[str] = Query(None, description="Comma-separated cities to slice on"),
+    area: Optional[str] = Query(None, description="Comma-separated areas to slice on"),
+    cuisine: Optional[str] = Query(None, description="Comma-separated cuisines to slice on"),
+    price_band: Optional[str] = Query(None, description="Comma-separated bands: budget, mid_range, premium"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of cells"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Query the market cube over city × area × cuisine × price band.
+    
+    Group by any subset of dimensions to roll up or drill down, and filter
+    dimensions to slice or dice. Each cell has the restaurant count and the
+    sum, average and standard deviation of price, rating and spending index.
+    """
+    dimensions = [name.strip() for name in (group_by or "").split(",") if name.strip()]
+    unknown = [name for name in dimensions if name not in CUBE_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown dimensions: {', '.join(unknown)}"
+        )
+    
+    filters = {
+        dim: [label.strip() for label in value.split(",") if label.strip()]
+        for dim, value in (("city", city), ("area", area), ("cuisine", cuisine), ("price_band", price_band))
+        if value
+    }
+    
+    cells = cube_store.current(db).query(dimensions, filters, limit)
+    
+    return {
+        "group_by": dimensions,
+        "filters": filters,
+        "cells": cells,
+        "total_cells": len(cells)
+    }
+
+
 @router.get("/dashboard-stats")
-async def get_dashboard_stats(
+def get_dashboard_stats(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get comprehensive dashboard statistics.
     Requires authentication.
     """
     total_restaurants = db.query(Restaurant).count()
-    total_reviews = db.query(Review).count()
-    total_cities = db.query(Restaurant.city).distinct().count()
+    # Summed from the monthly rollups; counting the reviews table scans every partition
+    total_reviews = db.query(func.coalesce(func.sum(ReviewRollup.review_count), 0)).scalar()
+    total_cities = db.query(Restaurant.city_id).distinct().count()
     
     avg_rating = db.query(func.avg(Restaurant.rating)).scalar() or 0
     avg_price = db.query(func.avg(Restaurant.avg_price)).scalar() or 0
     
     # Top cuisine
-    top_cuisine = db.query(
-        Restaurant.cuisine,
-        func.count(Restaurant.id).label('count')
-    ).group_by(Restaurant.cuisine).order_by(desc('count')).first()
+    top_cuisine_id = db.query(
+        Restaurant.cuisine_id
+    ).group_by(Restaurant.cuisine_id).order_by(desc(func.count(Restaurant.id))).limit(1).scalar_subquery()
+    top_cuisine = db.query(Cuisine.name.label('cuisine')).filter(Cuisine.id == top_cuisine_id).first()
     
     # Most reviewed restaurant
     most_reviewed = db.query(Restaurant).order_by(desc(Restaurant.review_count)).first()
@@ -326,3 +832,146 @@ async def get_dashboard_stats(
             "role": current_user.role
         }
     }
+
+
+# Snapshot-backed computations: vectorized over the memory-mapped columns
+# and producing the same payloads as the SQL paths above
+
+def trends_from_snapshot(snapshot, city: Optional[str]):
+    """get_trends computed from the columnar snapshot."""
+    mask = snapshot.mask(city=city)
+    total = int(mask.sum())
+    
+    if not total:
+        return {
+            "city": city or "All Cities",
+            "total_restaurants": 0,
+            "top_cuisines": [],
+            "avg_price": 0,
+            "avg_rating": 0
+        }
+    
+    labels = snapshot.labels["cuisine"]
+    cuisines, first_seen, counts = np.unique(snapshot["cuisine"][mask], return_index=True, return_counts=True)
+    # Most common first; ties in order of first appearance, as in the SQL path
+    order = np.lexsort((first_seen, -counts))[:10]
+    
+    return {
+        "city": city or "All Cities",
+        "total_restaurants": total,
+        "top_cuisines": [
+            {"cuisine": labels[cuisines[i]], "count": int(counts[i]), "percentage": round(int(counts[i]) / total * 100, 1)}
+            for i in order
+        ],
+        "avg_price": round(float(snapshot["avg_price"][mask].sum()) / total, 2),
+        "avg_rating": round(float(snapshot["rating"][mask].sum()) / total, 2)
+    }
+
+
+def city_comparison_from_snapshot(snapshot):
+    """get_city_comparison computed from the columnar snapshot in one pass per measure."""
+    cities = snapshot["city"]
+    n_cities = len(snapshot.labels["city"])
+    counts = np.bincount(cities, minlength=n_cities)
+    sums = {
+        name: np.bincount(cities, weights=snapshot[name], minlength=n_cities)
+        for name in ("rating", "avg_price", "spending_index")
+    }
+    
+    # Restaurants per (city, cuisine) to find each city's top cuisine
+    n_cuisines = len(snapshot.labels["cuisine"])
+    pairs = np.bincount(
+        cities.astype(np.int64) * n_cuisines + snapshot["cuisine"],
+        minlength=n_cities * n_cuisines
+    ).reshape(n_cities, n_cuisines)
+    
+    cities_data = [
+        {
+            "city": snapshot.labels["city"][i],
+            "total_restaurants": int(counts[i]),
+            "avg_rating": round(float(sums["rating"][i]) / counts[i], 2),
+            "avg_price": round(float(sums["avg_price"][i]) / counts[i], 2),
+            "spending_index": round(float(sums["spending_index"][i]) / counts[i], 2),
+            "top_cuisine": snapshot.labels["cuisine"][int(pairs[i].argmax())]
+        }
+        for i in range(n_cities) if counts[i]
+    ]
+    cities_data.sort(key=lambda x: x["total_restaurants"], reverse=True)
+    
+    return {
+        "cities": cities_data,
+        "total_cities": len(cities_data)
+    }
+
+
+def build_city_snapshot(city: str):
+    """
+    Compute the live analytics pushed to stream subscribers of a city.
+    Bypasses the report cache so pushes always reflect the latest write.
+    """
+    db = read_session()
+    try:
+        return jsonable_encoder({
+            "city": city,
+            "trends": inspect.unwrap(get_trends)(city=city, db=db),
+            "spending": inspect.unwrap(get_spending_analysis)(city=city, db=db),
+            "top_cuisines": inspect.unwrap(get_top_cuisines)(city=city, limit=10, db=db)
+        })
+    finally:
+        db.close()
+
+
+async def compute_city_snapshot(city: str):
+    """Build a city snapshot off the event loop."""
+    return await run_in_threadpool(build_city_snapshot, city)
+
+
+def data_version():
+    """
+    Token that changes when restaurants were written by any worker: the
+    published snapshot version, or the table watermark without snapshots.
+    """
+    snapshot = snapshot_store.current()
+    if snapshot is not None:
+        return snapshot.version
+    db = read_session()
+    try:
+        return table_watermark(db)
+    finally:
+        db.close()
+
+
+# Fans out one snapshot computation per city change to all stream clients
+analytics_stream = CityBroadcaster(compute_city_snapshot, version=data_version, poll_interval=STREAM_POLL_SECONDS)
+
+
+@router.get("/stream")
+async def stream_city_analytics(
+    request: Request,
+    city: str = Query(..., description="City name")
+):
+    """
+    Server-sent events stream of a city's analytics.
+    
+    Sends the current trends, spending and top cuisines on connect, then
+    a fresh snapshot whenever a restaurant write changes the city.
+    """
+    queue = analytics_stream.subscribe(city)
+    
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: analytics\ndata: {json.dumps(snapshot)}\n\n"
+        finally:
+            analytics_stream.unsubscribe(city, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -96,6 +96,11 @@ async def get_current_user(
     user = get_user_by_username(db, username=token_data.username)
     if user is None:
         raise credentials_exception
+    
+    # Detach the loaded user and end the read transaction so the connection
+    # returns to the pool instead of being held for the rest of the request
+    db.expunge(user)
+    db.commit()
     return user
 
 
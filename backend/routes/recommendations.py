@@ -6,18 +6,22 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import Optional
-from database import get_db
-from models import Restaurant, User
+from database import get_read_db
+from models import Restaurant, User, City, Area, Cuisine, dimension_key
 from routes.auth import get_current_active_user
+from utils.singleflight import single_flight
+from utils.reports import report_cache
+from utils.snapshot import snapshot_store
 
 router = APIRouter(prefix="/api/recommendations", tags=["Recommendations"])
 
 
 @router.get("/best-locations")
-async def get_best_locations(
+@single_flight
+def get_best_locations(
     city: str = Query(..., description="City name"),
     cuisine: Optional[str] = Query(None, description="Cuisine type"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get best locations for opening a new restaurant.
@@ -30,17 +34,21 @@ async def get_best_locations(
     """
     # Get all areas in the city
     query = db.query(
-        Restaurant.area,
+        Restaurant.area_id,
         func.count(Restaurant.id).label('restaurant_count'),
         func.avg(Restaurant.rating).label('avg_rating'),
         func.avg(Restaurant.avg_price).label('avg_price'),
         func.avg(Restaurant.spending_index).label('avg_spending_index')
-    ).filter(Restaurant.city == city)
+    ).filter(Restaurant.city_id == dimension_key(City, city))
     
     if cuisine:
-        query = query.filter(Restaurant.cuisine == cuisine)
+        query = query.filter(Restaurant.cuisine_id == dimension_key(Cuisine, cuisine))
     
-    areas = query.group_by(Restaurant.area).all()
+    stats = query.group_by(Restaurant.area_id).subquery()
+    areas = db.query(
+        Area.name.label('area'), stats.c.restaurant_count, stats.c.avg_rating,
+        stats.c.avg_price, stats.c.avg_spending_index
+    ).join(stats, stats.c.area_id == Area.id).order_by(Area.name).all()
     
     recommendations = []
     
@@ -80,9 +88,11 @@ async def get_best_locations(
 
 
 @router.get("/market-gaps")
-async def find_market_gaps(
+@report_cache.register("market-gaps")
+@single_flight
+def find_market_gaps(
     city: str = Query(..., description="City name"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Identify underserved cuisines and areas.
@@ -90,14 +100,19 @@ async def find_market_gaps(
     Helps entrepreneurs find market gaps and opportunities.
     """
     # Get all cuisines in the city
-    cuisine_distribution = db.query(
-        Restaurant.cuisine,
+    city_id = dimension_key(City, city)
+    counts = db.query(
+        Restaurant.cuisine_id,
         func.count(Restaurant.id).label('count')
     ).filter(
-        Restaurant.city == city
+        Restaurant.city_id == city_id
     ).group_by(
-        Restaurant.cuisine
-    ).all()
+        Restaurant.cuisine_id
+    ).subquery()
+    
+    cuisine_distribution = db.query(
+        Cuisine.name.label('cuisine'), counts.c.count
+    ).join(counts, counts.c.cuisine_id == Cuisine.id).order_by(Cuisine.name).all()
     
     total_restaurants = sum(c.count for c in cuisine_distribution)
     
@@ -119,17 +134,21 @@ async def find_market_gaps(
     cuisine_analysis.sort(key=lambda x: x["restaurant_count"])
     
     # Area analysis
-    area_gaps = db.query(
-        Restaurant.area,
-        func.count(func.distinct(Restaurant.cuisine)).label('cuisine_variety'),
+    gaps = db.query(
+        Restaurant.area_id,
+        func.count(func.distinct(Restaurant.cuisine_id)).label('cuisine_variety'),
         func.count(Restaurant.id).label('restaurant_count')
     ).filter(
-        Restaurant.city == city
+        Restaurant.city_id == city_id
     ).group_by(
-        Restaurant.area
+        Restaurant.area_id
     ).having(
         func.count(Restaurant.id) < 5  # Areas with low competition
-    ).all()
+    ).subquery()
+    
+    area_gaps = db.query(
+        Area.name.label('area'), gaps.c.cuisine_variety, gaps.c.restaurant_count
+    ).join(gaps, gaps.c.area_id == Area.id).order_by(Area.name).all()
     
     underserved_areas = [
         {
@@ -154,10 +173,11 @@ async def find_market_gaps(
 
 
 @router.get("/similar-restaurants")
-async def get_similar_restaurants(
+@single_flight
+def get_similar_restaurants(
     restaurant_id: int = Query(..., description="Restaurant ID"),
     limit: int = Query(5, ge=1, le=20, description="Number of similar restaurants"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Find similar restaurants based on cuisine, price, and location.
@@ -170,8 +190,8 @@ async def get_similar_restaurants(
     # Find similar restaurants
     similar = db.query(Restaurant).filter(
         Restaurant.id != restaurant_id,
-        Restaurant.cuisine == restaurant.cuisine,
-        Restaurant.city == restaurant.city,
+        Restaurant.cuisine_id == restaurant.cuisine_id,
+        Restaurant.city_id == restaurant.city_id,
         Restaurant.is_active == True
     ).all()
     
@@ -215,27 +235,37 @@ async def get_similar_restaurants(
 
 
 @router.get("/investment-insights")
-async def get_investment_insights(
+@single_flight
+def get_investment_insights(
     city: str = Query(..., description="City name"),
     budget: float = Query(..., gt=0, description="Investment budget in INR"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get investment insights and ROI predictions.
     Requires authentication.
     """
     # Analyze market conditions
-    restaurants = db.query(Restaurant).filter(Restaurant.city == city).all()
+    snapshot = snapshot_store.current()
+    if snapshot is not None:
+        mask = snapshot.mask(city=city)
+        restaurant_count = int(mask.sum())
+        if restaurant_count:
+            avg_price = float(snapshot["avg_price"][mask].mean())
+            avg_rating = float(snapshot["rating"][mask].mean())
+            avg_spending = float(snapshot["spending_index"][mask].mean())
+    else:
+        restaurants = db.query(Restaurant).filter(Restaurant.city_id == dimension_key(City, city)).all()
+        restaurant_count = len(restaurants)
+        if restaurant_count:
+            avg_price = sum(r.avg_price for r in restaurants) / restaurant_count
+            avg_rating = sum(r.rating for r in restaurants) / restaurant_count
+            avg_spending = sum(r.spending_index for r in restaurants) / restaurant_count
     
-    if not restaurants:
+    if not restaurant_count:
         return {"error": f"No data available for {city}"}
     
-    # Calculate market metrics
-    avg_price = sum(r.avg_price for r in restaurants) / len(restaurants)
-    avg_rating = sum(r.rating for r in restaurants) / len(restaurants)
-    avg_spending = sum(r.spending_index for r in restaurants) / len(restaurants)
-    
     # Budget categorization
     if budget < 1000000:  # < 10 lakhs
         category = "Small Scale"
@@ -262,7 +292,7 @@ async def get_investment_insights(
             "avg_price_point": round(avg_price, 2),
             "avg_market_rating": round(avg_rating, 2),
             "spending_index": round(avg_spending, 2),
-            "competition_level": "High" if len(restaurants) > 100 else "Medium" if len(restaurants) > 50 else "Low"
+            "competition_level": "High" if restaurant_count > 100 else "Medium" if restaurant_count > 50 else "Low"
         },
         "roi_projection": {
             "estimated_monthly_revenue": round(estimated_monthly_revenue, 2),
@@ -3,14 +3,140 @@ Restaurant routes for Nativore platform.
 CRUD operations for restaurants.
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, insert, update, or_, and_
 from sqlalchemy.orm import Session
+from datetime import datetime
 from typing import List, Optional
-from database import get_db
-from models import Restaurant, RestaurantCreate, RestaurantResponse, User
+from database import get_db, get_read_db, may_lag, settled_before
+from models import (
+    Restaurant, City, Cuisine, RestaurantCreate, RestaurantUpsert, RestaurantResponse, User,
+    assign_dimension_keys, bayesian_score, city_prior, index_documents
+)
 from routes.auth import get_current_active_user
+from routes.analytics import analytics_stream
+from utils.cache import restaurant_cache
+from utils.reports import report_cache
+from utils.snapshot import snapshot_store
+from utils.cube import cube_store
+from utils.sketches import sketch_store
+from utils.heatmap import heatmap_store
+from utils.search import search_index, MAX_SEARCH_RESULTS
+from utils.singleflight import single_flight
 
 router = APIRouter(prefix="/api/restaurants", tags=["Restaurants"])
 
+# Columns a client may request through the `fields` parameter
+RESTAURANT_FIELDS = list(Restaurant.__table__.columns.keys())
+
+# Columns returned by the search endpoint when no fields are requested
+SEARCH_FIELDS = ["id", "name", "city", "area", "cuisine", "rating", "avg_price"]
+
+# Maximum number of IDs accepted by the batch endpoint
+MAX_BATCH_IDS = 500
+
+# Maximum number of rows returned by one delta sync page
+MAX_CHANGES_PAGE = 1000
+
+# Bulk write limits: items per request and rows per executemany statement
+MAX_BULK_ITEMS = 10000
+BULK_CHUNK_SIZE = 1000
+
+
+def parse_fields(fields: Optional[str]):
+    """
+    Parse a comma-separated `fields` parameter into Restaurant columns.
+    Returns None when no projection was requested. `id` is always included.
+    """
+    if not fields:
+        return None
+
+    names = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+
+    unknown = [name for name in names if name not in RESTAURANT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+
+    return [getattr(Restaurant, name) for name in names]
+
+
+def chunked(items, size=BULK_CHUNK_SIZE):
+    """Yield successive slices of `items` with at most `size` elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def require_admin(user: User, action: str):
+    """Raise 403 unless the user is an admin."""
+    if user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Only admins can {action} restaurants"
+        )
+
+
+def check_bulk_size(items):
+    """Reject bulk requests that are empty or too large."""
+    if not items or len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bulk requests must contain between 1 and {MAX_BULK_ITEMS} items"
+        )
+
+
+def bulk_insert(db: Session, rows):
+    """Insert rows in chunked executemany statements, returning new IDs in order."""
+    ids = []
+    connection = db.connection()
+    assign_dimension_keys(connection, rows)
+    for row in rows:
+        row["ranking_score"] = bayesian_score(
+            row.get("rating") or 0.0, row.get("review_count") or 0, city_prior(connection, row["city"])
+        )
+    stmt = insert(Restaurant).returning(Restaurant.id, sort_by_parameter_order=True)
+    for chunk in chunked(rows):
+        ids.extend(db.scalars(stmt, chunk).all())
+    index_documents(connection, "restaurant", [
+        (restaurant_id, restaurant_id, row.get("description")) for restaurant_id, row in zip(ids, rows)
+    ])
+    return ids
+
+
+def restaurants_changed(restaurant_ids=(), cities=()):
+    """
+    Invalidate caches and notify listeners after restaurants were written.
+    Call after commit with the touched IDs and every city they were or are in.
+    """
+    for restaurant_id in restaurant_ids:
+        restaurant_cache.delete(restaurant_id)
+    
+    cities = set(cities)
+    
+    def publish():
+        cube_store.invalidate()
+        sketch_store.invalidate()
+        heatmap_store.invalidate()
+        analytics_stream.notify(*cities)
+        for city in cities:
+            report_cache.refresh_city(city)
+    
+    # Analytics read the snapshot, so recompute once it includes this write
+    snapshot_store.request_rebuild(publish)
+
+
+def rows_to_dicts(rows, columns):
+    """Convert projected query rows into plain dictionaries."""
+    keys = [column.key for column in columns]
+    return [dict(zip(keys, row)) for row in rows]
+
 
 @router.get("/", response_model=List[RestaurantResponse])
 async def get_restaurants(
@@ -20,7 +146,8 @@ async def get_restaurants(
     max_price: Optional[float] = Query(None, gt=0, description="Maximum price"),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(50, ge=1, le=100, description="Number of records to return"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,name,rating,avg_price"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get list of restaurants with optional filters.
@@ -32,8 +159,14 @@ async def get_restaurants(
     - max_price: Maximum average price
     - skip: Pagination offset
     - limit: Number of results (max 100)
+    - fields: Only select and return these columns
     """
-    query = db.query(Restaurant).filter(Restaurant.is_active == True)
+    columns = parse_fields(fields)
+
+    if columns:
+        query = db.query(*columns).filter(Restaurant.is_active == True)
+    else:
+        query = db.query(Restaurant).filter(Restaurant.is_active == True)
     
     if city:
         query = query.filter(Restaurant.city == city)
@@ -49,18 +182,27 @@ async def get_restaurants(
     
     restaurants = query.offset(skip).limit(limit).all()
     
+    if columns:
+        return JSONResponse(content=jsonable_encoder(rows_to_dicts(restaurants, columns)))
+    
     return restaurants
 
 
 @router.get("/{restaurant_id}", response_model=RestaurantResponse)
 async def get_restaurant(
     restaurant_id: int,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a specific restaurant by ID.
     """
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+    columns = parse_fields(fields)
+    
+    if columns:
+        restaurant = db.query(*columns).filter(Restaurant.id == restaurant_id).first()
+    else:
+        restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
     
     if not restaurant:
         raise HTTPException(
@@ -68,6 +210,9 @@ async def get_restaurant(
             detail="Restaurant not found"
         )
     
+    if columns:
+        return JSONResponse(content=jsonable_encoder(rows_to_dicts([restaurant], columns)[0]))
+    
     return restaurant
 
 
@@ -81,16 +226,13 @@ async def create_restaurant(
     Create a new restaurant.
     Requires authentication. Admin only.
     """
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can create restaurants"
-        )
+    require_admin(current_user, "create")
     
     db_restaurant = Restaurant(**restaurant.dict())
     db.add(db_restaurant)
     db.commit()
     db.refresh(db_restaurant)
+    restaurants_changed([db_restaurant.id], [db_restaurant.city])
     
     return db_restaurant
 
@@ -106,11 +248,7 @@ async def update_restaurant(
     Update a restaurant.
     Requires authentication. Admin only.
     """
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can update restaurants"
-        )
+    require_admin(current_user, "update")
     
     db_restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
     
@@ -120,11 +258,13 @@ async def update_restaurant(
             detail="Restaurant not found"
         )
     
+    old_city = db_restaurant.city
     for key, value in restaurant.dict().items():
         setattr(db_restaurant, key, value)
     
     db.commit()
     db.refresh(db_restaurant)
+    restaurants_changed([restaurant_id], [old_city, db_restaurant.city])
     
     return db_restaurant
 
@@ -139,11 +279,7 @@ async def delete_restaurant(
     Delete a restaurant (soft delete by setting is_active to False).
     Requires authentication. Admin only.
     """
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can delete restaurants"
-        )
+    require_admin(current_user, "delete")
     
     db_restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
     
@@ -155,53 +291,333 @@ async def delete_restaurant(
     
     db_restaurant.is_active = False
     db.commit()
+    restaurants_changed([restaurant_id], [db_restaurant.city])
     
     return None
 
 
+@router.post("/bulk/create")
+async def bulk_create_restaurants(
+    restaurants: List[RestaurantCreate],
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create many restaurants in a single transaction.
+    Requires authentication. Admin only.
+    """
+    require_admin(current_user, "create")
+    check_bulk_size(restaurants)
+    
+    ids = bulk_insert(db, [r.dict() for r in restaurants])
+    db.commit()
+    restaurants_changed(ids, [r.city for r in restaurants])
+    
+    return {
+        "created": len(ids),
+        "results": [
+            {"index": index, "id": restaurant_id, "status": "created"}
+            for index, restaurant_id in enumerate(ids)
+        ]
+    }
+
+
+@router.post("/bulk/upsert")
+async def bulk_upsert_restaurants(
+    restaurants: List[RestaurantUpsert],
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create or update many restaurants in a single transaction.
+    
+    Items with an `id` update that restaurant; items without one are created.
+    Items whose `id` does not exist are reported as not_found and skipped.
+    Requires authentication. Admin only.
+    """
+    require_admin(current_user, "update")
+    check_bulk_size(restaurants)
+    
+    now = datetime.utcnow()
+    results = [None] * len(restaurants)
+    to_create = []
+    to_update = []
+    
+    update_ids = [r.id for r in restaurants if r.id is not None]
+    existing = {}  # id -> (current city, rating, review count)
+    for chunk in chunked(update_ids):
+        existing.update(
+            (row[0], tuple(row[1:])) for row in db.query(
+                Restaurant.id, Restaurant.city, Restaurant.rating, Restaurant.review_count
+            ).filter(Restaurant.id.in_(chunk))
+        )
+    
+    connection = db.connection()
+    for index, restaurant in enumerate(restaurants):
+        data = restaurant.dict()
+        if restaurant.id is None:
+            data.pop("id")
+            to_create.append((index, data))
+        elif restaurant.id in existing:
+            # Score against the prior of the (possibly new) city
+            _, rating, review_count = existing[restaurant.id]
+            data["ranking_score"] = bayesian_score(rating or 0.0, review_count or 0, city_prior(connection, data["city"]))
+            data["updated_at"] = now
+            to_update.append(data)
+            results[index] = {"index": index, "id": restaurant.id, "status": "updated"}
+        else:
+            results[index] = {"index": index, "id": restaurant.id, "status": "not_found"}
+    
+    assign_dimension_keys(connection, to_update)
+    for chunk in chunked(to_update):
+        db.execute(update(Restaurant), chunk)
+    index_documents(connection, "restaurant", [
+        (data["id"], data["id"], data.get("description")) for data in to_update
+    ])
+    
+    new_ids = bulk_insert(db, [data for _, data in to_create])
+    for (index, _), restaurant_id in zip(to_create, new_ids):
+        results[index] = {"index": index, "id": restaurant_id, "status": "created"}
+    
+    db.commit()
+    restaurants_changed(
+        [data["id"] for data in to_update] + new_ids,
+        [r.city for r in restaurants] + [existing[data["id"]][0] for data in to_update]
+    )
+    
+    return {
+        "created": len(new_ids),
+        "updated": len(to_update),
+        "not_found": len(restaurants) - len(new_ids) - len(to_update),
+        "results": results
+    }
+
+
+@router.post("/bulk/deactivate")
+async def bulk_deactivate_restaurants(
+    restaurant_ids: List[int],
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Soft delete many restaurants in a single transaction.
+    Requires authentication. Admin only.
+    """
+    require_admin(current_user, "delete")
+    check_bulk_size(restaurant_ids)
+    
+    now = datetime.utcnow()
+    unique_ids = list(dict.fromkeys(restaurant_ids))
+    existing = {}  # id -> city
+    
+    for chunk in chunked(unique_ids):
+        existing.update(db.query(Restaurant.id, Restaurant.city).filter(Restaurant.id.in_(chunk)))
+        db.query(Restaurant).filter(
+            Restaurant.id.in_(chunk)
+        ).update(
+            {Restaurant.is_active: False, Restaurant.updated_at: now},
+            synchronize_session=False
+        )
+    
+    db.commit()
+    restaurants_changed(existing.keys(), existing.values())
+    
+    return {
+        "deactivated": len(existing),
+        "results": [
+            {
+                "index": index,
+                "id": restaurant_id,
+                "status": "deactivated" if restaurant_id in existing else "not_found"
+            }
+            for index, restaurant_id in enumerate(restaurant_ids)
+        ]
+    }
+
+
 @router.get("/search/by-name")
 async def search_restaurants_by_name(
     q: str = Query(..., min_length=2, description="Search query"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Search restaurants by name.
+    Only the requested columns (or a compact default set) are selected.
     """
-    restaurants = db.query(Restaurant).filter(
+    columns = parse_fields(fields) or [getattr(Restaurant, name) for name in SEARCH_FIELDS]
+    
+    restaurants = db.query(*columns).filter(
         Restaurant.name.ilike(f"%{q}%"),
         Restaurant.is_active == True
     ).limit(20).all()
     
     return {
         "query": q,
-        "results": [
-            {
-                "id": r.id,
-                "name": r.name,
-                "city": r.city,
-                "area": r.area,
-                "cuisine": r.cuisine,
-                "rating": r.rating,
-                "avg_price": r.avg_price
-            }
-            for r in restaurants
+        "results": rows_to_dicts(restaurants, columns)
+    }
+
+
+@router.get("/search/semantic")
+def search_restaurants(
+    q: str = Query(..., min_length=2, description="Search query, e.g. \"family biryani place\""),
+    city: Optional[str] = Query(None, description="Filter by city"),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS, description="Number of results"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Search restaurants by name, cuisine and description.
+    Results are ranked by TF-IDF cosine similarity, so they need not
+    contain every query word; each result carries its score.
+    """
+    columns = parse_fields(fields) or [getattr(Restaurant, name) for name in SEARCH_FIELDS]
+    
+    # Clients that just wrote see their change; others get background refreshes
+    matches = search_index.search(q, limit, city, fresh=bool(db.info.get("read_your_writes")))
+    scores = dict(matches)
+    
+    rows = db.query(*columns).filter(
+        Restaurant.id.in_(list(scores)),
+        Restaurant.is_active == True
+    ).all() if scores else []
+    
+    # Keep the index's ranking order
+    rank = {restaurant_id: i for i, (restaurant_id, _) in enumerate(matches)}
+    results = [dict(row, score=round(scores[row["id"]], 4)) for row in rows_to_dicts(rows, columns)]
+    results.sort(key=lambda x: rank[x["id"]])
+    
+    return {
+        "query": q,
+        "results": results
+    }
+
+
+@router.get("/batch/by-ids")
+async def get_restaurants_batch(
+    ids: str = Query(..., description="Comma-separated restaurant IDs"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get many restaurants by ID in a single request.
+    
+    Results follow the order of `ids`; unknown IDs come back as null
+    and are also listed in `missing`. Full rows are served from the
+    restaurant cache when possible and the rest are loaded with one IN query
+    (and cached unless they were read from a possibly lagging replica).
+    """
+    try:
+        requested = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers"
+        )
+    
+    if len(requested) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} IDs can be requested at once"
+        )
+    
+    unique_ids = list(dict.fromkeys(requested))
+    columns = parse_fields(fields)
+    
+    if columns:
+        rows = db.query(*columns).filter(Restaurant.id.in_(unique_ids)).all() if unique_ids else []
+        found = {row["id"]: row for row in jsonable_encoder(rows_to_dicts(rows, columns))}
+    else:
+        found = restaurant_cache.get_many(unique_ids)
+        to_load = [i for i in unique_ids if i not in found]
+        
+        if to_load:
+            # Rows from a lagging replica may predate a write; don't share them
+            cacheable = not may_lag(db)
+            for r in db.query(Restaurant).filter(Restaurant.id.in_(to_load)).all():
+                found[r.id] = jsonable_encoder(RestaurantResponse.model_validate(r))
+                if cacheable:
+                    restaurant_cache.set(r.id, found[r.id])
+    
+    return {
+        "results": [found.get(i) for i in requested],
+        "missing": [i for i in unique_ids if i not in found]
+    }
+
+
+@router.get("/changes/since")
+async def get_restaurant_changes(
+    updated_at: Optional[datetime] = Query(None, description="Watermark timestamp from the previous sync"),
+    after_id: int = Query(0, ge=0, description="Watermark ID from the previous sync"),
+    limit: int = Query(500, ge=1, le=MAX_CHANGES_PAGE, description="Maximum rows to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get restaurants created, modified or soft-deleted after a watermark.
+    
+    Rows are returned in (updated_at, id) order, including inactive ones so
+    clients can drop them. Pass the returned watermark back to fetch the
+    next page; omit it to start a full sync. Rows updated within the last
+    WATERMARK_SAFETY_LAG_SECONDS are held back until transactions that
+    stamped earlier times have committed. Reads the primary: a lagging
+    replica would let the watermark pass rows it has not received yet.
+    """
+    columns = parse_fields(fields)
+    if columns:
+        for column in (Restaurant.updated_at, Restaurant.is_active):
+            if column not in columns:
+                columns.append(column)
+        query = db.query(*columns)
+    else:
+        query = db.query(Restaurant)
+    
+    query = query.filter(Restaurant.updated_at <= settled_before())
+    if updated_at is not None:
+        query = query.filter(or_(
+            Restaurant.updated_at > updated_at,
+            and_(Restaurant.updated_at == updated_at, Restaurant.id > after_id)
+        ))
+    
+    rows = query.order_by(Restaurant.updated_at, Restaurant.id).limit(limit).all()
+    
+    if columns:
+        changes = rows_to_dicts(rows, columns)
+    else:
+        changes = [
+            dict(RestaurantResponse.model_validate(r).model_dump(), updated_at=r.updated_at)
+            for r in rows
         ]
+    
+    if changes:
+        watermark = {"updated_at": changes[-1]["updated_at"], "id": changes[-1]["id"]}
+    else:
+        watermark = {"updated_at": updated_at, "id": after_id}
+    
+    return {
+        "changes": changes,
+        "watermark": watermark,
+        "has_more": len(changes) == limit
     }
 
 
 @router.get("/cities/list")
-async def get_cities(db: Session = Depends(get_db)):
+@report_cache.register("cities", per_city=False)
+@single_flight
+def get_cities(db: Session = Depends(get_read_db)):
     """
     Get list of all cities with restaurant counts.
     """
-    cities = db.query(
-        Restaurant.city,
-        db.func.count(Restaurant.id).label('count')
+    counts = db.query(
+        Restaurant.city_id,
+        func.count(Restaurant.id).label('count')
     ).filter(
         Restaurant.is_active == True
     ).group_by(
-        Restaurant.city
-    ).all()
+        Restaurant.city_id
+    ).subquery()
+    
+    cities = db.query(City.name, counts.c.count).join(counts, counts.c.city_id == City.id).order_by(City.name).all()
     
     return {
         "cities": [
@@ -212,18 +628,24 @@ async def get_cities(db: Session = Depends(get_db)):
 
 
 @router.get("/cuisines/list")
-async def get_cuisines(db: Session = Depends(get_db)):
+@report_cache.register("cuisines", per_city=False)
+@single_flight
+def get_cuisines(db: Session = Depends(get_read_db)):
     """
     Get list of all cuisines with restaurant counts.
     """
-    cuisines = db.query(
-        Restaurant.cuisine,
-        db.func.count(Restaurant.id).label('count')
+    counts = db.query(
+        Restaurant.cuisine_id,
+        func.count(Restaurant.id).label('count')
     ).filter(
         Restaurant.is_active == True
     ).group_by(
-        Restaurant.cuisine
-    ).all()
+        Restaurant.cuisine_id
+    ).subquery()
+    
+    cuisines = db.query(Cuisine.name, counts.c.count).join(
+        counts, counts.c.cuisine_id == Cuisine.id
+    ).order_by(Cuisine.name).all()
     
     return {
         "cuisines": [
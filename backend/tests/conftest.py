@@ -0,0 +1,47 @@
+"""
+Shared fixtures for the Nativore backend tests.
+Tests run the app against a throwaway copy of the bundled SQLite database.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Configured before any app module reads the environment
+WORK_DIR = tempfile.mkdtemp(prefix="nativore-tests-")
+shutil.copy(BACKEND_DIR / "nativore.db", os.path.join(WORK_DIR, "nativore.db"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{WORK_DIR}/nativore.db",
+    "SNAPSHOT_DIR": os.path.join(WORK_DIR, "snapshots"),
+    "SNAPSHOT_REBUILD_DELAY": "0.05",
+    "WATERMARK_SAFETY_LAG_SECONDS": "0",
+    "SEARCH_REFRESH_INTERVAL": "0",
+})
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/api/auth/login", data={"username": "admin", "password": "admin123"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def new_restaurant(name: str, **fields) -> dict:
+    """Create payload for a restaurant with sensible defaults."""
+    return {"name": name, "city": "Chennai", "area": "Adyar", "cuisine": "Chettinad", "avg_price": 450.0, **fields}
@@ -0,0 +1,83 @@
+"""Tests for the bulk create, upsert and deactivate endpoints."""
+import database
+from conftest import new_restaurant
+from models import City, Restaurant
+
+
+def fetch(restaurant_ids):
+    db = database.read_session()
+    try:
+        rows = db.query(Restaurant).filter(Restaurant.id.in_(restaurant_ids)).all()
+        return {row.id: row for row in rows}
+    finally:
+        db.close()
+
+
+def city_id(name):
+    db = database.read_session()
+    try:
+        return db.query(City.id).filter(City.name == name).scalar()
+    finally:
+        db.close()
+
+
+def test_bulk_create_returns_ids_in_request_order(client, admin_headers):
+    payload = [new_restaurant(f"Bulk Mess {i}", avg_price=100.0 * (i + 1)) for i in range(3)]
+
+    response = client.post("/api/restaurants/bulk/create", headers=admin_headers, json=payload)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 3
+    ids = [result["id"] for result in body["results"]]
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    rows = fetch(ids)
+    assert [rows[i].name for i in ids] == ["Bulk Mess 0", "Bulk Mess 1", "Bulk Mess 2"]
+    assert all(rows[i].city_id == city_id("Chennai") and rows[i].ranking_score is not None for i in ids)
+
+
+def test_bulk_upsert_updates_creates_and_reports_missing(client, admin_headers):
+    created = client.post("/api/restaurants/bulk/create", headers=admin_headers, json=[new_restaurant("Upsert Mess")])
+    restaurant_id = created.json()["results"][0]["id"]
+    before = fetch([restaurant_id])[restaurant_id]
+
+    payload = [
+        dict(new_restaurant("Upsert Mess Moved", city="Madurai", area="Anna Nagar"), id=restaurant_id),
+        new_restaurant("Upsert Mess New"),
+        dict(new_restaurant("Upsert Ghost"), id=10 ** 9),
+    ]
+    response = client.post("/api/restaurants/bulk/upsert", headers=admin_headers, json=payload)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["updated"], body["not_found"]) == (1, 1, 1)
+    assert [result["status"] for result in body["results"]] == ["updated", "created", "not_found"]
+
+    new_id = body["results"][1]["id"]
+    rows = fetch([restaurant_id, new_id])
+    moved = rows[restaurant_id]
+    assert moved.name == "Upsert Mess Moved"
+    assert moved.city_id == city_id("Madurai")
+    assert moved.updated_at > before.updated_at
+    assert rows[new_id].name == "Upsert Mess New"
+
+
+def test_bulk_deactivate_soft_deletes_and_reports_missing(client, admin_headers):
+    created = client.post(
+        "/api/restaurants/bulk/create", headers=admin_headers,
+        json=[new_restaurant("Closing Mess A"), new_restaurant("Closing Mess B")]
+    )
+    ids = [result["id"] for result in created.json()["results"]]
+
+    response = client.post("/api/restaurants/bulk/deactivate", headers=admin_headers, json=ids + [ids[0], 10 ** 9])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["deactivated"] == 2
+    assert [result["status"] for result in body["results"]] == ["deactivated", "deactivated", "deactivated", "not_found"]
+    assert not any(row.is_active for row in fetch(ids).values())
+
+
+def test_bulk_requests_need_items_and_auth(client, admin_headers):
+    assert client.post("/api/restaurants/bulk/create", headers=admin_headers, json=[]).status_code == 400
+    assert client.post("/api/restaurants/bulk/deactivate", json=[1]).status_code == 401
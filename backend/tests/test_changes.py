@@ -0,0 +1,69 @@
+"""Tests for the /changes/since incremental sync endpoint."""
+import database
+from conftest import new_restaurant
+from models import Restaurant
+
+CHANGES_URL = "/api/restaurants/changes/since"
+
+
+def restaurant_count():
+    db = database.read_session()
+    try:
+        return db.query(Restaurant).count()
+    finally:
+        db.close()
+
+
+def sync(client, watermark=None, limit=7):
+    """Follow the watermark until has_more is false; returns (rows, final watermark)."""
+    rows = []
+    params = {"limit": limit}
+    if watermark:
+        params.update(updated_at=watermark["updated_at"], after_id=watermark["id"])
+    while True:
+        page = client.get(CHANGES_URL, params=params).json()
+        rows.extend(page["changes"])
+        watermark = page["watermark"]
+        params.update(updated_at=watermark["updated_at"], after_id=watermark["id"])
+        if not page["has_more"]:
+            return rows, watermark
+
+
+def test_pages_cover_every_restaurant_once_in_watermark_order(client):
+    rows, _ = sync(client)
+
+    ids = [row["id"] for row in rows]
+    assert len(ids) == len(set(ids))
+    assert len(ids) == restaurant_count()
+    keys = [(row["updated_at"], row["id"]) for row in rows]
+    assert keys == sorted(keys)
+
+
+def test_resuming_from_the_watermark_returns_only_new_writes(client, admin_headers):
+    _, watermark = sync(client)
+
+    created = client.post("/api/restaurants/", headers=admin_headers, json=new_restaurant("Watermark Mess"))
+    assert created.status_code == 201
+    rows, next_watermark = sync(client, watermark)
+
+    assert [row["id"] for row in rows] == [created.json()["id"]]
+    assert next_watermark["id"] == created.json()["id"]
+    assert sync(client, next_watermark)[0] == []
+
+
+def test_fields_keep_the_watermark_columns(client):
+    page = client.get(CHANGES_URL, params={"limit": 3, "fields": "name"}).json()
+
+    assert len(page["changes"]) == 3
+    assert set(page["changes"][0]) == {"id", "name", "updated_at", "is_active"}
+
+
+def test_rows_inside_the_safety_lag_are_held_back(client, admin_headers, monkeypatch):
+    _, watermark = sync(client)
+    client.post("/api/restaurants/", headers=admin_headers, json=new_restaurant("Lagging Mess"))
+
+    monkeypatch.setattr(database, "WATERMARK_SAFETY_LAG_SECONDS", 3600)
+    assert sync(client, watermark)[0] == []
+
+    monkeypatch.setattr(database, "WATERMARK_SAFETY_LAG_SECONDS", 0)
+    assert [row["name"] for row in sync(client, watermark)[0]] == ["Lagging Mess"]
@@ -0,0 +1,86 @@
+"""Round-trip tests for the binary columnar response format."""
+import json
+import struct
+
+import numpy as np
+
+from utils.columnar import COLUMNAR_MEDIA_TYPE, MAGIC, encode_columnar
+
+DTYPES = {"float64": "<f8", "int32": "<i4", "bool": "u1", "dictionary": "<u4"}
+
+
+def decode_columnar(payload: bytes) -> dict:
+    """Rebuild the JSON content from a columnar payload, as the frontend does."""
+    assert payload[:4] == MAGIC
+    (header_length,) = struct.unpack_from("<I", payload, 4)
+    header = json.loads(payload[8:8 + header_length])
+    base = 8 + header_length
+    assert base % 8 == 0
+
+    content = dict(header["meta"])
+    for name, table in header["tables"].items():
+        columns = {}
+        for column in table["columns"]:
+            start = base + column["offset"]
+            assert start % 8 == 0
+            values = np.frombuffer(payload[start:start + column["length"]], dtype=DTYPES[column["type"]]).tolist()
+            if column["type"] == "dictionary":
+                values = [column["labels"][code] for code in values]
+            elif column["type"] == "bool":
+                values = [bool(value) for value in values]
+            if "validity" in column:
+                offset = base + column["validity"]["offset"]
+                bits = np.frombuffer(payload[offset:offset + column["validity"]["length"]], dtype=np.uint8)
+                valid = np.unpackbits(bits, bitorder="little")[:table["rows"]]
+                values = [value if ok else None for value, ok in zip(values, valid)]
+            columns[column["name"]] = values
+        content[name] = [
+            {column: values[i] for column, values in columns.items()} for i in range(table["rows"])
+        ]
+    return content
+
+
+def column_types(payload: bytes, table: str) -> dict:
+    (header_length,) = struct.unpack_from("<I", payload, 4)
+    header = json.loads(payload[8:8 + header_length])
+    return {column["name"]: column["type"] for column in header["tables"][table]["columns"]}
+
+
+def test_round_trip_keeps_types_and_nulls():
+    rows = [
+        {"count": 3, "price": 1.5, "open": True, "city": "Chennai", "tags": ["veg"], "big": 2 ** 40},
+        {"count": None, "price": None, "open": None, "city": None, "tags": None, "big": None},
+        {"count": -7, "price": 2, "open": False, "city": "Chennai", "tags": {"k": 1}, "big": 1},
+    ]
+    content = {"city": "Chennai", "total": 3, "rows": rows}
+
+    payload = encode_columnar(content)
+
+    assert decode_columnar(payload) == content
+    assert column_types(payload, "rows") == {
+        "count": "int32", "price": "float64", "open": "bool", "city": "dictionary", "tags": "dictionary", "big": "float64"
+    }
+
+
+def test_int_columns_with_nulls_stay_integers():
+    payload = encode_columnar([{"n": 1}, {"n": None}, {"n": 2}])
+
+    decoded = decode_columnar(payload)["rows"]
+    assert [row["n"] for row in decoded] == [1, None, 2]
+    assert all(isinstance(row["n"], int) for row in decoded if row["n"] is not None)
+
+
+def test_rows_missing_a_field_decode_as_null():
+    payload = encode_columnar({"rows": [{"a": 1.5}, {"b": "x"}]})
+
+    assert decode_columnar(payload)["rows"] == [{"a": 1.5, "b": None}, {"a": None, "b": "x"}]
+
+
+def test_endpoint_serves_the_same_content_in_both_formats(client):
+    params = {"city": "Chennai"}
+    as_json = client.get("/api/analytics/trends", params=params).json()
+
+    response = client.get("/api/analytics/trends", params=params, headers={"Accept": COLUMNAR_MEDIA_TYPE})
+
+    assert response.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    assert decode_columnar(response.content) == as_json
@@ -0,0 +1,100 @@
+"""Tests for grid DBSCAN clustering and stable micro-market ids."""
+import numpy as np
+
+import database
+from conftest import new_restaurant
+from models import Restaurant
+from utils import micro_markets
+from utils.micro_markets import grid_dbscan, match_markets, project
+
+
+def blob(rng, center, count, spread):
+    return rng.normal(center, spread, size=(count, 2))
+
+
+def test_separates_dense_blobs_from_noise():
+    rng = np.random.default_rng(3)
+    points = np.concatenate([
+        blob(rng, (0, 0), 60, 150),
+        blob(rng, (10_000, 0), 30, 150),
+        rng.uniform(-50_000, 50_000, size=(5, 2)) + 200_000,  # far apart from everything
+    ])
+
+    labels = grid_dbscan(points[:, 0], points[:, 1], eps=500, min_points=5)
+
+    assert set(labels[:60]) == {0}  # largest cluster first
+    assert set(labels[60:90]) == {1}
+    assert (labels[90:] == -1).all()
+
+
+def test_touching_dense_cells_form_one_cluster():
+    # A line of points 300 m apart chains dense cells together
+    x = np.arange(0, 9000, 300, dtype=np.float64)
+    y = np.zeros_like(x)
+
+    labels = grid_dbscan(np.repeat(x, 3), np.repeat(y, 3), eps=500, min_points=5)
+
+    assert set(labels) == {0}
+
+
+def test_sparse_points_are_noise():
+    x = np.arange(0, 100_000, 5000, dtype=np.float64)
+
+    labels = grid_dbscan(x, np.zeros_like(x), eps=500, min_points=2)
+
+    assert (labels == -1).all()
+
+
+def test_empty_input():
+    assert len(grid_dbscan(np.zeros(0), np.zeros(0), eps=500, min_points=5)) == 0
+
+
+def test_projection_is_metric_at_city_scale():
+    x, y = project(np.array([13.0, 13.0, 13.01]), np.array([80.0, 80.01, 80.0]))
+
+    assert abs(np.hypot(x[1] - x[0], y[1] - y[0]) - 1083) < 5  # 0.01° of longitude at 13°N
+    assert abs(np.hypot(x[2] - x[0], y[2] - y[0]) - 1112) < 5  # 0.01° of latitude
+
+
+def test_clusters_keep_the_market_they_share_most_members_with():
+    labels = np.array([0, 0, 0, 0, 1, 1, 1, 2, 2, -1])
+    # Current markets: 11 holds most of cluster 1 and some of cluster 0; 12 is mostly cluster 0;
+    # 13 only held restaurants that are now noise; 99 belongs to another city
+    current = np.array([12, 12, 12, 11, 11, 11, 99, -1, -1, 13])
+
+    matched = match_markets(labels, current, np.array([11, 12, 13]))
+
+    assert matched.tolist() == [12, 11, -1]
+
+
+def market_members():
+    db = database.read_session()
+    try:
+        members = {}
+        for restaurant_id, market_id in db.query(Restaurant.id, Restaurant.micro_market_id).filter(
+            Restaurant.micro_market_id.isnot(None)
+        ):
+            members.setdefault(market_id, set()).add(restaurant_id)
+        return members
+    finally:
+        db.close()
+
+
+def test_market_ids_survive_a_new_larger_cluster(client, admin_headers):
+    micro_markets.main()
+    before = market_members()
+    assert before
+
+    # A bigger cluster than any existing one, far from them
+    payload = [
+        new_restaurant(f"Cluster Mess {i}", latitude=13.5 + i * 1e-4, longitude=80.5 + i * 1e-4)
+        for i in range(max(len(members) for members in before.values()) + 5)
+    ]
+    created = client.post("/api/restaurants/bulk/create", headers=admin_headers, json=payload)
+    assert created.status_code == 200
+    micro_markets.main()
+
+    after = market_members()
+    assert all(after.get(market_id) == members for market_id, members in before.items())
+    new_ids = {result["id"] for result in created.json()["results"]}
+    assert new_ids in after.values()
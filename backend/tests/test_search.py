@@ -0,0 +1,86 @@
+"""Ranking tests for the TF-IDF restaurant search."""
+import time
+
+import pytest
+
+from conftest import new_restaurant
+
+SEARCH_URL = "/api/restaurants/search/semantic"
+
+
+def search(client, q, headers=None, **params):
+    response = client.get(SEARCH_URL, params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+@pytest.fixture(scope="module")
+def documents(client, admin_headers):
+    payload = [
+        new_restaurant("Zanzibar Grill", cuisine="Continental", description="Smoky grilled seafood and zanzibar spice rubs"),
+        new_restaurant("Harbour Kitchen", cuisine="Continental", description="Zanzibar style curries by the harbour"),
+        new_restaurant("Quiet Corner", cuisine="Continental", description="Grilled sandwiches and smoky coffee"),
+        new_restaurant("Zanzibar Grill Madurai", city="Madurai", area="Anna Nagar", cuisine="Continental"),
+    ]
+    response = client.post("/api/restaurants/bulk/create", headers=admin_headers, json=payload)
+    assert response.status_code == 200
+    return {item["name"]: result["id"] for item, result in zip(payload, response.json()["results"])}
+
+
+def test_results_are_ordered_by_score(client, admin_headers, documents):
+    results = search(client, "zanzibar grill", admin_headers, limit=50)
+
+    scores = [result["score"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0 < score <= 1 for score in scores)
+
+
+def test_name_matches_outrank_description_matches(client, admin_headers, documents):
+    ranked = [result["id"] for result in search(client, "zanzibar grill", admin_headers, city="Chennai")]
+
+    assert ranked[0] == documents["Zanzibar Grill"]
+    assert ranked.index(documents["Zanzibar Grill"]) < ranked.index(documents["Harbour Kitchen"])
+
+
+def test_partial_matches_are_ranked_not_dropped(client, admin_headers, documents):
+    ranked = [result["id"] for result in search(client, "smoky zanzibar seafood", admin_headers, city="Chennai")]
+
+    assert ranked[0] == documents["Zanzibar Grill"]  # matches every word
+    assert documents["Harbour Kitchen"] in ranked  # zanzibar only
+    assert documents["Quiet Corner"] in ranked  # smoky only
+
+
+def test_misspellings_still_match_through_trigrams(client, admin_headers, documents):
+    top = {result["id"] for result in search(client, "zanzibr", admin_headers, city="Chennai")[:2]}
+
+    assert top == {documents["Zanzibar Grill"], documents["Harbour Kitchen"]}
+
+
+def test_city_filter(client, admin_headers, documents):
+    ids = {result["id"] for result in search(client, "zanzibar grill", admin_headers, city="Madurai")}
+
+    assert documents["Zanzibar Grill Madurai"] in ids
+    assert not ids & {documents["Zanzibar Grill"], documents["Harbour Kitchen"]}
+
+
+def test_deactivated_restaurants_drop_out(client, admin_headers, documents):
+    client.post("/api/restaurants/bulk/deactivate", headers=admin_headers, json=[documents["Harbour Kitchen"]])
+
+    ids = {result["id"] for result in search(client, "zanzibar", admin_headers, limit=50)}
+
+    assert documents["Harbour Kitchen"] not in ids
+    assert documents["Zanzibar Grill"] in ids
+
+
+def test_other_clients_catch_up_in_the_background(client, admin_headers):
+    created = client.post(
+        "/api/restaurants/bulk/create", headers=admin_headers,
+        json=[new_restaurant("Quokka Canteen", cuisine="Continental")]
+    )
+    restaurant_id = created.json()["results"][0]["id"]
+
+    # Searches without the writer's token schedule a refresh instead of waiting for one
+    deadline = time.monotonic() + 5
+    while restaurant_id not in {result["id"] for result in search(client, "quokka canteen")}:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
@@ -0,0 +1,67 @@
+"""Accuracy tests for the t-digest percentile sketches."""
+import numpy as np
+import pytest
+
+from utils.sketches import TDigest
+
+QUANTILES = [0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999]
+
+
+def rank_errors(values: np.ndarray, estimates) -> np.ndarray:
+    """Distance of each estimate's rank in `values` from its target quantile."""
+    ordered = np.sort(values)
+    below = np.searchsorted(ordered, estimates, side="left") / len(ordered)
+    at_or_below = np.searchsorted(ordered, estimates, side="right") / len(ordered)
+    target = np.array(QUANTILES)
+    # With ties an estimate covers a range of ranks; zero error anywhere inside it
+    return np.maximum(np.maximum(below - target, target - at_or_below), 0)
+
+
+@pytest.fixture(params=["lognormal", "uniform", "bimodal"])
+def values(request):
+    rng = np.random.default_rng(42)
+    n = 100_000
+    if request.param == "lognormal":
+        return rng.lognormal(6, 0.6, n)  # prices
+    if request.param == "uniform":
+        return rng.uniform(1, 5, n)
+    return np.concatenate([rng.normal(300, 40, n // 2), rng.normal(1500, 200, n // 2)])
+
+
+def test_quantile_rank_error_is_small(values):
+    digest = TDigest.from_values(values)
+
+    errors = rank_errors(values, digest.quantiles(QUANTILES))
+
+    assert len(digest.means) <= digest.compression
+    assert errors.max() < 0.005
+    assert errors[[0, -1]].max() < 0.001  # tails are kept finer
+
+
+def test_merged_digests_are_as_accurate_as_one(values):
+    parts = [TDigest.from_values(part) for part in np.array_split(values, 37)]
+
+    merged = TDigest.merge(parts)
+
+    assert merged.count == len(values)
+    assert rank_errors(values, merged.quantiles(QUANTILES)).max() < 0.005
+
+
+def test_discrete_ratings_are_within_one_step_of_the_true_quantile():
+    values = np.round(np.random.default_rng(1).normal(3.5, 0.5, 50_000), 1)
+
+    central = QUANTILES[1:-1]
+    estimates = TDigest.from_values(values).quantiles(central)
+
+    # Estimates interpolate between tied values, so compare values, not ranks
+    exact = np.quantile(values, central)
+    assert np.abs(np.array(estimates) - exact).max() <= 0.1
+
+
+def test_extremes_nulls_and_empty_digests():
+    digest = TDigest.from_values([4.0, np.nan, 1.0, 3.0, 2.0])
+
+    assert digest.count == 4
+    assert digest.quantiles([0, 1]) == [1.0, 4.0]
+    assert TDigest.from_values([]).quantiles([0.5]) == [None]
+    assert TDigest.merge([TDigest.from_values([]), digest]).count == 4
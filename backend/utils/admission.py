@@ -0,0 +1,123 @@
+"""
+Admission control for Nativore.
+Routes are grouped into cost classes, each with its own concurrency limit and
+bounded wait queue, so expensive endpoints cannot starve cheap ones.
+"""
+import asyncio
+import os
+
+
+class CostClass:
+    """
+    A concurrency limit with a bounded queue. Requests beyond `limit` wait
+    for a slot; once `queue_size` are already waiting, or a wait exceeds
+    `queue_timeout` seconds, the request is rejected.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed. False if shed."""
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                return False
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        return True
+
+    def release(self):
+        """Give back a slot taken by acquire()."""
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
+
+
+def cost_class_from_env(name: str, limit: int, queue_size: int) -> CostClass:
+    """Build a cost class whose limits can be overridden by ADMISSION_<NAME>_* env vars."""
+    prefix = f"ADMISSION_{name.upper()}"
+    return CostClass(
+        name,
+        limit=int(os.getenv(f"{prefix}_CONCURRENCY", limit)),
+        queue_size=int(os.getenv(f"{prefix}_QUEUE", queue_size)),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 5))
+    )
+
+
+COST_CLASSES = {
+    "heavy": cost_class_from_env("heavy", limit=8, queue_size=32),
+    "standard": cost_class_from_env("standard", limit=32, queue_size=128),
+}
+
+# Path prefixes and their cost class; the longest matching prefix wins.
+# None means the route bypasses admission control.
+ROUTE_COST_CLASSES = {
+    "/health": None,
+    "/docs": None,
+    "/redoc": None,
+    "/openapi.json": None,
+    "/api/analytics/stream": None,  # Long-lived; would hold a slot forever
+    "/api/analytics/trends": "heavy",
+    "/api/analytics/spending": "heavy",
+    "/api/analytics/top-cuisines": "heavy",
+    "/api/analytics/top-rated": "heavy",
+    "/api/analytics/city-comparison": "heavy",
+    "/api/analytics/area-insights": "heavy",
+    "/api/analytics/dashboard-stats": "heavy",
+    "/api/analytics/cube": "heavy",
+    "/api/analytics/histogram": "heavy",
+    "/api/analytics/percentiles": "heavy",
+    "/api/analytics/top-k": "heavy",
+    "/api/analytics/micro-markets": "heavy",
+    "/api/analytics/heatmap": "heavy",
+    "/api/analytics/heatmap/": "standard",  # Single tiles, served from the built index
+    "/api/analytics/dishes": "heavy",
+    "/api/recommendations": "heavy",
+    "/api/restaurants/bulk": "heavy",
+    "/api/restaurants/search/semantic": "heavy",
+    "/api": "standard",
+}
+
+# Seconds clients are told to wait before retrying a shed request
+RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER", 2))
+
+
+def cost_class_for(path: str):
+    """Return the CostClass for a request path, or None if exempt."""
+    matches = [prefix for prefix in ROUTE_COST_CLASSES if path.startswith(prefix)]
+    if not matches:
+        return None
+    name = ROUTE_COST_CLASSES[max(matches, key=len)]
+    return COST_CLASSES[name] if name else None
+
+
+def admission_stats():
+    """Current load of every cost class."""
+    return {name: cost_class.stats() for name, cost_class in COST_CLASSES.items()}
@@ -0,0 +1,127 @@
+"""
+SQLite concurrency benchmark for Nativore.
+Compares concurrent read throughput of the default SQLite setup against
+production mode (WAL + tuned pragmas, read-only reader pool) while a writer
+keeps updating restaurants.
+
+Usage: python utils/benchmark_sqlite.py [rows] [readers] [seconds]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, text, func
+from sqlalchemy.orm import sessionmaker
+from database import Base, apply_sqlite_pragmas
+from models import Restaurant
+from utils.fake_data import generate_restaurants
+
+READ_QUERY = text(
+    "SELECT area, COUNT(id), AVG(rating), AVG(avg_price), AVG(spending_index) "
+    "FROM restaurants WHERE city = :city GROUP BY area"
+)
+CITIES = ["Chennai", "Coimbatore", "Tiruppur", "Madurai", "Thoothukudi"]
+
+
+def build_database(path: str, rows: int):
+    """Create a benchmark database file with `rows` restaurants."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    for start in range(0, rows, 5000):
+        db.bulk_insert_mappings(Restaurant, generate_restaurants(min(5000, rows - start)))
+    db.commit()
+    print(f"   {db.query(func.count(Restaurant.id)).scalar()} restaurants in {path}")
+    db.close()
+    engine.dispose()
+
+
+def make_engines(path: str, tuned: bool, readers: int):
+    """Return (writer, reader) engines for the default or production setup."""
+    url = f"sqlite:///{path}"
+    args = {"connect_args": {"check_same_thread": False, "timeout": 30}}
+    writer = create_engine(url, pool_size=1, max_overflow=0, **args)
+    reader = create_engine(url, pool_size=readers, max_overflow=0, **args)
+    if tuned:
+        apply_sqlite_pragmas(writer)
+        apply_sqlite_pragmas(reader, read_only=True)
+    return writer, reader
+
+
+def run(path: str, tuned: bool, readers: int, seconds: float):
+    """Run readers and one writer concurrently; return (reads, writes, errors)."""
+    writer, reader = make_engines(path, tuned, readers)
+    stop = time.monotonic() + seconds
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def read_loop():
+        done = errors = 0
+        while time.monotonic() < stop:
+            try:
+                with reader.connect() as conn:
+                    conn.execute(READ_QUERY, {"city": random.choice(CITIES)}).fetchall()
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts["reads"] += done
+            counts["errors"] += errors
+
+    def write_loop():
+        done = errors = 0
+        while time.monotonic() < stop:
+            try:
+                with writer.begin() as conn:
+                    conn.execute(
+                        text("UPDATE restaurants SET rating = :rating WHERE id = :id"),
+                        {"rating": round(random.uniform(1, 5), 1), "id": random.randint(1, 1000)}
+                    )
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    threads.append(threading.Thread(target=write_loop))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    writer.dispose()
+    reader.dispose()
+    return counts
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    print(f"🚀 SQLite benchmark: {rows} rows, {readers} readers + 1 writer, {seconds}s per mode")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "benchmark.db")
+        build_database(path, rows)
+
+        for tuned in (False, True):
+            counts = run(path, tuned, readers, seconds)
+            mode = "production (WAL)" if tuned else "default"
+            print(
+                f"   {mode:<17} reads/s: {counts['reads'] / seconds:8.1f}   "
+                f"writes/s: {counts['writes'] / seconds:7.1f}   errors: {counts['errors']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
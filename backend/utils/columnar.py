@@ -0,0 +1,133 @@
+"""
+Binary columnar responses for Nativore chart data.
+Clients sending `Accept: application/vnd.nativore.columnar` get analytics
+results as typed little-endian column buffers instead of JSON rows: every
+top-level list of objects becomes a table with one contiguous buffer per
+field, and the remaining fields go into a small JSON header.
+
+Layout: b"NVC1", uint32 header length, UTF-8 JSON header (space-padded so
+buffers start 8-byte aligned), then the column buffers. The header lists
+each table's row count and columns as {name, type, offset, length}, with
+offsets relative to the end of the header. Types are float64, int32, bool
+(uint8) and dictionary: uint32 codes into the column's `labels`, which may be
+any JSON values. Numeric and bool columns with nulls also carry a `validity`
+{offset, length}: a bitmap with one bit per row, least significant bit first,
+set where the value is not null.
+"""
+import json
+import struct
+from contextvars import ContextVar
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.nativore.columnar"
+
+MAGIC = b"NVC1"
+
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+# Set per request by negotiate_format
+columnar_requested = ContextVar("columnar_requested", default=False)
+
+
+async def negotiate_format(request: Request):
+    """
+    Router dependency recording whether the client accepts the columnar
+    format. Async so the flag is set in the task that renders the response.
+    """
+    columnar_requested.set(COLUMNAR_MEDIA_TYPE in request.headers.get("accept", ""))
+
+
+def is_table(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, dict) for item in value)
+
+
+def validity_bitmap(values: list):
+    """Bitmap of the non-null values, or None if there are no nulls."""
+    valid = np.array([v is not None for v in values], dtype=bool)
+    if valid.all():
+        return None
+    return np.packbits(valid, bitorder="little").tobytes()
+
+
+def encode_column(values: list):
+    """(type, little-endian bytes, labels or None, validity bitmap or None) for one column."""
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, bool) for v in present):
+        data = np.asarray([bool(v) for v in values], dtype=np.uint8).tobytes()
+        return "bool", data, None, validity_bitmap(values)
+
+    numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present)
+    if present and numeric:
+        validity = validity_bitmap(values)
+        if all(isinstance(v, int) for v in present) \
+                and INT32_RANGE[0] <= min(present) and max(present) <= INT32_RANGE[1]:
+            return "int32", np.asarray([v or 0 for v in values], dtype="<i4").tobytes(), None, validity
+        floats = np.asarray([np.nan if v is None else v for v in values], dtype="<f8")
+        return "float64", floats.tobytes(), None, validity
+
+    labels, codes, index = [], [], {}
+    for value in values:
+        key = json.dumps(value, sort_keys=True, default=str)
+        if key not in index:
+            index[key] = len(labels)
+            labels.append(value)
+        codes.append(index[key])
+    return "dictionary", np.asarray(codes, dtype="<u4").tobytes(), labels, None
+
+
+def aligned(data: bytes) -> bytes:
+    """Pad a buffer to a multiple of 8 bytes."""
+    return data + b"\0" * (-len(data) % 8)
+
+
+def encode_columnar(content) -> bytes:
+    """Encode a JSON-compatible result as the columnar payload described above."""
+    if is_table(content):
+        content = {"rows": content}
+    if not isinstance(content, dict):
+        content = {"value": content}
+
+    meta, tables, buffers = {}, {}, []
+    offset = 0
+    for key, value in content.items():
+        if not is_table(value):
+            meta[key] = value
+            continue
+
+        names = list(dict.fromkeys(name for row in value for name in row))
+        columns = []
+        for name in names:
+            column_type, data, labels, validity = encode_column([row.get(name) for row in value])
+            column = {"name": name, "type": column_type, "offset": offset, "length": len(data)}
+            buffers.append(aligned(data))
+            offset += len(buffers[-1])
+
+            if labels is not None:
+                column["labels"] = labels
+            if validity is not None:
+                column["validity"] = {"offset": offset, "length": len(validity)}
+                buffers.append(aligned(validity))
+                offset += len(buffers[-1])
+            columns.append(column)
+        tables[key] = {"rows": len(value), "columns": columns}
+
+    header = json.dumps({"meta": meta, "tables": tables}, default=str).encode()
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+    return MAGIC + struct.pack("<I", len(header)) + header + b"".join(buffers)
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON by default; the columnar payload when the request negotiated it."""
+
+    def render(self, content) -> bytes:
+        if columnar_requested.get():
+            self.media_type = COLUMNAR_MEDIA_TYPE
+            return encode_columnar(content)
+        return super().render(content)
+
+    def init_headers(self, headers=None):
+        super().init_headers(headers)
+        self.raw_headers.append((b"vary", b"Accept"))
@@ -0,0 +1,294 @@
+"""
+Precomputed OLAP cube for Nativore market analytics.
+Count, sum and sum of squares of price, rating and spending index over
+city × area × cuisine × price band, with every roll-up precomputed so a
+query reads result cells directly instead of re-scanning restaurants.
+Only non-empty cells are stored, and a new snapshot is applied as the
+difference of the rows that changed.
+"""
+import itertools
+import threading
+
+import numpy as np
+from sqlalchemy import func
+
+from models import Restaurant, City, Area, Cuisine
+from utils.histogram import PRICE_BANDS, PRICE_BAND_EDGES, bucket_codes, bucket_expression
+from utils.snapshot import snapshot_store
+
+DIMENSIONS = ("city", "area", "cuisine", "price_band")
+
+MEASURES = ("avg_price", "rating", "spending_index")
+
+STATS = ("count",) + tuple(f"{measure}_{stat}" for measure in MEASURES for stat in ("sum", "sumsq"))
+
+# Bits of a cell key holding each dimension's label code, most significant first
+KEY_BITS = {"city": 16, "area": 24, "cuisine": 16, "price_band": 7}
+
+SHIFTS = {dim: sum(KEY_BITS[d] for d in DIMENSIONS[i + 1:]) for i, dim in enumerate(DIMENSIONS)}
+
+# Key mask keeping exactly the dimensions of each cuboid
+GROUPINGS = [grouped for n in range(len(DIMENSIONS) + 1) for grouped in itertools.combinations(DIMENSIONS, n)]
+MASKS = {
+    grouped: sum(((1 << KEY_BITS[dim]) - 1) << SHIFTS[dim] for dim in grouped)
+    for grouped in GROUPINGS
+}
+
+
+def pack(codes: dict) -> np.ndarray:
+    """One int64 cell key per row from the label code of every dimension."""
+    keys = np.zeros(len(codes["city"]), dtype=np.int64)
+    for dim in DIMENSIONS:
+        keys |= np.asarray(codes[dim], dtype=np.int64) << SHIFTS[dim]
+    return keys
+
+
+def unpack(keys: np.ndarray, dim: str) -> np.ndarray:
+    """Label codes of one dimension from cell keys."""
+    return (keys >> SHIFTS[dim]) & ((1 << KEY_BITS[dim]) - 1)
+
+
+def group(keys: np.ndarray, stats: np.ndarray):
+    """Sorted unique keys and the summed stats rows of each."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    summed = np.column_stack([
+        np.bincount(inverse, weights=stats[:, i], minlength=len(unique)) for i in range(stats.shape[1])
+    ])
+    return unique, summed.reshape(len(unique), stats.shape[1])
+
+
+def merge(keys: np.ndarray, stats: np.ndarray, delta_keys: np.ndarray, delta_stats: np.ndarray):
+    """
+    Add grouped changes to a cuboid without re-sorting it: existing cells are
+    updated in place, new cells inserted and cells left without rows dropped.
+    """
+    position = np.searchsorted(keys, delta_keys)
+    found = position < len(keys)
+    found[found] = keys[position[found]] == delta_keys[found]
+
+    stats = stats.copy()
+    stats[position[found]] += delta_stats[found]
+    if not found.all():
+        keys = np.insert(keys, position[~found], delta_keys[~found])
+        stats = np.insert(stats, position[~found], delta_stats[~found], axis=0)
+
+    empty = stats[:, 0] < 0.5
+    if empty.any():
+        keys, stats = keys[~empty], stats[~empty]
+    return keys, stats
+
+
+class Cube:
+    """
+    Sparse aggregates keyed by packed label codes. `cuboids` maps each subset
+    of dimensions to the sorted keys (other dimensions zeroed) and stats rows
+    of the non-empty cells grouped by exactly those dimensions. A cube is
+    only changed by `add` before it is published; later versions are copies.
+    """
+
+    def __init__(self, labels: dict, cuboids: dict = None, snapshot=None):
+        self.labels = {dim: list(values) for dim, values in labels.items()}
+        self.positions = {dim: {label: i for i, label in enumerate(values)} for dim, values in self.labels.items()}
+        self.cuboids = dict(cuboids) if cuboids else {
+            grouped: (np.zeros(0, dtype=np.int64), np.zeros((0, len(STATS)))) for grouped in GROUPINGS
+        }
+        self.snapshot = snapshot
+        self.version = snapshot.version if snapshot is not None else None
+
+    def codes(self, dim: str, labels) -> np.ndarray:
+        """Code of each label in this cube, adding labels it has not seen."""
+        positions = self.positions[dim]
+        for label in labels:
+            if label not in positions:
+                if len(positions) >> KEY_BITS[dim]:
+                    raise ValueError(f"Too many {dim} labels for the cube")
+                positions[label] = len(self.labels[dim])
+                self.labels[dim].append(label)
+        return np.array([positions[label] for label in labels], dtype=np.int64)
+
+    def keys(self, labels: dict, codes: dict) -> np.ndarray:
+        """Cell keys of rows whose `codes[dim]` index `labels[dim]`."""
+        return pack({dim: self.codes(dim, labels[dim])[codes[dim]] for dim in DIMENSIONS})
+
+    def add(self, keys: np.ndarray, stats: np.ndarray):
+        """Add stats rows to their cells in every cuboid; rows with a negative count remove rows."""
+        if len(keys):
+            for grouped in GROUPINGS:
+                self.cuboids[grouped] = merge(*self.cuboids[grouped], *group(keys & MASKS[grouped], stats))
+
+    def query(self, group_by: list, filters: dict, limit: int = None):
+        """
+        Cells grouped by `group_by` (roll-up / drill-down), restricted to the
+        labels listed per dimension in `filters` (slice / dice). Dimensions
+        that are filtered but not grouped are summed over the selected labels.
+        Only non-empty cells of the cuboid are visited.
+        """
+        dims = tuple(dim for dim in DIMENSIONS if dim in group_by or dim in filters)
+        keys, stats = self.cuboids[dims]
+
+        selected = np.ones(len(keys), dtype=bool)
+        for dim, labels in filters.items():
+            wanted = [self.positions[dim][label] for label in labels if label in self.positions[dim]]
+            selected &= np.isin(unpack(keys, dim), wanted)
+
+        grouped = tuple(dim for dim in DIMENSIONS if dim in group_by)
+        keys, stats = group(keys[selected] & MASKS[grouped], stats[selected])
+
+        cells = []
+        for key, row in zip(keys.tolist(), stats):
+            cell = {dim: self.labels[dim][int(unpack(key, dim))] for dim in grouped}
+            count = int(round(row[0]))
+            cell["count"] = count
+            for i, measure in enumerate(MEASURES):
+                total = float(row[1 + 2 * i])
+                mean = total / count
+                variance = max(float(row[2 + 2 * i]) / count - mean * mean, 0.0)
+                cell[measure] = {
+                    "sum": round(total, 2),
+                    "avg": round(mean, 2),
+                    "stddev": round(variance ** 0.5, 2)
+                }
+            cells.append(cell)
+
+        # Largest first, ties in label order
+        order = {dim: {label: i for i, label in enumerate(sorted(self.labels[dim]))} for dim in grouped}
+        order["price_band"] = {label: i for i, label in enumerate(PRICE_BANDS)}
+        cells.sort(key=lambda cell: (-cell["count"],) + tuple(order[dim][cell[dim]] for dim in grouped))
+        return cells[:limit] if limit else cells
+
+
+def snapshot_stats(snapshot, rows: np.ndarray) -> np.ndarray:
+    """Stats row of each snapshot row: a count of one and each measure and its square."""
+    stats = np.ones((len(rows), len(STATS)))
+    for i, measure in enumerate(MEASURES):
+        values = np.nan_to_num(np.asarray(snapshot[measure][rows], dtype=np.float64))
+        stats[:, 1 + 2 * i] = values
+        stats[:, 2 + 2 * i] = values * values
+    return stats
+
+
+def snapshot_codes(snapshot, rows: np.ndarray) -> dict:
+    """Label codes of snapshot rows per dimension, with the price band computed from the price."""
+    codes = {dim: snapshot[dim][rows] for dim in ("city", "area", "cuisine")}
+    codes["price_band"] = bucket_codes(snapshot["avg_price"][rows], PRICE_BAND_EDGES)
+    return codes
+
+
+def snapshot_labels(snapshot) -> dict:
+    labels = {dim: snapshot.labels[dim] for dim in ("city", "area", "cuisine")}
+    labels["price_band"] = PRICE_BANDS
+    return labels
+
+
+def changed_rows(old, new):
+    """Rows of each snapshot that were added, removed or changed in a way that affects the cube."""
+    _, old_rows, new_rows = np.intersect1d(old["id"], new["id"], assume_unique=True, return_indices=True)
+
+    differs = np.zeros(len(old_rows), dtype=bool)
+    for measure in MEASURES:
+        differs |= ~np.isclose(old[measure][old_rows], new[measure][new_rows], equal_nan=True)
+    for dim in ("city", "area", "cuisine"):
+        # Old codes translated to the new snapshot's labels (-1 where it has no such label)
+        translated = np.array([new.code(dim, label) for label in old.labels[dim]], dtype=np.int64)
+        differs |= translated[old[dim][old_rows]] != new[dim][new_rows]
+
+    removed, added = np.ones(old.size, dtype=bool), np.ones(new.size, dtype=bool)
+    removed[old_rows] = False
+    added[new_rows] = False
+    return (
+        np.concatenate([np.flatnonzero(removed), old_rows[differs]]),
+        np.concatenate([np.flatnonzero(added), new_rows[differs]])
+    )
+
+
+def cube_from_snapshot(snapshot, previous: Cube = None) -> Cube:
+    """
+    Cube for a snapshot. With the cube of an earlier snapshot only the rows
+    that changed are applied: their old values subtracted, new values added.
+    """
+    labels = snapshot_labels(snapshot)
+    if previous is None or previous.snapshot is None:
+        cube = Cube(labels, snapshot=snapshot)
+        rows = np.arange(snapshot.size)
+        cube.add(cube.keys(labels, snapshot_codes(snapshot, rows)), snapshot_stats(snapshot, rows))
+        return cube
+
+    old = previous.snapshot
+    old_rows, new_rows = changed_rows(old, snapshot)
+    cube = Cube(previous.labels, previous.cuboids, snapshot)
+    cube.add(
+        np.concatenate([
+            cube.keys(snapshot_labels(old), snapshot_codes(old, old_rows)),
+            cube.keys(labels, snapshot_codes(snapshot, new_rows))
+        ]),
+        np.concatenate([-snapshot_stats(old, old_rows), snapshot_stats(snapshot, new_rows)])
+    )
+    return cube
+
+
+def cube_from_database(db) -> Cube:
+    """Build the cube from a GROUP BY over the dimension keys and price band."""
+    band = bucket_expression(Restaurant.avg_price, PRICE_BAND_EDGES).label("price_band")
+    aggregates = [func.count(Restaurant.id)]
+    for measure in MEASURES:
+        column = getattr(Restaurant, measure)
+        aggregates += [func.sum(column), func.sum(column * column)]
+
+    cells = db.query(
+        Restaurant.city_id, Restaurant.area_id, Restaurant.cuisine_id, band, *aggregates
+    ).group_by(Restaurant.city_id, Restaurant.area_id, Restaurant.cuisine_id, band).all()
+
+    names = {
+        "city": dict(db.query(City.id, City.name)),
+        "area": dict(db.query(Area.id, Area.name)),
+        "cuisine": dict(db.query(Cuisine.id, Cuisine.name)),
+    }
+    labels = {dim: sorted(set(names[dim].values())) for dim in names}
+    labels["price_band"] = PRICE_BANDS
+    positions = {dim: {label: i for i, label in enumerate(labels[dim])} for dim in names}
+
+    codes = {
+        dim: np.array([positions[dim][names[dim][cell[i]]] for cell in cells], dtype=np.int64)
+        for i, dim in enumerate(("city", "area", "cuisine"))
+    }
+    codes["price_band"] = np.array([cell[3] for cell in cells], dtype=np.int64)
+
+    stats = np.array([[value or 0 for value in cell[4:]] for cell in cells], dtype=np.float64).reshape(-1, len(STATS))
+    cube = Cube(labels)
+    cube.add(cube.keys(labels, codes), stats)
+    return cube
+
+
+class CubeStore:
+    """
+    The current cube of this worker. It follows the snapshot version,
+    applying only the rows a write changed; without snapshots it is rebuilt
+    from the database after `invalidate()`.
+    """
+
+    def __init__(self):
+        self._cube = None
+        self._lock = threading.Lock()
+
+    def current(self, db) -> Cube:
+        snapshot = snapshot_store.current()
+        cube = self._cube
+        if cube is not None and (snapshot is None or cube.version == snapshot.version):
+            return cube
+
+        with self._lock:
+            if self._cube is cube:
+                if snapshot is not None:
+                    self._cube = cube_from_snapshot(snapshot, previous=cube)
+                else:
+                    self._cube = cube_from_database(db)
+            return self._cube
+
+    def invalidate(self):
+        """Drop the cube built from the database after restaurants were written."""
+        if self._cube is not None and self._cube.version is None:
+            self._cube = None
+
+
+cube_store = CubeStore()
@@ -9,7 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from sqlalchemy.orm import Session
-from models import User, Restaurant, Review
+from models import User, Restaurant, Review, ReviewRollup, TextPosting
 from utils.fake_data import generate_restaurants, generate_reviews
 from database import SessionLocal, init_db
 from passlib.context import CryptContext
@@ -157,6 +157,8 @@ def initialize_data():
             
             # Clear existing data
             db.query(Review).delete()
+            db.query(ReviewRollup).delete()
+            db.query(TextPosting).delete()
             db.query(Restaurant).delete()
             db.query(User).delete()
             db.commit()
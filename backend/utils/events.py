@@ -0,0 +1,137 @@
+"""
+Per-city change broadcasting for Nativore.
+Recomputes a city's snapshot once per change and fans it out to every subscriber.
+"""
+import asyncio
+import os
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class CityBroadcaster:
+    """
+    Pushes recomputed snapshots to subscribers of a city.
+
+    `compute` is an async callable taking a city name and returning the
+    snapshot. One worker task runs per city while it has subscribers; bursts
+    of notifications within `debounce` seconds trigger a single recompute.
+
+    `notify` only reaches subscribers of this process. For writes handled by
+    other workers, `version` (a sync callable returning a token of the
+    underlying data) is polled every `poll_interval` seconds while anyone is
+    subscribed, and a new token marks every watched city as changed.
+    Unchanged snapshots are not pushed again.
+    """
+
+    def __init__(self, compute, debounce: float = 0.5, version=None, poll_interval: float = 1.0):
+        self.compute = compute
+        self.debounce = debounce
+        self.version = version
+        self.poll_interval = poll_interval
+        self._watcher = None
+        self._subscribers = {}  # city -> set of queues
+        self._dirty = {}  # city -> asyncio.Event
+        self._tasks = {}  # city -> worker task
+        self._latest = {}  # city -> last computed snapshot
+        self._loop = None
+
+    def subscribe(self, city: str) -> asyncio.Queue:
+        """Register a subscriber and return the queue it should read from."""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(city, set()).add(queue)
+
+        if city not in self._tasks:
+            self._dirty[city] = asyncio.Event()
+            self._tasks[city] = asyncio.create_task(self._run(city))
+        if self.version is not None and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+        if city in self._latest:
+            queue.put_nowait(self._latest[city])
+        else:
+            self._dirty[city].set()
+        return queue
+
+    def unsubscribe(self, city: str, queue: asyncio.Queue):
+        """Remove a subscriber, stopping the city's worker if it was the last."""
+        subscribers = self._subscribers.get(city)
+        if not subscribers:
+            return
+
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[city]
+            self._dirty.pop(city, None)
+            self._latest.pop(city, None)
+            task = self._tasks.pop(city, None)
+            if task:
+                task.cancel()
+        if not self._subscribers and self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    def notify(self, *cities):
+        """
+        Mark cities as changed. Cities nobody is watching are ignored.
+        Safe to call from any thread.
+        """
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._mark_dirty, cities)
+
+    def _mark_dirty(self, cities):
+        for city in cities:
+            event = self._dirty.get(city)
+            if event:
+                event.set()
+
+    def subscriber_count(self, city: str = None) -> int:
+        """Number of subscribers for a city, or across all cities."""
+        if city is not None:
+            return len(self._subscribers.get(city, ()))
+        return sum(len(s) for s in self._subscribers.values())
+
+    async def _run(self, city: str):
+        event = self._dirty[city]
+        while True:
+            await event.wait()
+            await asyncio.sleep(self.debounce)
+            event.clear()
+
+            try:
+                snapshot = await self.compute(city)
+            except Exception as e:
+                print(f"❌ Error computing snapshot for {city}: {e}")
+                continue
+
+            if city not in self._subscribers:
+                return
+            if snapshot == self._latest.get(city):
+                continue
+
+            self._latest[city] = snapshot
+            for queue in list(self._subscribers[city]):
+                # Slow consumers only ever see the latest snapshot
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(snapshot)
+
+    async def _watch(self):
+        seen = await run_in_threadpool(self.version)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                current = await run_in_threadpool(self.version)
+            except Exception as e:
+                print(f"❌ Error checking data version: {e}")
+                continue
+            if current != seen:
+                seen = current
+                self._mark_dirty(list(self._subscribers))
+
+
+# Seconds between keep-alive comments on idle event streams
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", 15))
+
+# Seconds between checks for data changed by other workers while streams are open
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", 1))
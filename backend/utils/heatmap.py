@@ -0,0 +1,223 @@
+"""
+Precomputed density heatmap tiles for Nativore maps and charts.
+For each city, and each city and cuisine, restaurants are binned into Web
+Mercator tiles at several zoom levels; every tile is a HEATMAP_GRID ×
+HEATMAP_GRID grid of restaurant counts and average prices, stored as gzipped
+little-endian arrays. After a write only the tiles whose restaurants changed
+are rebuilt.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+import numpy as np
+from sqlalchemy import func
+
+from models import Restaurant
+from utils.snapshot import snapshot_store
+
+# Cells per tile side
+HEATMAP_GRID = int(os.getenv("HEATMAP_GRID", 64))
+
+# Precomputed zoom levels (10: a city per tile, 14: a few streets)
+HEATMAP_ZOOMS = [int(z) for z in os.getenv("HEATMAP_ZOOMS", "10,12,14").split(",")]
+
+# Web Mercator latitude limit
+MAX_LATITUDE = 85.05112878
+
+# Row changes that move a restaurant between tiles, cells or layers
+TILE_COLUMNS = ("latitude", "longitude", "avg_price")
+TILE_DIMENSIONS = ("city", "cuisine")
+
+
+class Tile:
+    """One tile's gzipped payload: uint32 counts then float32 average prices, row-major."""
+
+    def __init__(self, counts: np.ndarray, sums: np.ndarray):
+        averages = np.divide(sums, counts, out=np.zeros(len(sums)), where=counts > 0)
+        raw = counts.astype("<u4").tobytes() + averages.astype("<f4").tobytes()
+        self.count = int(counts.sum())
+        self.version = hashlib.blake2b(raw, digest_size=8).hexdigest()
+        self.body = gzip.compress(raw, compresslevel=6, mtime=0)
+
+    def raw(self) -> bytes:
+        return gzip.decompress(self.body)
+
+
+def cell_coordinates(latitude: np.ndarray, longitude: np.ndarray, zoom: int):
+    """Global Web Mercator cell column and row at `zoom`, HEATMAP_GRID cells per tile side."""
+    n = 2 ** zoom * HEATMAP_GRID
+    lat = np.radians(np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (longitude + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def located(columns, rows: np.ndarray) -> np.ndarray:
+    """The rows that have coordinates."""
+    return rows[~np.isnan(columns["latitude"][rows]) & ~np.isnan(columns["longitude"][rows])]
+
+
+def tile_keys(columns, labels: dict, rows: np.ndarray) -> set:
+    """(city, cuisine or None, zoom, x, y) of every tile the given rows fall into."""
+    rows = located(columns, rows)
+    cities = np.asarray(labels["city"], dtype=object)[columns["city"][rows]]
+    cuisines = np.asarray(labels["cuisine"], dtype=object)[columns["cuisine"][rows]]
+    keys = set()
+    for zoom in HEATMAP_ZOOMS:
+        cx, cy = cell_coordinates(columns["latitude"][rows], columns["longitude"][rows], zoom)
+        for city, cuisine, x, y in zip(cities, cuisines, (cx // HEATMAP_GRID).tolist(), (cy // HEATMAP_GRID).tolist()):
+            keys.add((city, None, zoom, x, y))
+            keys.add((city, cuisine, zoom, x, y))
+    return keys
+
+
+def build_tiles(columns, labels: dict, rows: np.ndarray) -> dict:
+    """
+    Tiles of the given rows for every zoom level and layer. A tile is only
+    complete if `rows` includes all rows that fall into it.
+    """
+    rows = located(columns, rows)
+    if not len(rows):
+        return {}
+    city = columns["city"][rows].astype(np.int64)
+    cuisine = columns["cuisine"][rows].astype(np.int64)
+    prices = np.asarray(columns["avg_price"][rows], dtype=np.float64)
+    cuisine_labels = [None] + list(labels["cuisine"])
+
+    tiles = {}
+    for zoom in HEATMAP_ZOOMS:
+        side = 2 ** zoom
+        cx, cy = cell_coordinates(columns["latitude"][rows], columns["longitude"][rows], zoom)
+        tile = (cx // HEATMAP_GRID) * side + cy // HEATMAP_GRID
+        cell = (cy % HEATMAP_GRID) * HEATMAP_GRID + cx % HEATMAP_GRID
+
+        # Layer 0 of a city holds all cuisines, layer c + 1 cuisine c
+        for layer in (np.zeros(len(rows), dtype=np.int64), cuisine + 1):
+            order = np.lexsort((tile, layer, city))
+            group = np.stack([city[order], layer[order], tile[order]])
+            starts = np.flatnonzero(np.r_[True, (group[:, 1:] != group[:, :-1]).any(axis=0)])
+            for members, start in zip(np.split(order, starts[1:]), starts):
+                city_code, layer_code, tile_code = group[:, start].tolist()
+                key = (labels["city"][city_code], cuisine_labels[layer_code], zoom, tile_code // side, tile_code % side)
+                tiles[key] = Tile(
+                    np.bincount(cell[members], minlength=HEATMAP_GRID ** 2),
+                    np.bincount(cell[members], weights=prices[members], minlength=HEATMAP_GRID ** 2)
+                )
+    return tiles
+
+
+def changed_rows(old, new):
+    """Rows of each snapshot that were added, removed or moved in a way that affects tiles."""
+    _, old_rows, new_rows = np.intersect1d(old["id"], new["id"], assume_unique=True, return_indices=True)
+
+    differs = np.zeros(len(old_rows), dtype=bool)
+    for name in TILE_COLUMNS:
+        differs |= ~np.isclose(old[name][old_rows], new[name][new_rows], equal_nan=True)
+    for dim in TILE_DIMENSIONS:
+        old_labels = np.asarray(old.labels[dim], dtype=object)[old[dim][old_rows]]
+        new_labels = np.asarray(new.labels[dim], dtype=object)[new[dim][new_rows]]
+        differs |= old_labels != new_labels
+
+    removed = np.setdiff1d(np.arange(old.size), old_rows)
+    added = np.setdiff1d(np.arange(new.size), new_rows)
+    return np.concatenate([removed, old_rows[differs]]), np.concatenate([added, new_rows[differs]])
+
+
+def rows_in_tiles(snapshot, keys: set) -> np.ndarray:
+    """Rows of the snapshot inside any of the city-wide tiles among `keys`."""
+    rows = located(snapshot, np.arange(snapshot.size))
+    mask = np.zeros(len(rows), dtype=bool)
+    for zoom in HEATMAP_ZOOMS:
+        side = 2 ** zoom
+        wanted = [
+            snapshot.code("city", city) * side * side + x * side + y
+            for city, cuisine, z, x, y in keys if z == zoom and cuisine is None and snapshot.code("city", city) >= 0
+        ]
+        if not wanted:
+            continue
+        cx, cy = cell_coordinates(snapshot["latitude"][rows], snapshot["longitude"][rows], zoom)
+        tile = snapshot["city"][rows].astype(np.int64) * side * side + (cx // HEATMAP_GRID) * side + cy // HEATMAP_GRID
+        mask |= np.isin(tile, wanted)
+    return rows[mask]
+
+
+class HeatmapIndex:
+    """All tiles of one snapshot version, keyed by (city, cuisine or None, zoom, x, y)."""
+
+    def __init__(self, tiles: dict, snapshot=None):
+        self.tiles = tiles
+        self.snapshot = snapshot
+        self.version = snapshot.version if snapshot is not None else None
+
+    @classmethod
+    def from_snapshot(cls, snapshot, previous=None):
+        """
+        Tiles for a snapshot. With the index of an earlier snapshot only the
+        tiles containing changed restaurants are rebuilt; the rest are reused.
+        """
+        if previous is None or previous.snapshot is None:
+            return cls(build_tiles(snapshot, snapshot.labels, np.arange(snapshot.size)), snapshot)
+
+        old_rows, new_rows = changed_rows(previous.snapshot, snapshot)
+        dirty = tile_keys(previous.snapshot, previous.snapshot.labels, old_rows) | tile_keys(snapshot, snapshot.labels, new_rows)
+        tiles = {key: tile for key, tile in previous.tiles.items() if key not in dirty}
+        rebuilt = build_tiles(snapshot, snapshot.labels, rows_in_tiles(snapshot, dirty))
+        tiles.update({key: tile for key, tile in rebuilt.items() if key in dirty})
+        return cls(tiles, snapshot)
+
+    @classmethod
+    def from_database(cls, db):
+        rows = db.query(
+            Restaurant.latitude, Restaurant.longitude, func.coalesce(Restaurant.avg_price, 0.0),
+            Restaurant.city, Restaurant.cuisine
+        ).all()
+        columns, labels = {}, {}
+        for i, name in enumerate(TILE_COLUMNS):
+            columns[name] = np.array([np.nan if row[i] is None else row[i] for row in rows], dtype=np.float64)
+        for i, dim in enumerate(TILE_DIMENSIONS, start=len(TILE_COLUMNS)):
+            uniques, codes = np.unique(np.asarray([row[i] for row in rows], dtype=object).astype(str), return_inverse=True)
+            labels[dim], columns[dim] = uniques.tolist(), codes.ravel()
+        return cls(build_tiles(columns, labels, np.arange(len(rows))))
+
+    def layer(self, city: str, cuisine: str = None) -> dict:
+        """(zoom, x, y) -> tile for one city, optionally one cuisine."""
+        return {
+            (z, x, y): tile for (tile_city, tile_cuisine, z, x, y), tile in self.tiles.items()
+            if tile_city == city and tile_cuisine == cuisine
+        }
+
+
+class HeatmapStore:
+    """
+    The current heatmap index of this worker. It follows the snapshot version,
+    rebuilding only the tiles a write touched; without snapshots it is rebuilt
+    from the database after `invalidate()`.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def current(self, db) -> HeatmapIndex:
+        snapshot = snapshot_store.current()
+        index = self._index
+        if index is not None and (snapshot is None or index.version == snapshot.version):
+            return index
+
+        with self._lock:
+            if self._index is index:
+                if snapshot is not None:
+                    self._index = HeatmapIndex.from_snapshot(snapshot, previous=index)
+                else:
+                    self._index = HeatmapIndex.from_database(db)
+            return self._index
+
+    def invalidate(self):
+        """Drop the index built from the database after restaurants were written."""
+        if self._index is not None and self._index.version is None:
+            self._index = None
+
+
+heatmap_store = HeatmapStore()
@@ -0,0 +1,129 @@
+"""
+Histogram engine for Nativore analytics.
+Counts and sums restaurants per bin of a numeric column for arbitrary bin
+edges, optionally per city, area or cuisine, in one pass: NumPy digitize
+over the memory-mapped snapshot, or a SQL CASE aggregation without it.
+Restaurants whose measure is NULL are left out of every bin.
+"""
+import numpy as np
+from sqlalchemy import case, func
+
+from models import Restaurant, City, Area, Cuisine, dimension_key
+from utils.snapshot import snapshot_store
+
+# Columns histograms can be computed over, with their default bin edges
+HISTOGRAM_MEASURES = {
+    "avg_price": [300, 600],
+    "rating": [1, 2, 3, 4],
+    "spending_index": [0.5, 1.0, 1.5, 2.0],
+    "review_count": [10, 50, 100, 500],
+}
+
+# Dimensions a histogram can be broken down by
+HISTOGRAM_GROUPS = {"city": City, "area": Area, "cuisine": Cuisine}
+
+MAX_BIN_EDGES = 100
+
+# Price bands by average price for two
+PRICE_BANDS = ["budget", "mid_range", "premium"]
+PRICE_BAND_EDGES = HISTOGRAM_MEASURES["avg_price"]
+
+
+def bucket_codes(values: np.ndarray, edges) -> np.ndarray:
+    """
+    Bin index of each value: bin 0 is below edges[0], bin i covers
+    [edges[i-1], edges[i]) and the last bin is edges[-1] and above.
+    """
+    return np.digitize(values, edges)
+
+
+def bucket_expression(column, edges):
+    """SQL expression for the bin index of a column, matching bucket_codes (edges must not be empty)."""
+    return case(*[(column < edge, i) for i, edge in enumerate(edges)], else_=len(edges))
+
+
+def histogram_from_snapshot(snapshot, measure: str, edges, group_by: str = None, **filters):
+    """Per-group (counts, sums) arrays over len(edges) + 1 bins from the snapshot."""
+    mask = snapshot.mask(**filters) & ~snapshot.isnull(measure)
+    values = np.asarray(snapshot[measure][mask], dtype=np.float64)
+    n_bins = len(edges) + 1
+
+    if group_by:
+        groups, labels = snapshot[group_by][mask].astype(np.int64), snapshot.labels[group_by]
+    else:
+        groups, labels = np.zeros(len(values), dtype=np.int64), [None]
+
+    flat = groups * n_bins + bucket_codes(values, edges)
+    size = len(labels) * n_bins
+    counts = np.bincount(flat, minlength=size).reshape(len(labels), n_bins)
+    sums = np.bincount(flat, weights=values, minlength=size).reshape(len(labels), n_bins)
+
+    return {labels[i]: (counts[i], sums[i]) for i in range(len(labels)) if counts[i].any()}
+
+
+def histogram_from_database(db, measure: str, edges, group_by: str = None, city=None, cuisine=None):
+    """Per-group (counts, sums) arrays from one GROUP BY over the bin expression."""
+    column = getattr(Restaurant, measure)
+    keys = [getattr(Restaurant, f"{group_by}_id") if group_by else None]
+    keys.append(bucket_expression(column, edges).label("bucket") if edges else None)
+    grouped = [key for key in keys if key is not None]
+
+    query = db.query(*grouped, func.count(Restaurant.id), func.sum(column)).filter(column.isnot(None)).group_by(*grouped)
+    if city:
+        query = query.filter(Restaurant.city_id == dimension_key(City, city))
+    if cuisine:
+        query = query.filter(Restaurant.cuisine_id == dimension_key(Cuisine, cuisine))
+
+    model = HISTOGRAM_GROUPS.get(group_by)
+    names = dict(db.query(model.id, model.name)) if model else {0: None}
+
+    n_bins = len(edges) + 1
+    result = {}
+    for row in query.all():
+        key = row[0] if group_by else 0
+        index = row[len(grouped) - 1] if edges else 0
+        count, total = row[-2:]
+        counts, sums = result.setdefault(names[key], (np.zeros(n_bins, dtype=np.int64), np.zeros(n_bins)))
+        counts[index] += count
+        sums[index] += total or 0
+    return result
+
+
+def histogram(db, measure: str, edges, group_by: str = None, city=None, cuisine=None):
+    """
+    Per-group (counts, sums) arrays over len(edges) + 1 bins; the single
+    group is None without `group_by`. Groups without rows are omitted.
+    """
+    snapshot = snapshot_store.current()
+    if snapshot is not None:
+        return histogram_from_snapshot(snapshot, measure, edges, group_by, city=city, cuisine=cuisine)
+    return histogram_from_database(db, measure, edges, group_by, city=city, cuisine=cuisine)
+
+
+def overall(groups: dict, n_bins: int):
+    """(counts, sums) summed over all groups of a histogram."""
+    counts, sums = np.zeros(n_bins, dtype=np.int64), np.zeros(n_bins)
+    for group_counts, group_sums in groups.values():
+        counts += group_counts
+        sums += group_sums
+    return counts, sums
+
+
+def histogram_bins(edges, counts, sums):
+    """Bins with counts, shares, averages and the cumulative distribution."""
+    total = int(counts.sum())
+    bounds = [None] + list(edges) + [None]
+    bins = []
+    cumulative = 0
+    for i, count in enumerate(counts.tolist()):
+        cumulative += count
+        bins.append({
+            "lower": bounds[i],
+            "upper": bounds[i + 1],
+            "count": count,
+            "percentage": round(count / total * 100, 1) if total else 0,
+            "avg": round(float(sums[i]) / count, 2) if count else 0,
+            "cumulative_count": cumulative,
+            "cumulative_percentage": round(cumulative / total * 100, 1) if total else 0
+        })
+    return bins
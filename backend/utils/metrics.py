@@ -0,0 +1,43 @@
+"""
+Lightweight in-process metrics for Nativore.
+"""
+import bisect
+import threading
+
+
+class Histogram:
+    """
+    Histogram of observed values (e.g. seconds) over fixed bucket bounds.
+    """
+
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record one observation."""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self):
+        """Return the count in each bucket (keyed by upper bound) plus totals."""
+        with self._lock:
+            counts = list(self._counts)
+            total = sum(counts)
+            return {
+                "buckets": {
+                    **{f"le_{bound}": count for bound, count in zip(self.buckets, counts)},
+                    "le_inf": counts[-1]
+                },
+                "count": total,
+                "sum": round(self._sum, 6),
+                "avg": round(self._sum / total, 6) if total else 0,
+                "max": round(self._max, 6)
+            }
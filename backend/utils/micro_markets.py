@@ -0,0 +1,229 @@
+"""
+Micro-market discovery batch job for Nativore.
+Clusters restaurant coordinates per city with a grid-based DBSCAN in NumPy,
+so clusters follow where restaurants actually are rather than the free-text
+area. Persists one micro_markets row per cluster and each restaurant's
+micro_market_id; restaurants created since the last run are unassigned.
+A cluster keeps the id and label of the market it shares the most members
+with, so ids stay stable across runs.
+
+Usage: python utils/micro_markets.py
+"""
+import itertools
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from database import engine
+from models import City, MicroMarket, Restaurant
+
+# Neighbourhood radius: grid cell side in meters
+MICRO_MARKET_RADIUS_METERS = float(os.getenv("MICRO_MARKET_RADIUS_METERS", 1000))
+
+# Restaurants within a cell's 3x3 block needed for the cell to seed a cluster
+MICRO_MARKET_MIN_RESTAURANTS = int(os.getenv("MICRO_MARKET_MIN_RESTAURANTS", 5))
+
+EARTH_RADIUS_METERS = 6371000.0
+
+NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def project(latitude: np.ndarray, longitude: np.ndarray):
+    """Equirectangular projection to meters around the points' mean latitude (fine at city scale)."""
+    scale = np.cos(np.radians(latitude.mean())) if len(latitude) else 1.0
+    x = EARTH_RADIUS_METERS * np.radians(longitude) * scale
+    y = EARTH_RADIUS_METERS * np.radians(latitude)
+    return x, y
+
+
+def grid_dbscan(x: np.ndarray, y: np.ndarray, eps: float, min_points: int) -> np.ndarray:
+    """
+    Cluster label per point (-1 for noise), numbered largest cluster first.
+
+    Points are bucketed into eps-sized grid cells. A cell is dense when its
+    3x3 block holds at least `min_points` points; touching dense cells form
+    one cluster, and sparse cells touching a dense one join its cluster.
+    Everything is a few sorts and array lookups, so it is linear-ish in the
+    number of points.
+    """
+    if not len(x):
+        return np.zeros(0, dtype=np.int64)
+
+    cx = np.floor((x - x.min()) / eps).astype(np.int64) + 1
+    cy = np.floor((y - y.min()) / eps).astype(np.int64) + 1
+    width = int(cy.max()) + 2
+    cells, point_cell, counts = np.unique(cx * width + cy, return_inverse=True, return_counts=True)
+    point_cell = point_cell.ravel()
+
+    # Index of each cell's neighbour in `cells`, or -1 where that cell is empty
+    neighbours = []
+    for dx, dy in NEIGHBOURS:
+        target = cells + dx * width + dy
+        index = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+        neighbours.append(np.where(cells[index] == target, index, -1))
+
+    block = sum(np.where(n >= 0, counts[n], 0) for n in neighbours)
+    dense = block >= min_points
+
+    # Connected components of dense cells: propagate the smallest cell index
+    # to dense neighbours, with pointer jumping, until nothing changes
+    unassigned = len(cells)
+    label = np.where(dense, np.arange(len(cells)), unassigned)
+    while True:
+        previous = label
+        for n in neighbours:
+            linked = dense & (n >= 0)
+            linked[linked] = dense[n[linked]]
+            label = np.where(linked, np.minimum(label, label[np.maximum(n, 0)]), label)
+        label[dense] = label[label[dense]]
+        if np.array_equal(label, previous):
+            break
+
+    # Sparse cells next to a cluster are its border
+    border = np.full(len(cells), unassigned)
+    for n in neighbours:
+        linked = ~dense & (n >= 0)
+        linked[linked] = dense[n[linked]]
+        border = np.where(linked, np.minimum(border, label[np.maximum(n, 0)]), border)
+    label = np.where(dense, label, border)
+
+    points = label[point_cell]
+    clustered = points < unassigned
+    roots, inverse, sizes = np.unique(points[clustered], return_inverse=True, return_counts=True)
+    rank = np.empty(len(roots), dtype=np.int64)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(len(roots))
+
+    labels = np.full(len(x), -1, dtype=np.int64)
+    labels[clustered] = rank[inverse.ravel()]
+    return labels
+
+
+def summarize(labels: np.ndarray, latitude: np.ndarray, longitude: np.ndarray, x: np.ndarray, y: np.ndarray):
+    """Per cluster label: (centroid latitude, centroid longitude, radius in km, size)."""
+    clustered = labels >= 0
+    labels, latitude, longitude, x, y = (a[clustered] for a in (labels, latitude, longitude, x, y))
+    n = int(labels.max()) + 1 if len(labels) else 0
+
+    sizes = np.bincount(labels, minlength=n)
+    mean = {name: np.bincount(labels, weights=values, minlength=n) / np.maximum(sizes, 1)
+            for name, values in (("lat", latitude), ("lon", longitude), ("x", x), ("y", y))}
+
+    distance = np.hypot(x - mean["x"][labels], y - mean["y"][labels])
+    order = np.argsort(labels, kind="stable")
+    starts = np.searchsorted(labels[order], np.arange(n))
+    radius = np.maximum.reduceat(distance[order], starts) if n else np.zeros(0)
+
+    return [
+        (float(mean["lat"][i]), float(mean["lon"][i]), round(float(radius[i]) / 1000, 3), int(sizes[i]))
+        for i in range(n)
+    ]
+
+
+def match_markets(labels: np.ndarray, current: np.ndarray, market_ids: np.ndarray) -> np.ndarray:
+    """
+    Existing market id per cluster label, or -1 where the cluster is new.
+
+    Clusters and markets are paired greedily by the number of restaurants
+    they share (`current` is each point's market id), most shared first;
+    each market matches at most one cluster.
+    """
+    n = int(labels.max()) + 1 if len(labels) else 0
+    matched = np.full(n, -1, dtype=np.int64)
+
+    shared = (labels >= 0) & np.isin(current, market_ids)
+    pairs, overlap = np.unique(np.stack([labels[shared], current[shared]], axis=1), axis=0, return_counts=True)
+    used = set()
+    for label, market in pairs[np.argsort(-overlap, kind="stable")].tolist():
+        if matched[label] < 0 and market not in used:
+            matched[label] = market
+            used.add(market)
+    return matched
+
+
+def cluster_city(conn, city_id: int):
+    """Cluster one city's restaurants and persist markets and assignments. Returns (clusters, outliers)."""
+    rows = conn.execute(
+        select(Restaurant.id, Restaurant.latitude, Restaurant.longitude, Restaurant.micro_market_id)
+        .where(Restaurant.city_id == city_id)
+        .where(Restaurant.latitude.isnot(None), Restaurant.longitude.isnot(None))
+        .order_by(Restaurant.id)
+    ).all()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    latitude = np.array([r[1] for r in rows], dtype=np.float64)
+    longitude = np.array([r[2] for r in rows], dtype=np.float64)
+    current = np.array([r[3] if r[3] is not None else -1 for r in rows], dtype=np.int64)
+
+    x, y = project(latitude, longitude)
+    labels = grid_dbscan(x, y, MICRO_MARKET_RADIUS_METERS, MICRO_MARKET_MIN_RESTAURANTS)
+    clusters = summarize(labels, latitude, longitude, x, y)
+
+    # Clusters take over the markets they overlap, so unchanged members need no write
+    existing = dict(conn.execute(
+        select(MicroMarket.id, MicroMarket.label).where(MicroMarket.city_id == city_id)
+    ).all())
+    matched = match_markets(labels, current, np.array(list(existing), dtype=np.int64))
+
+    stale = sorted(set(existing) - set(matched.tolist()))
+    if stale:
+        # Restaurants that moved to another city may still point at these markets
+        conn.execute(update(Restaurant).where(Restaurant.micro_market_id.in_(stale)).values(
+            micro_market_id=None, updated_at=Restaurant.updated_at
+        ))
+        conn.execute(delete(MicroMarket).where(MicroMarket.id.in_(stale)))
+
+    taken = {existing[market] for market in matched.tolist() if market >= 0}
+    free_labels = (label for label in itertools.count() if label not in taken)
+    now = datetime.utcnow()
+    for label, (lat, lon, radius, size) in enumerate(clusters):
+        values = dict(latitude=lat, longitude=lon, radius_km=radius, restaurant_count=size, computed_at=now)
+        if matched[label] >= 0:
+            conn.execute(update(MicroMarket).where(MicroMarket.id == int(matched[label])).values(**values))
+        else:
+            matched[label] = conn.execute(
+                insert(MicroMarket).values(city_id=city_id, label=next(free_labels), **values)
+            ).inserted_primary_key[0]
+
+    market_ids = np.append(matched, -1)
+    assigned = market_ids[labels]  # label -1 picks the trailing -1
+    changed = np.flatnonzero(assigned != current)
+    if len(changed):
+        # Derived data, not a restaurant edit: leave updated_at alone
+        conn.execute(
+            update(Restaurant).where(Restaurant.id == bindparam("restaurant_id")).values(
+                micro_market_id=bindparam("market_id"), updated_at=Restaurant.updated_at
+            ),
+            [
+                {"restaurant_id": int(ids[i]), "market_id": int(assigned[i]) if assigned[i] >= 0 else None}
+                for i in changed
+            ]
+        )
+
+    conn.execute(update(Restaurant).where(
+        Restaurant.city_id == city_id, Restaurant.micro_market_id.isnot(None),
+        Restaurant.latitude.is_(None) | Restaurant.longitude.is_(None)
+    ).values(micro_market_id=None, updated_at=Restaurant.updated_at))
+
+    return len(clusters), int((labels < 0).sum())
+
+
+def main():
+    started = time.monotonic()
+    with engine.begin() as conn:
+        cities = conn.execute(select(City.id, City.name).order_by(City.name)).all()
+        results = {name: cluster_city(conn, city_id) for city_id, name in cities}
+
+    print(f"✅ Micro-markets recomputed in {time.monotonic() - started:.2f}s:")
+    for name, (clusters, outliers) in results.items():
+        print(f"   {name}: {clusters} micro-markets, {outliers} outlying restaurants")
+
+
+if __name__ == "__main__":
+    main()
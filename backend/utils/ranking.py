@@ -0,0 +1,32 @@
+"""
+Ranking score batch job for Nativore.
+Recomputes each city's prior (its review-weighted mean rating) and every
+restaurant's Bayesian ranking score from it. Scores are also kept up to date
+on review writes between runs; run this periodically (e.g. nightly) as
+priors drift.
+
+Usage: python utils/ranking.py
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import engine
+from models import update_ranking_scores
+from utils.snapshot import snapshot_store
+
+
+def main():
+    with engine.begin() as conn:
+        priors = update_ranking_scores(conn)
+    # Running workers pick up the new snapshot version; /top-k ranks from it
+    snapshot_store.ensure()
+    print("✅ Ranking scores recomputed. City priors:")
+    for city, (mean, weight) in sorted(priors.items()):
+        print(f"   {city}: mean rating {mean:.3f}, weight {weight:.1f} reviews")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Stale-while-revalidate report cache for Nativore.
+City reports are precomputed in the background and served from memory;
+stale results are returned instantly while a refresh runs asynchronously.
+"""
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from fastapi.concurrency import run_in_threadpool
+
+from database import read_session
+from utils.singleflight import IGNORED_PARAMS, call_key
+
+# Cities whose reports are precomputed
+SUPPORTED_CITIES = ["Chennai", "Coimbatore", "Tiruppur", "Madurai", "Thoothukudi"]
+
+# Seconds between scheduler passes
+REPORT_REFRESH_INTERVAL = float(os.getenv("REPORT_REFRESH_INTERVAL", 15))
+
+
+class Report:
+    """A registered report: the route function and its staleness bounds."""
+
+    def __init__(self, name: str, func, defaults: dict, per_city: bool = True):
+        self.name = name
+        self.func = func
+        # Background refreshes call the plain sync route, below any async wrappers
+        self.compute = inspect.unwrap(func)
+        self.defaults = defaults
+        self.per_city = per_city
+        env_name = name.upper().replace("-", "_")
+        # Younger than max_age: fresh. Up to max_stale: served while refreshing.
+        self.max_age = float(os.getenv(f"REPORT_{env_name}_MAX_AGE", os.getenv("REPORT_MAX_AGE", 60)))
+        self.max_stale = float(os.getenv(f"REPORT_{env_name}_MAX_STALE", os.getenv("REPORT_MAX_STALE", 600)))
+
+    def views(self, cities=SUPPORTED_CITIES):
+        """Route keyword arguments of the precomputed views: one per city, or one overall."""
+        if not self.per_city:
+            return [dict(self.defaults)]
+        return [dict(self.defaults, city=city) for city in cities]
+
+    def is_view(self, kwargs: dict) -> bool:
+        """Whether a route call is one of the precomputed views."""
+        params = {name: value for name, value in kwargs.items() if name not in IGNORED_PARAMS}
+        return params in self.views()
+
+
+class ReportCache:
+    """
+    Cached report results keyed by route call, refreshed in a small
+    background thread pool. Each key is refreshed by at most one thread.
+    Only the precomputed views are cached, so the cache cannot grow with
+    client-chosen parameters; other calls are computed per request.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.reports = {}
+        self._entries = {}  # key -> (computed_at, value)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reports")
+        self._task = None
+
+    def register(self, name: str, per_city: bool = True, **defaults):
+        """
+        Decorator for routes whose results may be served stale-while-revalidate
+        (sync routes, optionally wrapped by single_flight); the result is async.
+        `defaults` are the non-city parameters of the precomputed views; routes
+        without a city parameter pass per_city=False.
+        """
+        def decorator(func):
+            report = Report(name, func, defaults, per_city)
+            self.reports[name] = report
+
+            @functools.wraps(func)
+            async def wrapper(**kwargs):
+                return await self.get(report, kwargs)
+
+            return wrapper
+
+        return decorator
+
+    async def get(self, report: Report, kwargs: dict):
+        """
+        Serve a cached result if usable, otherwise compute it now. Clients
+        in their read-your-writes window bypass the cache, which may predate
+        their write.
+        """
+        db = kwargs.get("db")
+        if not report.is_view(kwargs) or (db is not None and db.info.get("read_your_writes")):
+            return await self._call(report, kwargs)
+
+        key = call_key(report.func, kwargs)
+        entry = self._entries.get(key)
+
+        if entry:
+            computed_at, value = entry
+            age = time.monotonic() - computed_at
+            if age <= report.max_age:
+                return value
+            if age <= report.max_stale:
+                self.refresh(report, kwargs)
+                return value
+
+        return self._store(key, await self._call(report, kwargs))
+
+    async def _call(self, report: Report, kwargs: dict):
+        if asyncio.iscoroutinefunction(report.func):
+            return await report.func(**kwargs)
+        return await run_in_threadpool(report.func, **kwargs)
+
+    def refresh(self, report: Report, kwargs: dict):
+        """Recompute a result in the background unless already underway."""
+        key = call_key(report.func, kwargs)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, report, key, kwargs)
+
+    def refresh_city(self, city: str):
+        """
+        Recompute every report affected by a change in a city. Only views are
+        cached, so per-city reports are skipped for cities without views.
+        """
+        for report in self.reports.values():
+            if report.per_city and city not in SUPPORTED_CITIES:
+                continue
+            for kwargs in report.views([city]):
+                self.refresh(report, kwargs)
+
+    def warm(self):
+        """Compute every precomputed view now and wait for all of them."""
+        futures = []
+        for report in self.reports.values():
+            for kwargs in report.views():
+                key = call_key(report.func, kwargs)
+                with self._lock:
+                    self._refreshing.add(key)
+                futures.append(self._executor.submit(self._refresh, report, key, kwargs))
+        wait(futures)
+
+    def _refresh(self, report: Report, key, kwargs: dict):
+        db = read_session()
+        try:
+            self._store(key, report.compute(**dict(kwargs, db=db)))
+        except Exception as e:
+            print(f"❌ Error refreshing report {report.name}: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        return value
+
+    def results(self, name: str):
+        """Cached results of a report's precomputed views."""
+        report = self.reports[name]
+        for kwargs in report.views():
+            entry = self._entries.get(call_key(report.func, kwargs))
+            if entry:
+                yield entry[1]
+
+    def due(self):
+        """Yield (report, kwargs) for precomputed views that are missing or past max_age."""
+        now = time.monotonic()
+        for report in self.reports.values():
+            for kwargs in report.views():
+                entry = self._entries.get(call_key(report.func, kwargs))
+                if entry is None or now - entry[0] > report.max_age:
+                    yield report, kwargs
+
+    async def _schedule(self):
+        while True:
+            for report, kwargs in list(self.due()):
+                self.refresh(report, kwargs)
+            await asyncio.sleep(REPORT_REFRESH_INTERVAL)
+
+    def start(self):
+        """Start the background precomputation loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule())
+
+    def stop(self):
+        """Stop the background precomputation loop."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "entries": len(self._entries),
+            "refreshing": len(self._refreshing),
+            "reports": {
+                name: {"max_age": report.max_age, "max_stale": report.max_stale}
+                for name, report in self.reports.items()
+            },
+            "oldest_age_seconds": round(max((now - t for t, _ in self._entries.values()), default=0), 1)
+        }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,208 @@
+"""
+Review partition management for Nativore.
+On PostgreSQL the reviews table is range-partitioned by created_at month
+(see database/schema.sql); this module pre-creates future partitions and
+detaches old ones for archiving. On SQLite old reviews are moved to an
+archive table instead. Monthly rollups are kept in both cases.
+
+Usage: python utils/review_partitions.py ensure
+       python utils/review_partitions.py archive YYYY-MM
+       python utils/review_partitions.py migrate   (one-off, for a reviews
+           table created before partitioning)
+"""
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import inspect, text
+from database import add_column, engine
+
+# Months of partitions created ahead of the current one
+REVIEW_PARTITION_MONTHS_AHEAD = int(os.getenv("REVIEW_PARTITION_MONTHS_AHEAD", 3))
+
+# The partitioned reviews table, as in database/schema.sql (create_all cannot
+# declare partitioning, and the primary key must include the partition key)
+PARTITIONED_REVIEWS_DDL = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id SERIAL,
+    user_id INTEGER NOT NULL,
+    restaurant_id INTEGER NOT NULL,
+    rating FLOAT NOT NULL,
+    comment TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(id) ON DELETE CASCADE
+) PARTITION BY RANGE (created_at)
+"""
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"reviews_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(conn) -> bool:
+    """Whether the reviews table is a partitioned PostgreSQL table."""
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'reviews'::regclass"
+    )).first() is not None
+
+
+def create_partitioned_reviews(conn):
+    """
+    Create the partitioned reviews table and its default partition on
+    PostgreSQL. An existing unpartitioned reviews table is left as it is
+    (see partition_existing_reviews).
+    """
+    conn.execute(text(PARTITIONED_REVIEWS_DDL))
+    if is_partitioned(conn):
+        conn.execute(text("CREATE TABLE IF NOT EXISTS reviews_default PARTITION OF reviews DEFAULT"))
+
+
+def review_partitions(conn):
+    """Names of the monthly partitions attached to reviews, oldest first."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'reviews'::regclass AND c.relname LIKE 'reviews_y%' ORDER BY c.relname"
+    ))
+    return [row[0] for row in rows]
+
+
+def ensure_partitions(months_ahead: int = REVIEW_PARTITION_MONTHS_AHEAD):
+    """
+    Create the partitions for the current month and `months_ahead` months
+    after it. Reviews outside every monthly partition land in reviews_default;
+    any such rows for a new partition's month are moved into it before it is
+    attached, since PostgreSQL refuses to attach over rows in the default.
+    """
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            if conn.dialect.name == "postgresql":
+                print(
+                    "⚠️ reviews is not partitioned (it predates partitioning); "
+                    "run `python utils/review_partitions.py migrate` to convert it"
+                )
+            return []
+
+        created = []
+        existing = set(review_partitions(conn))
+        current = date.today().replace(day=1)
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+
+            bounds = {"start": month.isoformat(), "end": add_months(month, 1).isoformat()}
+            in_month = "created_at >= :start AND created_at < :end"
+            conn.execute(text(f"CREATE TABLE {name} (LIKE reviews INCLUDING DEFAULTS)"))
+            conn.execute(text(f"INSERT INTO {name} SELECT * FROM reviews_default WHERE {in_month}"), bounds)
+            conn.execute(text(f"DELETE FROM reviews_default WHERE {in_month}"), bounds)
+            conn.execute(text(
+                f"ALTER TABLE reviews ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+            ))
+            created.append(name)
+
+    if created:
+        print(f"✅ Created review partitions: {', '.join(created)}")
+    return created
+
+
+def partition_existing_reviews():
+    """
+    One-off migration for a PostgreSQL reviews table created before
+    partitioning: rebuild it as a partitioned table, copy the rows over and
+    add the monthly partitions. Older reviews stay in reviews_default.
+    Indexes are recreated by init_db on the next start.
+    """
+    from models import Review
+
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql" or is_partitioned(conn):
+            print("✅ Nothing to migrate: reviews is already partitioned or not on PostgreSQL")
+            return 0
+
+        conn.execute(text("ALTER TABLE reviews RENAME TO reviews_unpartitioned"))
+        primary_key = conn.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = 'reviews_unpartitioned'::regclass AND contype = 'p'"
+        )).scalar()
+        if primary_key:
+            # Constraint names share the index namespace; free it for the new table
+            conn.execute(text(
+                f"ALTER TABLE reviews_unpartitioned RENAME CONSTRAINT {primary_key} TO reviews_unpartitioned_pkey"
+            ))
+        create_partitioned_reviews(conn)
+
+        # Columns added to the old table over time (see init_db)
+        reviews = Review.__table__
+        present = {column["name"] for column in inspect(conn).get_columns("reviews")}
+        for column in reviews.columns:
+            if column.name not in present:
+                add_column(conn, reviews, column)
+
+        columns = ", ".join(column["name"] for column in inspect(conn).get_columns("reviews_unpartitioned"))
+        copied = conn.execute(text(
+            f"INSERT INTO reviews ({columns}) SELECT {columns} FROM reviews_unpartitioned"
+        )).rowcount
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('reviews', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM reviews"
+        ))
+        conn.execute(text("DROP TABLE reviews_unpartitioned"))
+
+    print(f"✅ Partitioned reviews ({copied} rows copied)")
+    ensure_partitions()
+    return copied
+
+
+def archive_before(month: date):
+    """
+    Take reviews created before `month` out of the live table. PostgreSQL
+    partitions are detached and kept as standalone tables to dump or drop;
+    on SQLite the rows are moved to reviews_archive.
+    """
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            archived = [name for name in review_partitions(conn) if name < partition_name(month)]
+            for name in archived:
+                conn.execute(text(f"ALTER TABLE reviews DETACH PARTITION {name}"))
+            print(f"✅ Detached review partitions: {', '.join(archived) or 'none'}")
+            return archived
+
+        conn.execute(text("CREATE TABLE IF NOT EXISTS reviews_archive AS SELECT * FROM reviews WHERE 1 = 0"))
+        params = {"before": month.isoformat()}
+        conn.execute(text("INSERT INTO reviews_archive SELECT * FROM reviews WHERE created_at < :before"), params)
+        moved = conn.execute(text("DELETE FROM reviews WHERE created_at < :before"), params).rowcount
+        print(f"✅ Archived {moved} reviews created before {month.isoformat()}")
+        return moved
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    if command == "ensure":
+        ensure_partitions()
+    elif command == "archive" and len(sys.argv) > 2:
+        year, month = sys.argv[2].split("-")
+        archive_before(date(int(year), int(month), 1))
+    elif command == "migrate":
+        partition_existing_reviews()
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Full-text restaurant search for Nativore.
+A TF-IDF vector space over restaurant name, cuisine and description, built
+locally (no model service): words, word pairs and character trigrams are
+hashed into SEARCH_HASH_BITS-bit features, and queries are scored by cosine
+similarity over the features' posting lists. New and changed restaurants go
+into a small delta segment that is merged into the main one as it grows.
+"""
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sqlalchemy import and_, func, or_
+
+from database import SessionLocal, settled_before
+from models import Restaurant, index_terms, tokenize
+
+SEARCH_HASH_BITS = int(os.getenv("SEARCH_HASH_BITS", 20))
+
+# Seconds between background checks for restaurants changed since the last refresh
+SEARCH_REFRESH_INTERVAL = float(os.getenv("SEARCH_REFRESH_INTERVAL", 1.0))
+
+# Delta documents kept before they are merged into the main segment
+SEARCH_MERGE_THRESHOLD = int(os.getenv("SEARCH_MERGE_THRESHOLD", 1000))
+
+MAX_SEARCH_RESULTS = 50
+
+# Term weight per field
+FIELD_WEIGHTS = {"name": 2.0, "cuisine": 1.5, "description": 1.0}
+
+# Character trigrams count less than whole words; they catch spelling variants
+TRIGRAM_WEIGHT = 0.3
+
+# Query features in more than this share of documents are skipped unless nothing else matches
+MAX_DOCUMENT_FREQUENCY = 0.5
+
+INDEXED_COLUMNS = (Restaurant.id, Restaurant.name, Restaurant.cuisine, Restaurant.description, Restaurant.city, Restaurant.is_active)
+
+
+def feature_hash(term: str) -> int:
+    """Stable across processes, unlike hash()."""
+    return zlib.crc32(term.encode()) & ((1 << SEARCH_HASH_BITS) - 1)
+
+
+def text_features(fields: dict):
+    """Sorted hashed features of a document's fields and their sublinear term weights."""
+    counts = Counter()
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS.get(field, 1.0)
+        for term, frequency in index_terms(text).items():
+            counts[term] += weight * frequency
+        for token in tokenize(text):
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                counts[f"#3 {padded[i:i + 3]}"] += weight * TRIGRAM_WEIGHT
+
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    hashed = np.array([feature_hash(term) for term in counts], dtype=np.int64)
+    features, inverse = np.unique(hashed, return_inverse=True)
+    weights = np.bincount(inverse.ravel(), weights=np.fromiter(counts.values(), dtype=np.float64))
+    return features, 1.0 + np.log1p(np.maximum(weights - 1.0, 0.0))
+
+
+class SearchIndex:
+    """
+    Documents are numbered by position. The main segment keeps postings
+    sorted by feature; the delta segment keeps each new document's features.
+    Replaced documents are tombstoned. Document frequencies and norms are
+    recomputed exactly on merge and only approximately in between.
+
+    The index follows the primary, never a replica, so its watermark cannot
+    pass rows a replica has not received yet. Refreshes run on one
+    background thread (see `sync`); searches only wait for `_lock` while
+    changes are applied, not while they are read or a rebuild is loaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()          # index state
+        self._sync_lock = threading.Lock()     # one refresh or rebuild at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+        self._reset()
+        self.watermark = None
+        self.unsettled = {}      # restaurant id -> updated_at indexed from the safety lag window
+        self.checked_at = 0.0
+        self.built_at = None
+
+    def _reset(self):
+        self.ids = []            # position -> restaurant id
+        self.cities = []         # position -> city
+        self._alive = np.zeros(0, dtype=bool)  # grown by doubling; see alive
+        self._norms = np.zeros(0)
+        self.positions = {}      # restaurant id -> position
+        self.features = np.zeros(0, dtype=np.int64)
+        self.docs = np.zeros(0, dtype=np.int64)
+        self.weights = np.zeros(0)
+        self.delta = []          # (position, features, weights)
+        self.df = np.zeros(1 << SEARCH_HASH_BITS, dtype=np.int32)
+        self.size = 0            # live documents
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self._alive[:len(self.ids)]
+
+    @property
+    def norms(self) -> np.ndarray:
+        return self._norms[:len(self.ids)]
+
+    def idf(self, features: np.ndarray) -> np.ndarray:
+        return np.log((1.0 + self.size) / (1.0 + self.df[features])) + 1.0
+
+    def _add(self, row):
+        """Index one restaurant row, replacing its previous version."""
+        restaurant_id, name, cuisine, description, city, is_active = row
+        old = self.positions.pop(restaurant_id, None)
+        if old is not None:
+            self.alive[old] = False
+            self.size -= 1
+        if not is_active:
+            return
+
+        features, weights = text_features({"name": name, "cuisine": cuisine, "description": description})
+        self.df[features] += 1
+        position = len(self.ids)
+        if position == len(self._alive):
+            extra = max(position, 1024)
+            self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+            self._norms = np.concatenate([self._norms, np.ones(extra)])
+        self.ids.append(restaurant_id)
+        self.cities.append(city)
+        self.positions[restaurant_id] = position
+        self._alive[position] = True
+        self.size += 1
+        self._norms[position] = np.linalg.norm(weights * self.idf(features)) or 1.0
+        self.delta.append((position, features, weights))
+
+    def _merge(self):
+        """Fold the delta into the main segment, drop tombstones and recompute df and norms."""
+        alive = self.alive
+        features = np.concatenate([self.features] + [f for _, f, _ in self.delta])
+        docs = np.concatenate([self.docs] + [np.full(len(f), p, dtype=np.int64) for p, f, _ in self.delta])
+        weights = np.concatenate([self.weights] + [w for _, _, w in self.delta])
+
+        keep = alive[docs]
+        renumber = np.cumsum(alive) - 1
+        features, docs, weights = features[keep], renumber[docs[keep]], weights[keep]
+        order = np.lexsort((docs, features))
+        self.features, self.docs, self.weights = features[order], docs[order], weights[order]
+
+        self.ids = [self.ids[p] for p in np.flatnonzero(alive)]
+        self.cities = [self.cities[p] for p in np.flatnonzero(alive)]
+        self.positions = {restaurant_id: p for p, restaurant_id in enumerate(self.ids)}
+        self._alive = np.ones(len(self.ids), dtype=bool)
+        self.size = len(self.ids)
+        self.delta = []
+
+        self.df = np.bincount(self.features, minlength=1 << SEARCH_HASH_BITS).astype(np.int32)
+        contributions = (self.weights * self.idf(self.features)) ** 2
+        self._norms = np.sqrt(np.bincount(self.docs, weights=contributions, minlength=len(self.ids)))
+        self._norms[self._norms == 0] = 1.0
+
+    def build(self, db):
+        """
+        Index every active restaurant from scratch into a new index, then
+        swap it in; searches keep using the current one meanwhile.
+        """
+        fresh = SearchIndex.__new__(SearchIndex)
+        fresh._reset()
+        settled = settled_before()
+        fresh.watermark = (settled, 0)
+        fresh.unsettled = {}
+        query = db.query(*INDEXED_COLUMNS, Restaurant.updated_at).filter(Restaurant.is_active == True)
+        for row in query.yield_per(1000):
+            fresh._add(row[:-1])
+            if row[-1] is not None and row[-1] > settled:
+                fresh.unsettled[row[0]] = row[-1]
+        fresh._merge()
+        fresh.built_at = time.time()
+
+        with self._lock:
+            self.__dict__.update(fresh.__dict__)
+
+    def refresh(self, db) -> bool:
+        """
+        Index restaurants written since the watermark. The watermark only
+        advances over settled rows (see WATERMARK_SAFETY_LAG_SECONDS); newer
+        ones are indexed right away and re-read until they settle. Returns
+        False when hard deletes left the index with more documents than
+        active restaurants, so it needs a full rebuild.
+        """
+        settled = settled_before()
+        updated_at, after_id = self.watermark
+        rows = db.query(*INDEXED_COLUMNS, Restaurant.updated_at).filter(or_(
+            Restaurant.updated_at > updated_at,
+            and_(Restaurant.updated_at == updated_at, Restaurant.id > after_id)
+        )).order_by(Restaurant.updated_at, Restaurant.id).all()
+        active = db.query(func.count(Restaurant.id)).filter(Restaurant.is_active == True).scalar()
+
+        with self._lock:
+            for row in rows:
+                restaurant_id, row_updated_at = row[0], row[-1]
+                if self.unsettled.get(restaurant_id) != row_updated_at:
+                    self._add(row[:-1])
+                if row_updated_at <= settled:
+                    self.watermark = (row_updated_at, restaurant_id)
+                else:
+                    self.unsettled[restaurant_id] = row_updated_at
+            self.unsettled = {i: u for i, u in self.unsettled.items() if u > settled}
+            if len(self.delta) >= SEARCH_MERGE_THRESHOLD:
+                self._merge()
+            return active == self.size
+
+    def sync(self, wait: bool = False):
+        """
+        Bring the index up to date from the primary. By default a refresh is
+        started in the background when SEARCH_REFRESH_INTERVAL has passed
+        and none is running; full rebuilds only ever happen there. With
+        `wait`, changes are applied before returning (building the index if
+        there is none yet); a needed rebuild is left to the next background run.
+        """
+        if wait:
+            with self._sync_lock:
+                self._sync(rebuild=self.built_at is None)
+            return
+
+        if time.monotonic() - self.checked_at < SEARCH_REFRESH_INTERVAL:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        self.checked_at = time.monotonic()
+        try:
+            self._executor.submit(self._sync_in_background)
+        except RuntimeError:  # interpreter shutting down
+            self._sync_lock.release()
+
+    def _sync_in_background(self):
+        try:
+            self._sync(rebuild=True)
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self, rebuild: bool):
+        db = SessionLocal()
+        try:
+            if self.built_at is None:
+                self.build(db)
+            elif not self.refresh(db) and rebuild:
+                self.build(db)
+        except Exception as e:
+            print(f"❌ Error refreshing search index: {e}")
+        finally:
+            db.close()
+            self.checked_at = time.monotonic()
+
+    def search(self, query: str, limit: int = 20, city: str = None, fresh: bool = False):
+        """
+        (restaurant id, score) pairs by cosine similarity to the query, best
+        first. `fresh` applies pending changes first (read-your-writes).
+        """
+        self.sync(wait=fresh or self.built_at is None)
+        features, weights = text_features({"query": query})
+        if not len(features):
+            return []
+
+        with self._lock:
+            common = self.df[features] > MAX_DOCUMENT_FREQUENCY * self.size
+            if common.all() and self.size:
+                common[:] = False  # only very common features: use them anyway
+            features, weights = features[~common], weights[~common]
+            query_weights = weights * self.idf(features)
+            query_weights /= np.linalg.norm(query_weights) or 1.0
+
+            # Main segment: gather each query feature's postings
+            starts = np.searchsorted(self.features, features, side="left")
+            ends = np.searchsorted(self.features, features, side="right")
+            lengths = ends - starts
+            index = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+            contributions = self.weights[index] * np.repeat(query_weights * self.idf(features), lengths)
+            scores = np.bincount(self.docs[index], weights=contributions, minlength=len(self.ids))
+
+            # Delta segment: intersect each new document with the query
+            for position, doc_features, doc_weights in self.delta:
+                _, in_doc, in_query = np.intersect1d(doc_features, features, assume_unique=True, return_indices=True)
+                scores[position] += np.dot(doc_weights[in_doc] * self.idf(features[in_query]), query_weights[in_query])
+
+            scores = scores / self.norms
+            scores[~self.alive] = 0
+            if city:
+                scores[np.array([c != city for c in self.cities], dtype=bool)] = 0
+
+            limit = min(limit, len(scores))
+            if not limit:
+                return []
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self.ids[p], float(scores[p])) for p in top if scores[p] > 0]
+
+    def stats(self):
+        return {
+            "documents": self.size,
+            "delta_documents": len(self.delta),
+            "features": int((self.df > 0).sum()),
+            "built_at": self.built_at
+        }
+
+
+search_index = SearchIndex()
+
+
+def build_search_index():
+    """Warm-up hook: build the index before the first query needs it."""
+    search_index.sync(wait=True)
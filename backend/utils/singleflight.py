@@ -0,0 +1,91 @@
+"""
+Request coalescing (single-flight) for Nativore.
+Concurrent calls with the same key share one execution and its result.
+"""
+import asyncio
+import functools
+
+from fastapi.concurrency import run_in_threadpool
+
+from database import read_session
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while a call
+    for their key is in flight await it and receive the same result (or
+    exception) instead of running their own. Only the running call holds a
+    threadpool thread; waiting callers hold none.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> task, all on the event loop
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Run the sync `fn` in the threadpool, or await the call already in flight for `key`."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._finished, key))
+
+        # A caller that goes away (client disconnect) must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved even if every caller went away
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        return len(self._calls)
+
+
+flights = SingleFlight()
+
+# Route parameters that never change a route's result
+IGNORED_PARAMS = {"db", "current_user", "request"}
+
+
+def call_key(func, kwargs):
+    """
+    Normalized key for a route call: the route name plus its parameters in
+    sorted order, ignoring the session and user dependencies.
+    """
+    return (func.__qualname__,) + tuple(sorted(
+        (name, value) for name, value in kwargs.items() if name not in IGNORED_PARAMS
+    ))
+
+
+def run_shared(func, kwargs: dict):
+    """
+    Run a coalesced call on a session of its own. The request session of
+    the caller that started it is closed when that client disconnects,
+    while the call keeps running for the others.
+    """
+    if "db" not in kwargs:
+        return func(**kwargs)
+    db = read_session()
+    try:
+        return func(**dict(kwargs, db=db))
+    finally:
+        db.close()
+
+
+def single_flight(func):
+    """
+    Coalesce concurrent calls of a sync route with identical query parameters.
+    The returned route is async and runs `func` in the threadpool. Clients
+    within their read-your-writes window run it on their own: a shared call
+    may read a lagging replica or have started before their write.
+    """
+    @functools.wraps(func)
+    async def wrapper(**kwargs):
+        db = kwargs.get("db")
+        if db is not None and db.info.get("read_your_writes"):
+            return await run_in_threadpool(func, **kwargs)
+        return await flights.do(call_key(func, kwargs), run_shared, func, kwargs)
+
+    return wrapper
@@ -0,0 +1,229 @@
+"""
+Mergeable percentile sketches for Nativore analytics.
+A t-digest of avg_price and rating is kept per (city, area, cuisine) cell.
+Roll-ups merge the cells' digests, so percentiles of any slice come from a
+few hundred centroids instead of sorting every restaurant in it.
+"""
+import os
+import threading
+
+import numpy as np
+
+from models import Restaurant
+from utils.snapshot import snapshot_store
+
+# Centroids kept per digest; cells with fewer values keep them exactly
+SKETCH_COMPRESSION = int(os.getenv("SKETCH_COMPRESSION", 100))
+
+SKETCH_MEASURES = ("avg_price", "rating")
+SKETCH_DIMENSIONS = ("city", "area", "cuisine")
+
+# Merged roll-ups cached per sketch version
+MAX_CACHED_ROLLUPS = 1024
+
+
+class TDigest:
+    """
+    A merging t-digest: centroids (mean, weight) sorted by mean, sized by
+    the k1 scale function so they are small near the tails. Digests merge
+    by concatenating centroids and compressing again.
+    """
+
+    def __init__(self, means, weights, minimum=None, maximum=None, compression=SKETCH_COMPRESSION):
+        self.means = np.asarray(means, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.min = minimum if minimum is not None else (float(self.means.min()) if len(self.means) else None)
+        self.max = maximum if maximum is not None else (float(self.means.max()) if len(self.means) else None)
+        self.compression = compression
+        self._compress()
+
+    @classmethod
+    def from_values(cls, values, compression=SKETCH_COMPRESSION):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        return cls(values, np.ones(len(values)), compression=compression)
+
+    @classmethod
+    def merge(cls, digests):
+        digests = [d for d in digests if d.count]
+        if not digests:
+            return cls([], [])
+        return cls(
+            np.concatenate([d.means for d in digests]),
+            np.concatenate([d.weights for d in digests]),
+            min(d.min for d in digests),
+            max(d.max for d in digests),
+            digests[0].compression
+        )
+
+    @property
+    def count(self) -> int:
+        return int(self.weights.sum())
+
+    def _compress(self):
+        order = np.argsort(self.means, kind="stable")
+        self.means, self.weights = self.means[order], self.weights[order]
+        if len(self.means) <= self.compression:
+            return
+
+        # Assign each centroid to a unit-width interval of the scale function
+        # at its midpoint; intervals are monotone in the mean, so the merged
+        # centroids stay sorted.
+        total = self.weights.sum()
+        q = (np.cumsum(self.weights) - self.weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        cluster = np.floor(k - k.min()).astype(np.int64)
+        weights = np.bincount(cluster, weights=self.weights)
+        sums = np.bincount(cluster, weights=self.weights * self.means)
+        nonempty = weights > 0
+        self.means, self.weights = sums[nonempty] / weights[nonempty], weights[nonempty]
+
+    def quantiles(self, qs):
+        """Values at quantiles `qs` (0-1), interpolating between centroid centers."""
+        if not self.count:
+            return [None for _ in qs]
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        ranks = np.concatenate([[0.0], centers, [total]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(np.asarray(qs, dtype=np.float64) * total, ranks, values).tolist()
+
+
+def cell_keys(snapshot) -> np.ndarray:
+    """One int64 key per snapshot row identifying its (city, area, cuisine) cell."""
+    key = np.zeros(snapshot.size, dtype=np.int64)
+    for dim in SKETCH_DIMENSIONS:
+        key = key * len(snapshot.labels[dim]) + snapshot[dim]
+    return key
+
+
+def cell_label(snapshot, key: int) -> tuple:
+    """The (city, area, cuisine) labels of a cell key."""
+    labels = []
+    for dim in reversed(SKETCH_DIMENSIONS):
+        key, code = divmod(int(key), len(snapshot.labels[dim]))
+        labels.append(snapshot.labels[dim][code])
+    return tuple(reversed(labels))
+
+
+def row_labels(snapshot, rows: np.ndarray) -> list:
+    """(city, area, cuisine) labels of the given snapshot rows."""
+    columns = [np.asarray(snapshot.labels[dim], dtype=object)[snapshot[dim][rows]] for dim in SKETCH_DIMENSIONS]
+    return list(zip(*columns))
+
+
+def changed_cells(old, new) -> set:
+    """Cells with a row added, removed or changed between two snapshots."""
+    _, old_rows, new_rows = np.intersect1d(old["id"], new["id"], assume_unique=True, return_indices=True)
+
+    differs = np.zeros(len(old_rows), dtype=bool)
+    for measure in SKETCH_MEASURES:
+        differs |= ~np.isclose(old[measure][old_rows], new[measure][new_rows], equal_nan=True)
+    old_labels, new_labels = row_labels(old, old_rows), row_labels(new, new_rows)
+    differs |= np.array([a != b for a, b in zip(old_labels, new_labels)], dtype=bool)
+
+    removed = np.setdiff1d(np.arange(old.size), old_rows)
+    added = np.setdiff1d(np.arange(new.size), new_rows)
+    return (
+        set(row_labels(old, np.concatenate([removed, old_rows[differs]])))
+        | set(row_labels(new, np.concatenate([added, new_rows[differs]])))
+    )
+
+
+class SketchIndex:
+    """Per-cell digests of one snapshot version, plus cached roll-ups."""
+
+    def __init__(self, cells: dict, snapshot=None):
+        self.cells = cells  # (city, area, cuisine) -> {measure: TDigest}
+        self.snapshot = snapshot
+        self.version = snapshot.version if snapshot is not None else None
+        self._rollups = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot, previous=None):
+        """
+        Digests for a snapshot. With the index of an earlier snapshot only
+        the cells whose rows changed are rebuilt; the rest are reused.
+        """
+        keys = cell_keys(snapshot)
+        if previous is not None and previous.snapshot is not None:
+            dirty = changed_cells(previous.snapshot, snapshot)
+            cells = {cell: digests for cell, digests in previous.cells.items() if cell not in dirty}
+            rows = np.flatnonzero(np.isin(keys, [k for k in np.unique(keys) if cell_label(snapshot, k) in dirty]))
+        else:
+            cells = {}
+            rows = np.arange(snapshot.size)
+
+        order = rows[np.argsort(keys[rows], kind="stable")]
+        unique, starts = np.unique(keys[order], return_index=True)
+        for key, group in zip(unique, np.split(order, starts[1:])):
+            cells[cell_label(snapshot, key)] = {
+                measure: TDigest.from_values(snapshot[measure][group]) for measure in SKETCH_MEASURES
+            }
+        return cls(cells, snapshot)
+
+    @classmethod
+    def from_database(cls, db):
+        columns = [getattr(Restaurant, name) for name in SKETCH_DIMENSIONS + SKETCH_MEASURES]
+        values = {}
+        for row in db.query(*columns):
+            cell = values.setdefault(tuple(row[:3]), {measure: [] for measure in SKETCH_MEASURES})
+            for measure, value in zip(SKETCH_MEASURES, row[3:]):
+                cell[measure].append(np.nan if value is None else value)
+        cells = {
+            cell: {measure: TDigest.from_values(v) for measure, v in measures.items()}
+            for cell, measures in values.items()
+        }
+        return cls(cells)
+
+    def query(self, measure: str, group_by: str = None, **filters) -> dict:
+        """Merged digests per group (None without `group_by`) of the cells matching `filters`."""
+        key = (measure, group_by) + tuple(sorted(filters.items()))
+        if key in self._rollups:
+            return self._rollups[key]
+
+        positions = {dim: i for i, dim in enumerate(SKETCH_DIMENSIONS)}
+        groups = {}
+        for cell, digests in self.cells.items():
+            if all(value is None or cell[positions[dim]] == value for dim, value in filters.items()):
+                group = cell[positions[group_by]] if group_by else None
+                groups.setdefault(group, []).append(digests[measure])
+
+        result = {group: TDigest.merge(digests) for group, digests in groups.items()}
+        if len(self._rollups) < MAX_CACHED_ROLLUPS:
+            self._rollups[key] = result
+        return result
+
+
+class SketchStore:
+    """
+    The current sketch index of this worker. It follows the snapshot version,
+    updating only the cells a write touched; without snapshots it is rebuilt
+    from the database after `invalidate()`.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def current(self, db) -> SketchIndex:
+        snapshot = snapshot_store.current()
+        index = self._index
+        if index is not None and (snapshot is None or index.version == snapshot.version):
+            return index
+
+        with self._lock:
+            if self._index is index:
+                if snapshot is not None:
+                    self._index = SketchIndex.from_snapshot(snapshot, previous=index)
+                else:
+                    self._index = SketchIndex.from_database(db)
+            return self._index
+
+    def invalidate(self):
+        """Drop the index built from the database after restaurants were written."""
+        if self._index is not None and self._index.version is None:
+            self._index = None
+
+
+sketch_store = SketchStore()
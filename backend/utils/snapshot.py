@@ -0,0 +1,311 @@
+"""
+Columnar on-disk snapshot of the restaurant analytics dataset.
+
+Each version is a directory of raw NumPy arrays (.npy) plus a meta.json with
+the string dictionaries for city, area and cuisine. Workers memory-map the
+arrays read-only, so every process shares the same pages through the OS cache
+and starts without re-reading the table. A new version is written next to the
+old one and published by atomically replacing the CURRENT pointer file.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func
+
+from database import read_session
+from models import Restaurant
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not coordinated across processes
+    fcntl = None
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "True") == "True"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+
+# Seconds to wait after a write before rebuilding, to batch bursts of writes
+SNAPSHOT_REBUILD_DELAY = float(os.getenv("SNAPSHOT_REBUILD_DELAY", 1.0))
+
+# Dictionary-encoded string columns
+DIMENSIONS = ("city", "area", "cuisine")
+
+# Numeric columns and their on-disk dtype
+MEASURES = {
+    "id": np.int64,
+    "avg_price": np.float64,
+    "rating": np.float64,
+    "review_count": np.int32,
+    "spending_index": np.float64,
+    "ranking_score": np.float64,
+    "latitude": np.float64,
+    "longitude": np.float64,
+    "is_active": np.bool_,
+}
+
+# Columns whose NULLs are kept as NaN; other NULLs become 0, with the NULL
+# rows recorded in <column>.null.npy (only written when there are any)
+NULLABLE = {"ranking_score", "latitude", "longitude"}
+
+# Versions kept on disk so workers still mapping an old one can finish
+KEEP_VERSIONS = 2
+
+
+class Snapshot:
+    """
+    A memory-mapped version of the dataset. Dimension columns hold int32
+    codes into `labels[dimension]`; all arrays share the same row order.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        self.path = path
+        self.version = meta["version"]
+        self.size = meta["size"]
+        self.built_at = meta["built_at"]
+        self.watermark = meta.get("watermark")
+        self.labels = meta["labels"]
+        self._codes = {dim: {label: code for code, label in enumerate(labels)} for dim, labels in self.labels.items()}
+
+        self.columns = {}
+        # Empty arrays cannot be memory-mapped
+        mmap_mode = "r" if self.size else None
+        for name in list(MEASURES) + list(DIMENSIONS):
+            self.columns[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        self.nulls = {
+            name: np.load(os.path.join(path, f"{name}.null.npy"), mmap_mode=mmap_mode)
+            for name in meta.get("null_columns", [])
+        }
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def isnull(self, name: str) -> np.ndarray:
+        """Boolean mask of the rows where a measure is NULL."""
+        if name in NULLABLE:
+            return np.isnan(self.columns[name])
+        if name in self.nulls:
+            return np.asarray(self.nulls[name])
+        return np.zeros(self.size, dtype=bool)
+
+    def code(self, dimension: str, label: str) -> int:
+        """Code of a dimension value, or -1 if it does not occur."""
+        return self._codes[dimension].get(label, -1)
+
+    def mask(self, **filters) -> np.ndarray:
+        """Boolean row mask for equality filters on dimensions; None values are ignored."""
+        mask = np.ones(self.size, dtype=bool)
+        for dimension, label in filters.items():
+            if label is not None:
+                mask &= self.columns[dimension] == self.code(dimension, label)
+        return mask
+
+
+def write_snapshot(rows, directory: str = SNAPSHOT_DIR, watermark=None) -> str:
+    """
+    Write rows (sequences in MEASURES + DIMENSIONS column order) as a new
+    version and atomically make it current. Returns the version name.
+    `watermark` identifies the table state the rows were read at.
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = list(MEASURES) + list(DIMENSIONS)
+    columns = list(zip(*rows)) if rows else [[] for _ in names]
+    data = dict(zip(names, columns))
+
+    version = f"v{int(time.time() * 1000)}-{os.getpid()}"
+    tmp_path = os.path.join(directory, f".{version}.tmp")
+    os.makedirs(tmp_path)
+
+    null_columns = []
+    for name, dtype in MEASURES.items():
+        missing = np.nan if name in NULLABLE else 0
+        values = [missing if v is None else v for v in data[name]]
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(values, dtype=dtype))
+
+        nulls = np.array([v is None for v in data[name]], dtype=bool)
+        if name not in NULLABLE and nulls.any():
+            np.save(os.path.join(tmp_path, f"{name}.null.npy"), nulls)
+            null_columns.append(name)
+
+    labels = {}
+    for dim in DIMENSIONS:
+        uniques, codes = np.unique(np.asarray(data[dim], dtype=object).astype(str), return_inverse=True)
+        labels[dim] = uniques.tolist()
+        np.save(os.path.join(tmp_path, f"{dim}.npy"), codes.astype(np.int32))
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({
+            "version": version,
+            "size": len(data["id"]),
+            "built_at": time.time(),
+            "watermark": watermark,
+            "labels": labels,
+            "null_columns": null_columns
+        }, f)
+
+    os.rename(tmp_path, os.path.join(directory, version))
+
+    pointer_tmp = os.path.join(directory, f".CURRENT.{os.getpid()}")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(directory, "CURRENT"))
+
+    prune_versions(directory, keep=version)
+    return version
+
+
+def table_watermark(db):
+    """
+    Cheap fingerprint of the restaurants table: row count, latest update and
+    the total ranking score, which batch jobs change without touching
+    updated_at.
+    """
+    count, last_update, score_total = db.query(
+        func.count(Restaurant.id), func.max(Restaurant.updated_at), func.sum(Restaurant.ranking_score)
+    ).one()
+    return [count, last_update.isoformat() if last_update else None, round(score_total or 0.0, 6)]
+
+
+def prune_versions(directory: str, keep: str):
+    """Delete all but the newest KEEP_VERSIONS versions (never `keep`)."""
+    versions = sorted(
+        (name for name in os.listdir(directory) if name.startswith("v")),
+        key=lambda name: int(name[1:].split("-")[0]),
+        reverse=True
+    )
+    for name in versions[KEEP_VERSIONS:]:
+        if name != keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+class SnapshotStore:
+    """
+    Gives each worker the current snapshot and rebuilds it after writes.
+    `current()` re-reads the CURRENT pointer at most every `check_interval`
+    seconds, so versions published by other workers are picked up quickly.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, check_interval: float = 0.5):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._rebuild_timer = None
+        self._callbacks = []
+
+    def current(self):
+        """The latest published snapshot, or None if disabled or not built yet."""
+        if not SNAPSHOT_ENABLED:
+            return None
+
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                with open(os.path.join(self.directory, "CURRENT")) as f:
+                    version = f.read().strip()
+            except FileNotFoundError:
+                return None
+
+            if self._snapshot is None or self._snapshot.version != version:
+                try:
+                    self._snapshot = Snapshot(os.path.join(self.directory, version))
+                except (FileNotFoundError, ValueError) as e:
+                    print(f"⚠️  Could not load snapshot {version}: {e}")
+            return self._snapshot
+
+    def build(self):
+        """Read the restaurants table and publish a new snapshot version."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            db = read_session()
+            try:
+                watermark = table_watermark(db)
+                columns = [getattr(Restaurant, name) for name in list(MEASURES) + list(DIMENSIONS)]
+                rows = db.query(*columns).order_by(Restaurant.id).all()
+            finally:
+                db.close()
+
+            version = write_snapshot(rows, self.directory, watermark)
+
+        self._checked_at = 0.0
+        return version
+
+    def ensure(self):
+        """
+        Build a snapshot if none exists or the table changed outside the API
+        (e.g. by the data loader). Otherwise the published version is reused.
+        """
+        if not SNAPSHOT_ENABLED:
+            return
+
+        snapshot = self.current()
+        if snapshot is not None:
+            db = read_session()
+            try:
+                if snapshot.watermark == table_watermark(db):
+                    return
+            finally:
+                db.close()
+
+        self.build()
+
+    def request_rebuild(self, callback=None):
+        """
+        Rebuild after SNAPSHOT_REBUILD_DELAY seconds in a background thread,
+        batching requests that arrive in the meantime. `callback` runs once
+        the new version is live (immediately when snapshots are disabled).
+        """
+        if not SNAPSHOT_ENABLED:
+            if callback:
+                callback()
+            return
+
+        with self._lock:
+            if callback:
+                self._callbacks.append(callback)
+            if self._rebuild_timer is None:
+                self._rebuild_timer = threading.Timer(SNAPSHOT_REBUILD_DELAY, self._rebuild)
+                self._rebuild_timer.daemon = True
+                self._rebuild_timer.start()
+
+    def _rebuild(self):
+        with self._lock:
+            self._rebuild_timer = None
+            callbacks, self._callbacks = self._callbacks, []
+
+        try:
+            self.build()
+        except Exception as e:
+            print(f"❌ Error rebuilding snapshot: {e}")
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"❌ Error in snapshot callback: {e}")
+
+    def stats(self):
+        snapshot = self.current()
+        return {
+            "enabled": SNAPSHOT_ENABLED,
+            "version": snapshot.version if snapshot else None,
+            "rows": snapshot.size if snapshot else 0,
+            "age_seconds": round(time.time() - snapshot.built_at, 1) if snapshot else None,
+            "rebuild_pending": self._rebuild_timer is not None
+        }
+
+
+snapshot_store = SnapshotStore()
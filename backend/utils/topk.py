@@ -0,0 +1,119 @@
+"""
+Top-k restaurants per group for Nativore analytics.
+Ranks restaurants by ranking_score within every group of an arbitrary
+grouping (city, area, cuisine, price band) at once: one ROW_NUMBER() window
+query on the database, or a single lexsort over the memory-mapped snapshot.
+"""
+import numpy as np
+from sqlalchemy import desc, func
+
+from models import Restaurant, City, Area, Cuisine, dimension_key
+from utils.histogram import PRICE_BANDS, PRICE_BAND_EDGES, bucket_codes, bucket_expression
+from utils.snapshot import snapshot_store
+
+TOPK_DIMENSIONS = ("city", "area", "cuisine", "price_band")
+
+MAX_TOPK = 50
+
+
+def group_sort_key(group_by, group: tuple) -> tuple:
+    """Groups are listed by label, price bands from cheapest to most expensive."""
+    return tuple(
+        PRICE_BANDS.index(label) if dim == "price_band" else label
+        for dim, label in zip(group_by, group)
+    )
+
+
+def ranks_within_groups(keys: np.ndarray) -> np.ndarray:
+    """0-based position of each element within its run of equal (sorted) keys."""
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return np.arange(len(keys)) - np.repeat(starts, np.diff(np.r_[starts, len(keys)]))
+
+
+def top_k_from_snapshot(snapshot, group_by, k: int, city=None) -> dict:
+    """Group labels -> restaurant ids in rank order, from the snapshot."""
+    mask = snapshot.mask(city=city) & (snapshot["review_count"] > 0)
+    rows = np.flatnonzero(mask)
+
+    codes, labels = [], []
+    for dim in group_by:
+        if dim == "price_band":
+            codes.append(bucket_codes(snapshot["avg_price"][rows], PRICE_BAND_EDGES))
+            labels.append(PRICE_BANDS)
+        else:
+            codes.append(snapshot[dim][rows].astype(np.int64))
+            labels.append(snapshot.labels[dim])
+    shape = tuple(len(dim_labels) for dim_labels in labels)
+    keys = np.ravel_multi_index(codes, shape) if group_by else np.zeros(len(rows), dtype=np.int64)
+
+    # Same order as the database: score descending, then id descending
+    scores = np.nan_to_num(np.asarray(snapshot["ranking_score"][rows], dtype=np.float64), nan=-np.inf)
+    ids = np.asarray(snapshot["id"][rows])
+    order = np.lexsort((-ids, -scores, keys))
+    keys, ids = keys[order], ids[order]
+    kept = ranks_within_groups(keys) < k
+
+    groups = {}
+    for key, restaurant_id in zip(keys[kept].tolist(), ids[kept].tolist()):
+        position = np.unravel_index(key, shape) if group_by else ()
+        group = tuple(dim_labels[p] for dim_labels, p in zip(labels, position))
+        groups.setdefault(group, []).append(restaurant_id)
+    return groups
+
+
+def top_k_from_database(db, group_by, k: int, city=None) -> dict:
+    """Group labels -> restaurant ids in rank order, from one window-function query."""
+    band = bucket_expression(Restaurant.avg_price, PRICE_BAND_EDGES)
+    keys = {"city": Restaurant.city_id, "area": Restaurant.area_id, "cuisine": Restaurant.cuisine_id, "price_band": band}
+    partition = [keys[dim].label(dim) for dim in group_by]
+
+    rank = func.row_number().over(
+        partition_by=[keys[dim] for dim in group_by] or None,
+        order_by=(desc(Restaurant.ranking_score), desc(Restaurant.id))
+    ).label("rank")
+    ranked = db.query(Restaurant.id, *partition, rank).filter(Restaurant.review_count > 0)
+    if city:
+        ranked = ranked.filter(Restaurant.city_id == dimension_key(City, city))
+    ranked = ranked.subquery()
+
+    names = {
+        "city": dict(db.query(City.id, City.name)),
+        "area": dict(db.query(Area.id, Area.name)),
+        "cuisine": dict(db.query(Cuisine.id, Cuisine.name)),
+        "price_band": dict(enumerate(PRICE_BANDS)),
+    }
+    rows = db.query(ranked.c.id, *[ranked.c[dim] for dim in group_by]).filter(
+        ranked.c.rank <= k
+    ).order_by(ranked.c.rank)
+
+    groups = {}
+    for row in rows:
+        group = tuple(names[dim][key] for dim, key in zip(group_by, row[1:]))
+        groups.setdefault(group, []).append(row[0])
+    return groups
+
+
+def top_k(db, group_by, k: int, city=None) -> list:
+    """
+    The `k` best-ranked restaurants (with reviews) of every group, as
+    (group labels, restaurants) pairs in group order.
+    """
+    snapshot = snapshot_store.current()
+    if snapshot is not None:
+        groups = top_k_from_snapshot(snapshot, group_by, k, city)
+    else:
+        groups = top_k_from_database(db, group_by, k, city)
+
+    ids = [restaurant_id for group_ids in groups.values() for restaurant_id in group_ids]
+    restaurants = {r.id: r for r in db.query(Restaurant).filter(Restaurant.id.in_(ids))} if ids else {}
+
+    # Order by the scores just read, in case they moved since the snapshot
+    return [
+        (group, sorted(
+            (restaurants[i] for i in groups[group] if i in restaurants),
+            key=lambda r: (-r.ranking_score if r.ranking_score is not None else np.inf, -r.id)
+        ))
+        for group in sorted(groups, key=lambda group: group_sort_key(group_by, group))
+    ]
@@ -0,0 +1,83 @@
+"""
+Startup warm-up for Nativore.
+Loads the analytics snapshot, primes the report and restaurant caches (and
+with them the database's page cache) and builds the search index before the
+instance reports itself ready for traffic.
+"""
+import asyncio
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+
+from database import SessionLocal
+from models import Restaurant, RestaurantResponse
+from utils.cache import restaurant_cache
+from utils.reports import report_cache
+from utils.search import build_search_index
+from utils.snapshot import snapshot_store
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "True") == "True"
+
+# Longest warm-up may take before the instance is declared ready anyway
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 60))
+
+
+class WarmUp:
+    """Runs the warm-up phase and tracks readiness."""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at = None
+        self.duration = None
+        self.error = None
+
+    def prime_restaurants(self):
+        """Load the restaurants listed in the cached top-rated reports into the restaurant cache."""
+        ids = set()
+        for report in report_cache.results("top-rated"):
+            ids.update(r["id"] for r in report["top_rated"])
+
+        if not ids:
+            return
+
+        # The primary, so no replica lag ends up in the shared cache
+        db = SessionLocal()
+        try:
+            for r in db.query(Restaurant).filter(Restaurant.id.in_(ids)).all():
+                restaurant_cache.set(r.id, jsonable_encoder(RestaurantResponse.model_validate(r)))
+        finally:
+            db.close()
+
+    def run_sync(self):
+        snapshot_store.ensure()
+        report_cache.warm()
+        self.prime_restaurants()
+        build_search_index()
+
+    async def run(self):
+        """Warm caches, then mark the instance ready (also on timeout or error)."""
+        self.started_at = time.monotonic()
+        if WARMUP_ENABLED:
+            try:
+                await asyncio.wait_for(run_in_threadpool(self.run_sync), WARMUP_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.error = f"Timed out after {WARMUP_TIMEOUT}s"
+            except Exception as e:
+                self.error = str(e)
+
+        self.duration = round(time.monotonic() - self.started_at, 3)
+        self.ready = True
+        print(f"✅ Warm-up finished in {self.duration}s" + (f" ({self.error})" if self.error else ""))
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "enabled": WARMUP_ENABLED,
+            "duration_seconds": self.duration,
+            "error": self.error
+        }
+
+
+warmup = WarmUp()
@@ -17,6 +17,37 @@ CREATE TABLE IF NOT EXISTS users (
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_username ON users(username);
 
+-- Dimension Tables (restaurants reference these by integer key)
+CREATE TABLE IF NOT EXISTS cities (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS areas (
+    id SERIAL PRIMARY KEY,
+    city_id INTEGER NOT NULL REFERENCES cities(id),
+    name VARCHAR(255) NOT NULL,
+    CONSTRAINT uq_areas_city_id_name UNIQUE (city_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS cuisines (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) UNIQUE NOT NULL
+);
+
+-- Micro-markets: spatial clusters of restaurants per city (utils/micro_markets.py)
+CREATE TABLE IF NOT EXISTS micro_markets (
+    id SERIAL PRIMARY KEY,
+    city_id INTEGER NOT NULL REFERENCES cities(id),
+    label INTEGER NOT NULL,
+    latitude FLOAT NOT NULL,
+    longitude FLOAT NOT NULL,
+    radius_km FLOAT NOT NULL,
+    restaurant_count INTEGER NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_micro_markets_city_id_label UNIQUE (city_id, label)
+);
+
 -- Restaurants Table
 CREATE TABLE IF NOT EXISTS restaurants (
     id SERIAL PRIMARY KEY,
@@ -36,28 +67,70 @@ CREATE TABLE IF NOT EXISTS restaurants (
     address TEXT,
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    city_id INTEGER REFERENCES cities(id),
+    area_id INTEGER REFERENCES areas(id),
+    cuisine_id INTEGER REFERENCES cuisines(id),
+    ranking_score FLOAT,
+    micro_market_id INTEGER REFERENCES micro_markets(id)
 );
 
 CREATE INDEX idx_restaurants_city ON restaurants(city);
 CREATE INDEX idx_restaurants_cuisine ON restaurants(cuisine);
 CREATE INDEX idx_restaurants_name ON restaurants(name);
+CREATE INDEX ix_restaurants_updated_at_id ON restaurants(updated_at, id);
+CREATE INDEX ix_restaurants_city_id ON restaurants(city_id);
+CREATE INDEX ix_restaurants_area_id ON restaurants(area_id);
+CREATE INDEX ix_restaurants_cuisine_id ON restaurants(cuisine_id);
+CREATE INDEX ix_restaurants_city_ranking_score ON restaurants(city, ranking_score, id);
+CREATE INDEX ix_restaurants_ranking_score ON restaurants(ranking_score, id);
+CREATE INDEX ix_restaurants_micro_market_id ON restaurants(micro_market_id);
 
--- Reviews Table
+-- Reviews Table, partitioned by created_at month.
+-- Monthly partitions (reviews_y2025m01, ...) are created ahead of time by
+-- utils/review_partitions.py on API startup; rows outside them go to the
+-- default partition. Old partitions are detached with `review_partitions.py archive`.
 CREATE TABLE IF NOT EXISTS reviews (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER NOT NULL,
     restaurant_id INTEGER NOT NULL,
     rating FLOAT NOT NULL,
     comment TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (restaurant_id) REFERENCES restaurants(id) ON DELETE CASCADE
-);
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS reviews_default PARTITION OF reviews DEFAULT;
 
 CREATE INDEX idx_reviews_user ON reviews(user_id);
 CREATE INDEX idx_reviews_restaurant ON reviews(restaurant_id);
+CREATE INDEX ix_reviews_created_at ON reviews(created_at);
+
+-- Review counts and rating sums per restaurant and month.
+-- Maintained by the API on every review write; kept when partitions are archived.
+CREATE TABLE IF NOT EXISTS review_monthly_rollups (
+    month DATE NOT NULL,
+    restaurant_id INTEGER NOT NULL,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum FLOAT NOT NULL DEFAULT 0.0,
+    PRIMARY KEY (month, restaurant_id)
+);
+
+-- Inverted index over review comments and restaurant descriptions
+-- (one row per term and document; maintained by the API on writes)
+CREATE TABLE IF NOT EXISTS text_postings (
+    term VARCHAR(100) NOT NULL,
+    source VARCHAR(20) NOT NULL,
+    document_id INTEGER NOT NULL,
+    restaurant_id INTEGER NOT NULL,
+    frequency INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (term, source, document_id)
+);
+
+CREATE INDEX ix_text_postings_source_document_id ON text_postings(source, document_id);
 
 -- Trigger to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -71,8 +144,23 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Restaurants: updates that only touch derived columns (dimension keys,
+-- ranking score, micro-market) are not edits and keep updated_at, so delta
+-- sync and the search index don't see them as changes
+CREATE OR REPLACE FUNCTION update_restaurants_updated_at_column()
+RETURNS TRIGGER AS $$
+DECLARE
+    derived TEXT[] := ARRAY['updated_at', 'city_id', 'area_id', 'cuisine_id', 'ranking_score', 'micro_market_id'];
+BEGIN
+    IF (to_jsonb(NEW) - derived) IS DISTINCT FROM (to_jsonb(OLD) - derived) THEN
+        NEW.updated_at = CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
 CREATE TRIGGER update_restaurants_updated_at BEFORE UPDATE ON restaurants
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+    FOR EACH ROW EXECUTE FUNCTION update_restaurants_updated_at_column();
 
 CREATE TRIGGER update_reviews_updated_at BEFORE UPDATE ON reviews
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -3,9 +3,11 @@
  */
 import axios from 'axios';
 
+const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+
 // Create axios instance with base configuration
 const api = axios.create({
-  baseURL: import.meta.env.VITE_API_URL || 'http://localhost:8000',
+  baseURL: API_URL,
   timeout: 10000,
   headers: {
     'Content-Type': 'application/json',
@@ -58,12 +60,15 @@ export const authAPI = {
 export const restaurantsAPI = {
   getAll: (params) => api.get('/api/restaurants/', { params }),
   getById: (id) => api.get(`/api/restaurants/${id}`),
+  getByIds: (ids, fields) => api.get('/api/restaurants/batch/by-ids', { params: { ids: ids.join(','), fields } }),
   create: (data) => api.post('/api/restaurants/', data),
   update: (id, data) => api.put(`/api/restaurants/${id}`, data),
   delete: (id) => api.delete(`/api/restaurants/${id}`),
-  search: (query) => api.get('/api/restaurants/search/by-name', { params: { q: query } }),
+  search: (query, fields) => api.get('/api/restaurants/search/by-name', { params: { q: query, fields } }),
+  searchText: (query, city, limit) => api.get('/api/restaurants/search/semantic', { params: { q: query, city, limit } }),
   getCities: () => api.get('/api/restaurants/cities/list'),
   getCuisines: () => api.get('/api/restaurants/cuisines/list'),
+  getChanges: (watermark = {}, limit = 500) => api.get('/api/restaurants/changes/since', { params: { updated_at: watermark.updated_at, after_id: watermark.id, limit } }),
 };
 
 // Analytics API
@@ -73,10 +78,53 @@ export const analyticsAPI = {
   getTopCuisines: (city, limit = 10) => api.get('/api/analytics/top-cuisines', { params: { city, limit } }),
   getCityComparison: () => api.get('/api/analytics/city-comparison'),
   getTopRated: (city, limit = 10) => api.get('/api/analytics/top-rated', { params: { city, limit } }),
+  getTopK: (groupBy = 'area', k = 3, city) => api.get('/api/analytics/top-k', { params: { group_by: groupBy, k, city } }),
   getAreaInsights: (city) => api.get('/api/analytics/area-insights', { params: { city } }),
+  getMicroMarkets: (city) => api.get('/api/analytics/micro-markets', { params: { city } }),
+  getDishTrends: (city, terms) => api.get('/api/analytics/dishes', { params: { city, terms } }),
+  getHeatmapTiles: (city, cuisine) => api.get('/api/analytics/heatmap', { params: { city, cuisine } }),
+  // Binary tile: Uint32Array counts then Float32Array avg prices (grid x grid each)
+  getHeatmapTile: (tile, city, cuisine) => api.get(`/api/analytics/heatmap/${tile.zoom}/${tile.x}/${tile.y}`, { params: { city, cuisine, v: tile.version }, responseType: 'arraybuffer' }),
   getDashboardStats: () => api.get('/api/analytics/dashboard-stats'),
+  // Cube query: groupBy and filter values are comma-separated strings, e.g. { city: 'Chennai', price_band: 'budget' }
+  queryCube: (groupBy, filters = {}, limit = 100) => api.get('/api/analytics/cube', { params: { group_by: groupBy, ...filters, limit } }),
+  getHistogram: (measure, edges, groupBy, city) => api.get('/api/analytics/histogram', { params: { measure, edges, group_by: groupBy, city } }),
+  getPercentiles: (measure, city, groupBy) => api.get('/api/analytics/percentiles', { params: { measure, city, group_by: groupBy } }),
+  // Server-sent events: pushes trends/spending whenever the city's data changes
+  streamCity: (city) => new EventSource(`${API_URL}/api/analytics/stream?city=${encodeURIComponent(city)}`),
 };
 
+// Binary columnar analytics (see backend/utils/columnar.py): decodes to
+// { meta, tables: { name: { rows, columns: { field: TypedArray | Array } } } }
+const COLUMNAR_TYPES = { float64: Float64Array, int32: Int32Array, bool: Uint8Array, dictionary: Uint32Array };
+
+export const decodeColumnar = (buffer) => {
+  const view = new DataView(buffer);
+  const headerLength = view.getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+  const base = 8 + headerLength;
+  const tables = {};
+  for (const [name, table] of Object.entries(header.tables)) {
+    const columns = {};
+    for (const column of table.columns) {
+      const ArrayType = COLUMNAR_TYPES[column.type];
+      const values = new ArrayType(buffer, base + column.offset, column.length / ArrayType.BYTES_PER_ELEMENT);
+      const bits = column.validity && new Uint8Array(buffer, base + column.validity.offset, column.validity.length);
+      const decode = column.labels ? (code) => column.labels[code] : column.type === 'bool' ? Boolean : null;
+      columns[column.name] = decode || bits
+        ? Array.from(values, (value, i) => (bits && !((bits[i >> 3] >> (i & 7)) & 1) ? null : decode ? decode(value) : value))
+        : values;
+    }
+    tables[name] = { rows: table.rows, columns };
+  }
+  return { meta: header.meta, tables };
+};
+
+// GET an analytics endpoint in the columnar format
+export const getColumnar = (path, params) => api
+  .get(path, { params, responseType: 'arraybuffer', headers: { Accept: 'application/vnd.nativore.columnar' } })
+  .then((response) => decodeColumnar(response.data));
+
 // Recommendations API
 export const recommendationsAPI = {
   getBestLocations: (city, cuisine) => api.get('/api/recommendations/best-locations', { params: { city, cuisine } }),
@@ -25,6 +25,18 @@ const Dashboard = () => {
     }
   }, [selectedCity]);
 
+  // Live updates for the selected city instead of re-fetching
+  useEffect(() => {
+    if (!selectedCity) return;
+    const source = analyticsAPI.streamCity(selectedCity);
+    source.addEventListener('analytics', (event) => {
+      const snapshot = JSON.parse(event.data);
+      setTrends(snapshot.trends);
+      setSpending(snapshot.spending);
+    });
+    return () => source.close();
+  }, [selectedCity]);
+
   const fetchDashboardData = async () => {
     try {
       const response = await analyticsAPI.getDashboardStats();